@@ -0,0 +1,18 @@
+-- migrate:up transaction:false
+
+-- Approximate nearest neighbour index for the runtime endpoint search, which
+-- orders selection prompts by cosine distance to the query embedding.
+-- Built CONCURRENTLY (outside a transaction) so the table stays writable while
+-- the index builds over the embeddings already loaded. Building the graph over a
+-- populated table is much faster than growing it row by row, so for large bulk
+-- backfills roll this migration back, load, then migrate up again.
+SET maintenance_work_mem = '256MB';
+
+create index concurrently if not exists idx_openapi_operation_selection_prompt_embedding_hnsw
+    on openapi_operation_selection_prompt
+    using hnsw (selection_prompt_embedding vector_cosine_ops)
+    with (m = 16, ef_construction = 64);
+
+-- migrate:down transaction:false
+
+drop index concurrently if exists idx_openapi_operation_selection_prompt_embedding_hnsw;
@@ -0,0 +1,10 @@
+-- migrate:up
+
+-- Set by the config algorithm whenever it (re)writes a spec's selection prompt
+-- embeddings. Runtime processes that cache a spec's vectors in memory compare
+-- this to the version they loaded to know when to reload.
+alter table openapi_spec add column embeddings_updated_at timestamp with time zone;
+
+-- migrate:down
+
+alter table openapi_spec drop column if exists embeddings_updated_at;
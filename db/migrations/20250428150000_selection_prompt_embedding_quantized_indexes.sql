@@ -0,0 +1,24 @@
+-- migrate:up transaction:false
+
+-- Quantized HNSW indexes for the runtime endpoint search's first pass when
+-- EMBEDDING_INDEX_PRECISION is "halfvec" or "binary". They index expressions
+-- over the existing float32 column, so the full-precision embeddings stay in
+-- the table for re-scoring and no new column has to be backfilled. The
+-- expressions must match FIRST_PASS_DISTANCES in
+-- src/runtime/generate_api_payloads.py.
+SET maintenance_work_mem = '256MB';
+
+create index concurrently if not exists idx_openapi_operation_selection_prompt_embedding_halfvec_hnsw
+    on openapi_operation_selection_prompt
+    using hnsw ((selection_prompt_embedding::halfvec(384)) halfvec_cosine_ops)
+    with (m = 16, ef_construction = 64);
+
+create index concurrently if not exists idx_openapi_operation_selection_prompt_embedding_bit_hnsw
+    on openapi_operation_selection_prompt
+    using hnsw ((binary_quantize(selection_prompt_embedding)::bit(384)) bit_hamming_ops)
+    with (m = 16, ef_construction = 64);
+
+-- migrate:down transaction:false
+
+drop index concurrently if exists idx_openapi_operation_selection_prompt_embedding_bit_hnsw;
+drop index concurrently if exists idx_openapi_operation_selection_prompt_embedding_halfvec_hnsw;
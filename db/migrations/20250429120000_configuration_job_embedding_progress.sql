@@ -0,0 +1,11 @@
+-- migrate:up
+
+-- Progress of a config job's selection prompt embedding stage, which commits
+-- in chunks so that a retried job only embeds the prompts still missing.
+alter table configuration_job add column prompts_total integer;
+alter table configuration_job add column prompts_embedded integer;
+
+-- migrate:down
+
+alter table configuration_job drop column if exists prompts_embedded;
+alter table configuration_job drop column if exists prompts_total;
@@ -0,0 +1,21 @@
+-- migrate:up
+
+-- Sentence embeddings keyed by SHA-256 of (model name, text), so the config
+-- algorithm only runs the model on sentences it has never embedded before.
+create table embedding_cache (
+    content_hash bytea primary key,
+    model_name text not null,
+    embedding vector(384) not null,
+    created_at timestamp with time zone not null default now(),
+    last_used_at timestamp with time zone not null default now()
+);
+
+-- Pruning deletes the entries unused the longest
+create index idx_embedding_cache_last_used_at on embedding_cache (last_used_at);
+
+alter table configuration_job add column embedding_cache_hits integer;
+
+-- migrate:down
+
+alter table configuration_job drop column if exists embedding_cache_hits;
+drop table if exists embedding_cache;
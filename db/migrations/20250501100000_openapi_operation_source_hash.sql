@@ -0,0 +1,9 @@
+-- migrate:up
+
+-- Hash of each operation's source in the spec text, so that re-configuring an
+-- updated spec only regenerates the operations that changed.
+alter table openapi_operation add column source_hash bytea;
+
+-- migrate:down
+
+alter table openapi_operation drop column if exists source_hash;
@@ -60,7 +60,10 @@ CREATE TABLE public.configuration_job (
     openapi_spec_id uuid NOT NULL,
     status character varying(255) NOT NULL,
     start_timestamp timestamp without time zone DEFAULT now() NOT NULL,
-    end_timestamp timestamp without time zone
+    end_timestamp timestamp without time zone,
+    prompts_total integer,
+    prompts_embedded integer,
+    embedding_cache_hits integer
 );
 
 
@@ -99,6 +102,19 @@ CREATE TABLE public.cuecode_config (
 );
 
 
+--
+-- Name: embedding_cache; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.embedding_cache (
+    content_hash bytea NOT NULL,
+    model_name text NOT NULL,
+    embedding public.vector(384) NOT NULL,
+    created_at timestamp with time zone DEFAULT now() NOT NULL,
+    last_used_at timestamp with time zone DEFAULT now() NOT NULL
+);
+
+
 --
 -- Name: openapi_default_verb_http_equiv; Type: TABLE; Schema: public; Owner: -
 --
@@ -154,7 +170,8 @@ CREATE TABLE public.openapi_operation (
     openapi_server_id uuid NOT NULL,
     openapi_path_id uuid NOT NULL,
     http_verb public.http_verb NOT NULL,
-    llm_content_gen_tool_call_spec jsonb
+    llm_content_gen_tool_call_spec jsonb,
+    source_hash bytea
 );
 
 
@@ -212,7 +229,8 @@ CREATE TABLE public.openapi_spec (
     cuecode_config_id uuid NOT NULL,
     spec_text text NOT NULL,
     file_name character varying(255),
-    base_url character varying(255)
+    base_url character varying(255),
+    embeddings_updated_at timestamp with time zone
 );
 
 
@@ -317,6 +335,14 @@ ALTER TABLE ONLY public.cuecode_config
     ADD CONSTRAINT cuecode_config_pkey PRIMARY KEY (cuecode_config_id);
 
 
+--
+-- Name: embedding_cache embedding_cache_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.embedding_cache
+    ADD CONSTRAINT embedding_cache_pkey PRIMARY KEY (content_hash);
+
+
 --
 -- Name: openapi_default_verb_http_equiv openapi_default_verb_http_equiv_pkey; Type: CONSTRAINT; Schema: public; Owner: -
 --
@@ -481,6 +507,13 @@ CREATE INDEX idx_cuecode_api_key_account_id ON public.cuecode_api_key USING btre
 CREATE INDEX idx_cuecode_config_account_id ON public.cuecode_config USING btree (belongs_to_cuecode_account_id);
 
 
+--
+-- Name: idx_embedding_cache_last_used_at; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX idx_embedding_cache_last_used_at ON public.embedding_cache USING btree (last_used_at);
+
+
 --
 -- Name: idx_openapi_entity_dependency_child_id; Type: INDEX; Schema: public; Owner: -
 --
@@ -530,6 +563,27 @@ CREATE INDEX idx_openapi_operation_path_id ON public.openapi_operation USING btr
 CREATE INDEX idx_openapi_operation_server_id ON public.openapi_operation USING btree (openapi_server_id);
 
 
+--
+-- Name: idx_openapi_operation_selection_prompt_embedding_bit_hnsw; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX idx_openapi_operation_selection_prompt_embedding_bit_hnsw ON public.openapi_operation_selection_prompt USING hnsw (((public.binary_quantize(selection_prompt_embedding))::bit(384)) public.bit_hamming_ops) WITH (m='16', ef_construction='64');
+
+
+--
+-- Name: idx_openapi_operation_selection_prompt_embedding_halfvec_hnsw; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX idx_openapi_operation_selection_prompt_embedding_halfvec_hnsw ON public.openapi_operation_selection_prompt USING hnsw (((selection_prompt_embedding)::public.halfvec(384)) public.halfvec_cosine_ops) WITH (m='16', ef_construction='64');
+
+
+--
+-- Name: idx_openapi_operation_selection_prompt_embedding_hnsw; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX idx_openapi_operation_selection_prompt_embedding_hnsw ON public.openapi_operation_selection_prompt USING hnsw (selection_prompt_embedding public.vector_cosine_ops) WITH (m='16', ef_construction='64');
+
+
 --
 -- Name: idx_openapi_path_spec_id; Type: INDEX; Schema: public; Owner: -
 --
@@ -771,4 +825,10 @@ ALTER TABLE ONLY public.service_credential
 
 INSERT INTO public.schema_migrations (version) VALUES
     ('20250320014906'),
-    ('20250411023536');
+    ('20250411023536'),
+    ('20250425180000'),
+    ('20250426170000'),
+    ('20250428150000'),
+    ('20250429120000'),
+    ('20250430140000'),
+    ('20250501100000');
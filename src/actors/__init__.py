@@ -1,3 +1,12 @@
 """Dramatiq actors"""
 
-from .config_algo import actor_config_algo_openapi_spec
+import dramatiq
+
+from .config_algo import (
+    actor_config_algo_openapi_spec,
+    actor_fail_configuration_job,
+    actor_prune_embedding_cache,
+)
+from .middleware import WarmEmbeddingModel
+
+dramatiq.get_broker().add_middleware(WarmEmbeddingModel())
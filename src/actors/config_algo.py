@@ -5,12 +5,55 @@ import logging
 import dramatiq
 
 from common.database_engine import DBEngine
-from configuration.config_algo import config_algo_openapi
+from configuration.config_algo import (
+    PERMANENT_CONFIG_ERRORS,
+    config_algo_openapi,
+    fail_unfinished_configuration_job,
+)
+from configuration.config_algo_metrics import config_algo_metrics
+from configuration.embedding_cache import prune_embedding_cache
 
+# One pooled engine per worker process, shared by every job the process runs
+db_engine = DBEngine(process_type="worker")
 
-@dramatiq.actor
+
+# Invalid specs fail at once; other errors are retried, and the spec's job is
+# marked failed once the retries run out
+@dramatiq.actor(
+    throws=PERMANENT_CONFIG_ERRORS,
+    on_retry_exhausted="actor_fail_configuration_job",
+)
 def actor_config_algo_openapi_spec(spec_id: str):
     """Run CueCode config algo on the given OpenAPI spec saved in the DB"""
     logging.info("Processing OpenAPI spec ID %s", spec_id)
-    config_algo_openapi(DBEngine(), spec_id)
+    with config_algo_metrics().jobs_in_progress.track_inprogress():
+        config_algo_openapi(db_engine, spec_id)
     logging.info("Finished processing OpenAPI spec ID %s", spec_id)
+    actor_prune_embedding_cache.send()
+
+
+@dramatiq.actor
+def actor_fail_configuration_job(message_data: dict, retry_info: dict):
+    """Mark the configuration job of a config algo message whose retries ran
+    out as failed, so that it does not look in progress forever"""
+    spec_id = message_data["args"][0]
+    logging.error(
+        "Configuring OpenAPI spec ID %s failed after %d retries",
+        spec_id,
+        retry_info.get("retries", 0),
+    )
+    fail_unfinished_configuration_job(db_engine, spec_id)
+
+
+@dramatiq.actor
+def actor_prune_embedding_cache():
+    """Delete embedding cache entries unused for `EMBEDDING_CACHE_MAX_IDLE_DAYS`.
+    Sent after each config job, so the cache is kept in check without a
+    separate scheduler."""
+    session = db_engine.get_session()
+    try:
+        deleted = prune_embedding_cache(session)
+        session.commit()
+    finally:
+        session.remove()
+    logging.info("Pruned %d unused embedding cache entries", deleted)
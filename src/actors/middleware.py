@@ -0,0 +1,15 @@
+"""Dramatiq middleware for CueCode worker processes"""
+
+import dramatiq
+
+from common.app_config import EMBEDDING_MODEL_PRELOAD
+from common.embedding_model import warm_embedding_model
+
+
+class WarmEmbeddingModel(dramatiq.Middleware):
+    """Load the shared embedding model when a worker process boots, so the
+    first config job does not pay for the model load"""
+
+    def after_process_boot(self, broker):
+        if EMBEDDING_MODEL_PRELOAD:
+            warm_embedding_model()
@@ -6,9 +6,12 @@ import os
 from flask import Flask, jsonify, redirect
 
 from common import app_config
-from common.app_config import FlaskConfig
+from common.app_config import DB_MAX_OVERFLOW_WEB, DB_POOL_SIZE_WEB, FlaskConfig
+from common.database_engine import DBEngine
+from common.embedding_model import warm_embedding_model
 from common.models.base import db
 from common.models.cuecode_config import CuecodeConfig
+from common.vector_codec import register_vector_codec
 
 from .api import create_blueprint as create_api_blueprint
 from .portal import create_blueprint as create_portal_blueprint
@@ -21,7 +24,23 @@ def create_app():
     app.config.from_object(FlaskConfig())
 
     app.config["SQLALCHEMY_DATABASE_URI"] = app_config.SQLALCHEMY_DATABASE_URI
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_pre_ping": True,
+        "pool_size": DB_POOL_SIZE_WEB,
+        "max_overflow": DB_MAX_OVERFLOW_WEB,
+        "pool_timeout": app_config.SQLALCHEMY_POOL_TIMEOUT,
+    }
     db.init_app(app)
+    with app.app_context():
+        register_vector_codec(db.engine)
+
+    # Pooled engine for the runtime algorithm's queries, shared by all requests
+    db_engine = DBEngine(process_type="web")
+    app.extensions["cuecode_db_engine"] = db_engine
+
+    # Load the embedding model once per process, before requests arrive
+    if app_config.EMBEDDING_MODEL_PRELOAD:
+        warm_embedding_model()
 
     # Apply blueprints
     # https://flask.palletsprojects.com/en/stable/blueprints/
@@ -38,6 +57,7 @@ def create_app():
             {
                 "status": "UP",
                 "database": "UP - [To be worked upon]",  # TODO: add database health pylint: disable=fixme
+                "database_pool": db_engine.pool_stats(),
             }
         )
 
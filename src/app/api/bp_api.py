@@ -4,8 +4,16 @@ from functools import wraps
 
 from flask import Blueprint, current_app, jsonify, request
 
+from common.app_config import (
+    HNSW_EF_SEARCH,
+    HNSW_EF_SEARCH_MAX,
+    RUNTIME_BATCH_MAX_TEXTS,
+)
 from common.models.cuecode_config import CuecodeConfig
-from runtime.generate_api_payloads import simple_endpoint_search
+from runtime.embedding_batcher import query_embedding_batcher
+from runtime.generate_api_payloads import batch_endpoint_search, simple_endpoint_search
+from runtime.in_memory_vector_index import spec_vector_indexes
+from runtime.query_embedding_cache import query_embedding_cache
 
 API_KEY = "TEST_API_KEY"
 
@@ -23,6 +31,32 @@ def authenticate(f):
     return decorated_function
 
 
+def ef_search_from_request_body(data: dict) -> int | None:
+    """The requested HNSW ef_search, or None if the value is invalid"""
+    ef_search = data.get("ef_search", HNSW_EF_SEARCH)
+    # JSON true and false arrive as bool, which is a subclass of int
+    if (
+        not isinstance(ef_search, int)
+        or isinstance(ef_search, bool)
+        or not 1 <= ef_search <= HNSW_EF_SEARCH_MAX
+    ):
+        return None
+    return ef_search
+
+
+def invalid_ef_search_response():
+    """400 response for an out of range ef_search"""
+    return (
+        jsonify(
+            {
+                "error": "ef_search must be an integer from 1 to "
+                + str(HNSW_EF_SEARCH_MAX)
+            }
+        ),
+        400,
+    )
+
+
 def create_blueprint():
     """Flask Blueprint for the Web API that runs the CueCode runtime algorithm"""
 
@@ -46,12 +80,78 @@ def create_blueprint():
     @authenticate
     def show_endpoint_selections_for_input(cuecode_config_id):
         """Get the endpoints that the runtime algorithm selects
-        for a given natural language text. Results are nondeterministic."""
+        for a given natural language text. Results are nondeterministic.
+
+        Optional `ef_search` in the body trades recall (higher) for
+        latency (lower) in the vector index scan."""
         data = request.get_json()
-        endpoints = simple_endpoint_search(cuecode_config_id, data["text"])
+        ef_search = ef_search_from_request_body(data)
+        if ef_search is None:
+            return invalid_ef_search_response()
+        endpoints = simple_endpoint_search(
+            current_app.extensions["cuecode_db_engine"],
+            cuecode_config_id,
+            data["text"],
+            ef_search=ef_search,
+        )
         result = {"endpoints": endpoints}
         return jsonify(result)
 
+    @api_bp.route(
+        "/openapi/<cuecode_config_id>/show-endpoint-selections-for-inputs/",
+        methods=["POST"],
+    )
+    @authenticate
+    def show_endpoint_selections_for_inputs(cuecode_config_id):
+        """Batch version of `show_endpoint_selections_for_input`: takes a list
+        of `texts` and returns one result per text, in the same order."""
+        data = request.get_json()
+        texts = data.get("texts")
+        if (
+            not isinstance(texts, list)
+            or not texts
+            or len(texts) > RUNTIME_BATCH_MAX_TEXTS
+            or not all(isinstance(text, str) for text in texts)
+        ):
+            return (
+                jsonify(
+                    {
+                        "error": "texts must be a list of 1 to "
+                        + str(RUNTIME_BATCH_MAX_TEXTS)
+                        + " strings"
+                    }
+                ),
+                400,
+            )
+        ef_search = ef_search_from_request_body(data)
+        if ef_search is None:
+            return invalid_ef_search_response()
+        endpoint_lists = batch_endpoint_search(
+            current_app.extensions["cuecode_db_engine"],
+            cuecode_config_id,
+            texts,
+            ef_search=ef_search,
+        )
+        result = {
+            "results": [
+                {"text": text, "endpoints": endpoints}
+                for text, endpoints in zip(texts, endpoint_lists)
+            ]
+        }
+        return jsonify(result)
+
+    @api_bp.route("/runtime-stats", methods=["GET"])
+    @authenticate
+    def runtime_stats():
+        """Cache and resource statistics for this runtime process"""
+        return jsonify(
+            {
+                "query_embedding_cache": query_embedding_cache.stats(),
+                "query_embedding_batcher": query_embedding_batcher.stats(),
+                "spec_vector_indexes": spec_vector_indexes.stats(),
+            }
+        )
+
     # Recommended Blueprint 404 handling from Flask Docs
     # (https://flask.palletsprojects.com/en/stable/blueprints/#blueprint-error-handlers)
     # does not work, so we add a catch-all handler.
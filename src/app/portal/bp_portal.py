@@ -4,14 +4,29 @@ import logging
 import uuid
 from functools import wraps
 
-from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+from flask import (
+    Blueprint,
+    abort,
+    flash,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
 from flask_wtf import FlaskForm
+from sqlalchemy import func, select
 from werkzeug.utils import secure_filename
 from wtforms import FileField, PasswordField, StringField, SubmitField
 
 from actors import actor_config_algo_openapi_spec
-from common.models import Account, CuecodeConfig, OpenAPISpec
+from common.models import Account, ConfigurationJob, CuecodeConfig, OpenAPISpec
 from common.models.base import db
+from common.models.configuration_job import (
+    JOB_STATUS_FAILED,
+    JOB_STATUS_MAPPING,
+    JOB_STATUSES_FINISHED,
+)
 
 
 class OpenAPISpecUploadForm(FlaskForm):
@@ -43,6 +58,7 @@ def login_required(f):
     return decorated_function
 
 
+# pylint: disable-next=too-many-statements
 def create_blueprint():
     """Build the CueCode developer portal blueprint.
     For the prototype, this is a bare-bones web app used only to upload
@@ -74,11 +90,18 @@ def create_blueprint():
                     "utf-8"
                 )  # Read the content as text
 
-                # Create DB records
+                # Create DB records. The config belongs to the logged in
+                # account, which alone may update the spec later.
+                account = db.session.scalars(
+                    select(Account).where(Account.email == session.get("username"))
+                ).first()
                 cuecode_config = CuecodeConfig(
                     cuecode_config_id=uuid.uuid4(),
                     config_is_finished=False,
                     is_live=False,
+                    belongs_to_cuecode_account_id=(
+                        account.cuecode_account_id if account else None
+                    ),
                 )
                 db.session.add(cuecode_config)
 
@@ -100,6 +123,80 @@ def create_blueprint():
 
         return render_template("upload_spec.html", form=form)
 
+    @portal_bp.route("/update-spec/<uuid:spec_id>", methods=["GET", "POST"])
+    @login_required
+    def update_spec(spec_id):
+        # Replaces the text of an already configured spec. The config algorithm
+        # diffs it against the spec's configured operations and only
+        # regenerates the ones that were added or changed.
+        # Specs of other accounts' configs are not found.
+        owned_spec = (
+            select(OpenAPISpec)
+            .join(
+                CuecodeConfig,
+                CuecodeConfig.cuecode_config_id == OpenAPISpec.cuecode_config_id,
+            )
+            .join(
+                Account,
+                Account.cuecode_account_id
+                == CuecodeConfig.belongs_to_cuecode_account_id,
+            )
+            .where(OpenAPISpec.openapi_spec_id == spec_id)
+            .where(Account.email == session.get("username"))
+        )
+        if request.method == "POST":
+            # Lock the spec's row until the request's transaction ends, so
+            # that of two concurrent updates the second sees the job the first
+            # creates
+            owned_spec = owned_spec.with_for_update(of=OpenAPISpec)
+        openapi_spec = db.session.scalars(owned_spec).first()
+        if openapi_spec is None:
+            abort(404)
+        form = OpenAPISpecUploadForm()
+
+        if request.method == "POST" and form.validate_on_submit():
+            spec_file = form.spec_file.data
+
+            if spec_file:
+                unfinished_job = db.session.scalars(
+                    select(ConfigurationJob)
+                    .where(ConfigurationJob.openapi_spec_id == spec_id)
+                    .where(ConfigurationJob.status.not_in(JOB_STATUSES_FINISHED))
+                ).first()
+                if unfinished_job is not None:
+                    db.session.rollback()
+                    flash(
+                        "This spec is still being configured. "
+                        + "Try again when it has finished.",
+                        "warning",
+                    )
+                    return redirect(url_for("portal.update_spec", spec_id=spec_id))
+
+                # The config algorithm resumes this job rather than starting
+                # its own
+                job = ConfigurationJob(
+                    openapi_spec_id=spec_id, status=JOB_STATUS_MAPPING
+                )
+                db.session.add(job)
+                openapi_spec.file_name = secure_filename(spec_file.filename)
+                openapi_spec.spec_text = spec_file.read().decode("utf-8")
+                db.session.commit()
+
+                # Publish to queue. A job that was never queued would block
+                # every later update, so it is failed if publishing fails.
+                try:
+                    actor_config_algo_openapi_spec.send(str(spec_id))
+                except Exception:
+                    job.status = JOB_STATUS_FAILED
+                    job.end_timestamp = func.now()  # pylint: disable=not-callable
+                    db.session.commit()
+                    raise
+
+                flash("OpenAPI spec updated successfully!", "success")
+                return redirect(url_for("portal.update_spec", spec_id=spec_id))
+
+        return render_template("upload_spec.html", form=form, spec=openapi_spec)
+
     @portal_bp.route("/login", methods=["GET", "POST"])
     def login():
         # Check if already logged in
@@ -0,0 +1,3 @@
+"""Benchmarks for CueCode's performance-sensitive paths. Each module runs as a
+script, for example `python -m benchmarks.quantized_search --help` from
+`src/`, against the database configured in `.env`."""
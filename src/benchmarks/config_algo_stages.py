@@ -0,0 +1,404 @@
+"""Measure each stage of the config algorithm (`config_algo_openapi`) on OpenAPI
+specs, and compare the results with a saved baseline.
+
+The stages run in the order the config algorithm runs them: validate the spec
+against the OpenAPI schema, adapt it (resolve `$ref`s and apply CueCode's
+preprocessing), parse the OpenAPI model, map it with the config algorithm's
+own mapper (source hashes, the diff against the configured operations, tool
+call specs, selection prompt sentences and the bulk writes of their rows),
+embed the prompts and persist their embeddings. Each stage records its wall
+time, CPU time, the change in the process' RSS and the change in the number
+of objects tracked by the garbage collector. These are medians over
+`--repeat` runs, after `--warmup` runs that load the spaCy pipeline and
+embedding model.
+
+Without `--persist`, the mapper runs against a session that records the
+statements it is given instead of executing them, as if the spec had never
+been configured. With `--persist`, they are executed against the database
+configured in `.env`, the persist stage runs too, and the transaction is
+rolled back after each run.
+
+The `stub` embedding backend replaces the sentence embedding model with
+deterministic pseudo-random vectors, for fast runs without a model or GPU.
+
+    python -m benchmarks.config_algo_stages --embedding stub --output baseline.json
+    python -m benchmarks.config_algo_stages --embedding stub --compare baseline.json
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import jsonref
+import numpy as np
+
+from common.database_engine import DBEngine
+from common.embedding_model import embed_texts
+from common.models.cuecode_config import CuecodeConfig
+from common.models.openapi_operation import OpenAPIOperation
+from common.models.openapi_operation_selection import OpenAPIOperationSelectionPrompt
+from common.models.openapi_path import OpenAPIPath
+from common.models.openapi_spec import OpenAPISpec
+from common.vector_codec import as_float32_rows
+from configuration.openapi_mutation_model import build_openapi_model
+from configuration.openapi_operation_embedding import BULK_UPDATE_EMBEDDINGS_SQL
+from configuration.openapi_schema_adapter import OpenAPISchemaAdapter
+from configuration.openapi_schema_validate import (
+    list_validation_errors,
+    parse_spec_text,
+)
+from configuration.openapi_spec_diff import operation_source_hashes
+from configuration.openapi_validator_to_cuecode import (
+    openapi_spec_validator_to_cuecode_config,
+)
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures" / "openapi"
+DEFAULT_SPECS = [FIXTURES / "pet-store-31.json", FIXTURES / "nextcloud-v27-31.json"]
+
+STAGES = ["validate", "adapt", "parse", "map", "embed", "persist"]
+
+# Version of the baseline file layout
+BASELINE_FORMAT = 2
+
+# Metric -> the smallest increase that counts as a regression, however large
+# in relative terms. Sub-millisecond stages vary by more than any sensible
+# threshold from run to run. Times are overridden by `--min-seconds`.
+COMPARED_METRICS = {
+    "wall_s": 0.005,
+    "cpu_s": 0.005,
+    "rss_bytes": 2**20,
+    "gc_objects": 1000,
+}
+
+# Dimensions of the vectors the stub embedding backend makes, as the vector
+# columns in the DB expect
+STUB_EMBEDDING_DIMENSIONS = 384
+
+
+def stub_embed_texts(texts: List[str]) -> np.ndarray:
+    """Unit vectors seeded by each text, standing in for the embedding model"""
+    rows = np.empty((len(texts), STUB_EMBEDDING_DIMENSIONS), dtype=np.float32)
+    for i, text in enumerate(texts):
+        seed = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        rng = np.random.default_rng(int.from_bytes(seed, "little"))
+        rows[i] = rng.standard_normal(STUB_EMBEDDING_DIMENSIONS)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+EMBEDDING_BACKENDS: Dict[str, Callable[[List[str]], np.ndarray]] = {
+    "model": lambda texts: embed_texts(texts, normalize_embeddings=True),
+    "stub": stub_embed_texts,
+}
+
+
+def _rss_bytes() -> int:
+    # The second field of statm is the resident set size, in pages
+    with open("/proc/self/statm", encoding="ascii") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+# pylint: disable-next=too-few-public-methods
+class StageRecorder:
+    """Measurements of each stage of one run, by stage"""
+
+    def __init__(self):
+        self.stages: Dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measure the `with` block as stage `name`"""
+        # Garbage from the previous stage is not charged to this one
+        gc.collect()
+        objects_before = len(gc.get_objects())
+        rss_before = _rss_bytes()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        yield
+        self.stages[name] = {
+            "wall_s": time.perf_counter() - wall_start,
+            "cpu_s": time.process_time() - cpu_start,
+            "rss_bytes": _rss_bytes() - rss_before,
+            "gc_objects": len(gc.get_objects()) - objects_before,
+        }
+
+
+class _NoRows(list):
+    """The result of a query run without a database"""
+
+    def first(self) -> None:
+        """No row"""
+        return None
+
+
+class RecordingSession:
+    """Stands in for the session the config algorithm maps a spec with. The
+    statements it is given are recorded, and executed with `session` if there
+    is one; otherwise queries return no rows, as for a spec that was never
+    configured."""
+
+    def __init__(self, session=None):
+        self.session = session
+        self.executed: List[Tuple[Any, Any]] = []
+
+    def execute(self, statement, params=None):
+        """Record and run a statement"""
+        self.executed.append((statement, params))
+        if self.session is None:
+            return _NoRows()
+        return self.session.execute(statement, params)
+
+    def scalars(self, statement):
+        """Run a query for single values, which is not recorded"""
+        if self.session is None:
+            return _NoRows()
+        return self.session.scalars(statement)
+
+    def add(self, instance):
+        """Add an ORM object to the session, if there is one"""
+        if self.session is not None:
+            self.session.add(instance)
+
+    def flush(self):
+        """Flush the session, if there is one"""
+        if self.session is not None:
+            self.session.flush()
+
+    def inserted_rows(self, model) -> List[dict]:
+        """The rows inserted in bulk into `model`'s table, in order"""
+        return [
+            row
+            for statement, params in self.executed
+            if getattr(statement, "is_insert", False)
+            and statement.table.name == model.__tablename__
+            for row in params
+        ]
+
+
+def add_spec(db_session, spec_id: uuid.UUID, spec_text: str) -> OpenAPISpec:
+    """A spec as the config algorithm reads it, added to `db_session` with its
+    config if there is one"""
+    db_spec = OpenAPISpec(openapi_spec_id=spec_id, spec_text=spec_text)
+    if db_session is not None:
+        config = CuecodeConfig()
+        db_session.add(config)
+        db_session.flush()
+        db_spec.cuecode_config_id = config.cuecode_config_id
+        db_session.add(db_spec)
+        db_session.flush()
+    return db_spec
+
+
+def run_stages(
+    spec_text: str, embedding: str, db_engine: DBEngine | None = None
+) -> Tuple[Dict[str, dict], Dict[str, int]]:
+    """Measurements of each stage of one run over the spec, and the counts of
+    what it produced. Rows are only written, and the persist stage only runs,
+    with a `db_engine`."""
+    recorder = StageRecorder()
+    spec_id = uuid.uuid4()
+    db_session = db_engine.get_session() if db_engine is not None else None
+    session = RecordingSession(db_session)
+    try:
+        db_spec = add_spec(db_session, spec_id, spec_text)
+        with recorder.stage("validate"):
+            raw = parse_spec_text(spec_text)
+            # Specs with errors in parts the mapping ignores are still measured
+            errors = list_validation_errors(raw)
+        with recorder.stage("adapt"):
+            resolved = jsonref.replace_refs(raw, lazy_load=False)
+            OpenAPISchemaAdapter.clean_json_dict(resolved)
+            if not resolved.get("servers"):
+                resolved["servers"] = [{"url": "/"}]
+        with recorder.stage("parse"):
+            model = build_openapi_model(
+                spec_id, resolved["servers"][0]["url"], resolved
+            )
+        with recorder.stage("map"):
+            openapi_spec_validator_to_cuecode_config(
+                session, model, db_spec, operation_source_hashes(raw)
+            )
+        prompts = session.inserted_rows(OpenAPIOperationSelectionPrompt)
+        with recorder.stage("embed"):
+            embeddings = EMBEDDING_BACKENDS[embedding](
+                [row["selection_prompt"] for row in prompts]
+            )
+        if db_session is not None:
+            with recorder.stage("persist"):
+                if prompts:
+                    db_session.execute(
+                        BULK_UPDATE_EMBEDDINGS_SQL,
+                        {
+                            "prompt_ids": [
+                                str(row["openapi_operation_selection_prompt_id"])
+                                for row in prompts
+                            ],
+                            "embeddings": as_float32_rows(embeddings),
+                        },
+                    )
+                db_session.flush()
+    finally:
+        if db_session is not None:
+            db_session.rollback()
+            db_session.remove()
+    counts = {
+        "validation_errors": len(errors),
+        "paths": len(session.inserted_rows(OpenAPIPath)),
+        "operations": len(session.inserted_rows(OpenAPIOperation)),
+        "selection_prompts": len(prompts),
+    }
+    return recorder.stages, counts
+
+
+# pylint: disable-next=too-many-arguments, too-many-positional-arguments
+def benchmark_spec(
+    spec_text: str,
+    embedding: str,
+    repeat: int,
+    warmup: int = 1,
+    db_engine: DBEngine | None = None,
+) -> dict:
+    """Median measurements of each stage over `repeat` runs, with the counts of
+    what a run produced"""
+    for _ in range(warmup):
+        run_stages(spec_text, embedding, db_engine)
+    runs = []
+    for _ in range(repeat):
+        stages, counts = run_stages(spec_text, embedding, db_engine)
+        runs.append(stages)
+    return {
+        "counts": counts,
+        "stages": {
+            stage: {
+                metric: statistics.median(run[stage][metric] for run in runs)
+                for metric in COMPARED_METRICS
+            }
+            for stage in STAGES
+            if stage in runs[0]
+        },
+    }
+
+
+# pylint: disable-next=too-many-locals
+def compare_results(
+    baseline: dict, current: dict, threshold: float, min_seconds: float | None = None
+) -> List[str]:
+    """A description of each metric of `current` that is more than `threshold`
+    (a fraction) above its value in `baseline`. Specs and stages missing from
+    either are not compared."""
+    floors = dict(COMPARED_METRICS)
+    if min_seconds is not None:
+        floors["wall_s"] = floors["cpu_s"] = min_seconds
+    regressions = []
+    for spec, result in current["specs"].items():
+        baseline_stages = baseline["specs"].get(spec, {}).get("stages", {})
+        for stage, metrics in result["stages"].items():
+            for metric, floor in floors.items():
+                before = baseline_stages.get(stage, {}).get(metric)
+                if before is None:
+                    continue
+                after = metrics[metric]
+                if after > before * (1 + threshold) and after - before > floor:
+                    change = f"+{(after / before - 1) * 100:.0f}%" if before else "new"
+                    regressions.append(
+                        f"{spec} {stage} {metric}: {before:.6g} -> {after:.6g}"
+                        + f" ({change})"
+                    )
+    return regressions
+
+
+def print_results(results: dict):
+    """Print a table of each spec's stage measurements"""
+    for spec, result in results["specs"].items():
+        counts = ", ".join(f"{value} {key}" for key, value in result["counts"].items())
+        print(f"{spec}: {counts}")
+        print(
+            f"  {'stage':<10} {'wall ms':>9} {'cpu ms':>9}"
+            + f" {'RSS +MiB':>9} {'objects':>9}"
+        )
+        for stage, metrics in result["stages"].items():
+            print(
+                f"  {stage:<10} {metrics['wall_s'] * 1000:>9.1f}"
+                + f" {metrics['cpu_s'] * 1000:>9.1f}"
+                + f" {metrics['rss_bytes'] / 2**20:>9.1f}"
+                + f" {metrics['gc_objects']:>9.0f}"
+            )
+
+
+def main():
+    """Run the benchmark, print the results, and save or compare them"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument(
+        "--spec", type=Path, action="append", help="default: the test fixtures"
+    )
+    parser.add_argument(
+        "--embedding", choices=sorted(EMBEDDING_BACKENDS), default="model"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--persist", action="store_true")
+    parser.add_argument("--output", type=Path, help="save the results as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="fraction above the baseline that counts as a regression",
+    )
+    parser.add_argument("--min-seconds", type=float, default=COMPARED_METRICS["wall_s"])
+    args = parser.parse_args()
+
+    db_engine = DBEngine() if args.persist else None
+    results = {
+        "format": BASELINE_FORMAT,
+        "python": platform.python_version(),
+        "embedding": args.embedding,
+        "repeat": args.repeat,
+        "specs": {
+            spec.name: benchmark_spec(
+                spec.read_text(encoding="utf-8"),
+                args.embedding,
+                args.repeat,
+                args.warmup,
+                db_engine,
+            )
+            for spec in args.spec or DEFAULT_SPECS
+        },
+    }
+    print_results(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if baseline.get("format") != BASELINE_FORMAT:
+            print(
+                f"Warning: the baseline's format is {baseline.get('format')},"
+                + f" not {BASELINE_FORMAT}; its stages may not measure the same work"
+            )
+        if baseline.get("embedding") != args.embedding:
+            print(
+                f"Warning: the baseline used the {baseline.get('embedding')}"
+                + " embedding backend"
+            )
+        regressions = compare_results(
+            baseline, results, args.threshold, args.min_seconds
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} of {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
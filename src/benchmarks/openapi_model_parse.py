@@ -0,0 +1,108 @@
+"""Compare the time and memory it takes to build the config algorithm's OpenAPI
+model in full and from the mutating operations only (see
+`OPENAPI_MODEL_MUTATIONS_ONLY`).
+
+The spec is parsed and its `$ref`s resolved once, as the config algorithm's
+loading stage does, and only the model build is measured. Validation against
+the OpenAPI schema is skipped, so that specs with errors in parts the mapping
+ignores can still be compared. A build that fails still reports its time.
+
+    python -m benchmarks.openapi_model_parse --spec tests/fixtures/openapi/nextcloud-v27-31.json
+"""
+
+import argparse
+import gc
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from uuid import uuid4
+
+import jsonref
+from pydantic import ValidationError
+
+from configuration.openapi_mutation_model import build_openapi_model
+from configuration.openapi_schema_adapter import OpenAPISchemaAdapter
+from configuration.openapi_schema_validate import parse_spec_text
+
+DEFAULT_SPEC = (
+    Path(__file__).parent.parent
+    / "tests"
+    / "fixtures"
+    / "openapi"
+    / "nextcloud-v27-31.json"
+)
+
+MODES = {"full": False, "mutations-only": True}
+
+
+def load_resolved_spec(spec_text: str) -> dict:
+    """The spec parsed, with its `$ref`s resolved and CueCode's preprocessing
+    applied. A spec without servers gets the default server, `/`."""
+    resolved = jsonref.replace_refs(parse_spec_text(spec_text), lazy_load=False)
+    OpenAPISchemaAdapter.clean_json_dict(resolved)
+    if not resolved.get("servers"):
+        resolved["servers"] = [{"url": "/"}]
+    return resolved
+
+
+def benchmark_mode(data: dict, mutations_only: bool, repeat: int) -> dict:
+    """Mean and best build time, peak and retained memory of the model, and
+    the number of validation errors if it could not be built"""
+    base_url = data["servers"][0]["url"]
+    times_ms = []
+    errors = 0
+    # The first build of each model class pays for pydantic's setup
+    for attempt in range(repeat + 1):
+        # Garbage from the previous build is not charged to this one
+        gc.collect()
+        start = time.perf_counter()
+        try:
+            build_openapi_model(uuid4(), base_url, data, mutations_only)
+        except ValidationError as e:
+            errors = e.error_count()
+        if attempt > 0:
+            times_ms.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        model = build_openapi_model(uuid4(), base_url, data, mutations_only)
+    except ValidationError:
+        model = None
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del model
+    return {
+        "mean_ms": statistics.mean(times_ms),
+        "best_ms": min(times_ms),
+        "peak_bytes": peak,
+        "retained_bytes": retained,
+        "errors": errors,
+    }
+
+
+def main():
+    """Run the benchmark and print a table of results"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--spec", type=Path, default=DEFAULT_SPEC)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = load_resolved_spec(args.spec.read_text(encoding="utf-8"))
+    print(f"{args.spec.name}: {len(data.get('paths') or {})} paths")
+    print(
+        f"{'mode':<15} {'mean ms':>9} {'best ms':>9}"
+        + f" {'peak MiB':>9} {'kept MiB':>9}  result"
+    )
+    for mode, mutations_only in MODES.items():
+        result = benchmark_mode(data, mutations_only, args.repeat)
+        outcome = f"{result['errors']} errors" if result["errors"] else "ok"
+        print(
+            f"{mode:<15} {result['mean_ms']:>9.1f} {result['best_ms']:>9.1f}"
+            + f" {result['peak_bytes'] / 2**20:>9.1f}"
+            + f" {result['retained_bytes'] / 2**20:>9.1f}  {outcome}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Compare recall and latency of the endpoint search for each embedding index
+precision (see `EMBEDDING_INDEX_PRECISION`) on one configured spec.
+
+Ground truth is an exact, brute-force search over the spec's full-precision
+embeddings. Recall@k is the fraction of the exact top-k operations that the
+indexed search also returns.
+
+    python -m benchmarks.quantized_search --spec-id <uuid> --queries queries.txt
+"""
+
+import argparse
+import statistics
+import time
+from typing import List
+
+from common.app_config import (
+    HNSW_EF_SEARCH,
+    RUNTIME_SEARCH_AGGREGATION,
+    RUNTIME_SEARCH_CANDIDATES_PER_RESULT,
+)
+from common.database_engine import DBEngine
+from common.embedding_model import embed_texts
+from runtime.generate_api_payloads import (
+    build_search_sql,
+    search_params,
+    set_index_search_options,
+)
+from runtime.in_memory_vector_index import (
+    aggregate_by_operation,
+    load_spec_vector_index,
+)
+
+PRECISIONS = ["full", "halfvec", "binary"]
+
+INDEX_SIZES_SQL = """
+SELECT indexrelid::regclass::text, pg_relation_size(indexrelid)
+FROM pg_index
+WHERE indrelid = 'openapi_operation_selection_prompt'::regclass
+    AND indexrelid::regclass::text LIKE '%%hnsw'
+"""
+
+
+def recall_at_k(found_ids: List, exact_ids: List) -> float:
+    """Fraction of `exact_ids` that also appear in `found_ids`"""
+    if not exact_ids:
+        return 1.0
+    return len(set(found_ids) & set(exact_ids)) / len(exact_ids)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `values`"""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+# pylint: disable-next=too-many-arguments, too-many-positional-arguments, too-many-locals
+def benchmark_precision(
+    db_engine: DBEngine,
+    spec_id: str,
+    embeddings,
+    exact_ids: List[List],
+    precision: str,
+    limit: int,
+    ef_search: int,
+    repeat: int,
+) -> dict:
+    """Mean recall@`limit` and latency percentiles for one index precision"""
+    sql = build_search_sql("%(embedding)s", precision, RUNTIME_SEARCH_AGGREGATION)
+    params = search_params(spec_id, limit, RUNTIME_SEARCH_CANDIDATES_PER_RESULT)
+    latencies_ms: List[float] = []
+    recalls: List[float] = []
+    for embedding, exact in zip(embeddings, exact_ids):
+        for attempt in range(repeat):
+            with db_engine.connection() as conn:
+                set_index_search_options(conn, ef_search)
+                start = time.perf_counter()
+                rows = conn.exec_driver_sql(
+                    sql, {"embedding": embedding, **params}
+                ).fetchall()
+                latencies_ms.append((time.perf_counter() - start) * 1000)
+            if attempt == 0:
+                recalls.append(recall_at_k([row[1] for row in rows], exact))
+    return {
+        "precision": precision,
+        "recall": statistics.mean(recalls),
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+    }
+
+
+def main():
+    """Run the benchmark and print a table of results"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--spec-id", required=True)
+    parser.add_argument(
+        "--queries", required=True, help="text file with one query per line"
+    )
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, default=HNSW_EF_SEARCH)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--precisions", default=",".join(PRECISIONS))
+    args = parser.parse_args()
+
+    with open(args.queries, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    embeddings = embed_texts(queries, normalize_embeddings=True)
+
+    db_engine = DBEngine()
+    with db_engine.connection() as conn:
+        exact_index = load_spec_vector_index(conn, args.spec_id)
+        # pylint: disable-next=no-member
+        index_sizes = conn.exec_driver_sql(INDEX_SIZES_SQL).fetchall()
+    all_prompts = len(exact_index.operation_ids)
+    exact_ids = [
+        [
+            row[1]
+            for row in aggregate_by_operation(
+                rows, args.limit, RUNTIME_SEARCH_AGGREGATION
+            )
+        ]
+        for rows in exact_index.search_many(embeddings, all_prompts)
+    ]
+
+    print(f"{len(queries)} queries, {all_prompts} prompts, recall@{args.limit}")
+    print(f"{'precision':<10} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for precision in args.precisions.split(","):
+        result = benchmark_precision(
+            db_engine,
+            args.spec_id,
+            embeddings,
+            exact_ids,
+            precision,
+            args.limit,
+            args.ef_search,
+            args.repeat,
+        )
+        print(
+            f"{precision:<10} {result['recall']:>7.3f}"
+            + f" {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}"
+        )
+    for name, size in index_sizes:
+        print(f"{name}: {size / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
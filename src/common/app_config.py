@@ -21,10 +21,165 @@ SQLALCHEMY_POOL_RECYCLE = int(os.getenv("SQLALCHEMY_POOL_RECYCLE", "35"))
 SQLALCHEMY_POOL_TIMEOUT = int(os.getenv("SQLALCHEMY_POOL_TIMEOUT", "7"))
 SQLALCHEMY_DATABASE_URI = DB_URI
 
+# Connection pool sizing per process type. The web app serves concurrent
+# request threads; Dramatiq workers run few threads and hold long transactions.
+DB_POOL_SIZE_WEB = int(os.getenv("DB_POOL_SIZE_WEB", "5"))
+DB_MAX_OVERFLOW_WEB = int(os.getenv("DB_MAX_OVERFLOW_WEB", "5"))
+DB_POOL_SIZE_WORKER = int(os.getenv("DB_POOL_SIZE_WORKER", "2"))
+DB_MAX_OVERFLOW_WORKER = int(os.getenv("DB_MAX_OVERFLOW_WORKER", "0"))
+
 LLM_BASE_URL = str(os.getenv("LLM_BASE_URL"))
 LLM_API_KEY = str(os.getenv("LLM_API_KEY"))
 LLM_MODEL = str(os.getenv("LLM_MODEL"))
 
+# Sentence embedding model shared by the runtime search and the config algorithm.
+# The vector columns in the DB are sized for this model (384 dims).
+EMBEDDING_MODEL_NAME = os.getenv(
+    "EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"
+)
+# Load the embedding model when the Flask app or Dramatiq worker process starts,
+# rather than on the first request that needs it.
+EMBEDDING_MODEL_PRELOAD = os.getenv("EMBEDDING_MODEL_PRELOAD", "true").lower() == "true"
+# The config algorithm embeds and commits selection prompts in chunks of this
+# size, so a retried job resumes where the last one stopped.
+EMBEDDING_CHUNK_SIZE = int(os.getenv("EMBEDDING_CHUNK_SIZE", "256"))
+# Persistent cache of selection prompt embeddings, shared by all specs and
+# re-uploads. Entries no config job has used for this many days are pruned.
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_MAX_IDLE_DAYS = int(os.getenv("EMBEDDING_CACHE_MAX_IDLE_DAYS", "90"))
+
+# spaCy pipeline that splits operation descriptions into selection prompt
+# sentences. Only its sentence segmenter runs. If the package is not installed,
+# splitting fails, unless SPACY_SENTENCE_FALLBACK is set, in which case spaCy's
+# rule-based sentencizer is used instead; it splits some descriptions
+# differently, so it changes selection prompts and their embeddings. Specs with
+# more than SPACY_SENTENCE_MIN_TEXTS_PER_PROCESS descriptions per process are
+# split with up to SPACY_SENTENCE_N_PROCESS worker processes.
+SPACY_SENTENCE_MODEL = os.getenv("SPACY_SENTENCE_MODEL", "en_core_web_sm")
+SPACY_SENTENCE_FALLBACK = (
+    os.getenv("SPACY_SENTENCE_FALLBACK", "false").lower() == "true"
+)
+SPACY_SENTENCE_N_PROCESS = int(os.getenv("SPACY_SENTENCE_N_PROCESS", "1"))
+SPACY_SENTENCE_MIN_TEXTS_PER_PROCESS = int(
+    os.getenv("SPACY_SENTENCE_MIN_TEXTS_PER_PROCESS", "500")
+)
+
+# Worker processes the config algorithm uses to build operations' LLM tool call
+# specs. Specs with fewer operations than CONFIG_ALGO_PARALLEL_MIN_OPERATIONS,
+# or a worker count of 1, are processed serially in the calling process. The
+# pool is started from a forkserver on first use (about 9 s) and kept for the
+# life of the process. Serial builds take about 0.1 ms per operation, while
+# sending an operation to a worker and its spec back costs the calling process
+# about 0.07 ms, so workers only pay off for very large specs on hosts with
+# cores to spare beyond the Dramatiq worker processes; by default specs are
+# built serially.
+CONFIG_ALGO_WORKERS = int(os.getenv("CONFIG_ALGO_WORKERS", "1"))
+CONFIG_ALGO_PARALLEL_MIN_OPERATIONS = int(
+    os.getenv("CONFIG_ALGO_PARALLEL_MIN_OPERATIONS", "2000")
+)
+# Build the config algorithm's OpenAPI model from the mutating operations only
+# (POST, PATCH, PUT and DELETE), without responses, callbacks, components,
+# webhooks or tags, which the config algorithm never reads
+OPENAPI_MODEL_MUTATIONS_ONLY = (
+    os.getenv("OPENAPI_MODEL_MUTATIONS_ONLY", "true").lower() == "true"
+)
+# Specs of at least OPENAPI_STREAMING_MIN_BYTES of text are mapped from a
+# stream of their path items rather than loaded as one document, making tool
+# call specs and selection prompts for OPENAPI_STREAMING_BATCH_OPERATIONS
+# operations at a time and writing each batch's rows before the next. Only the
+# spec without its paths is validated against the OpenAPI schema; path items
+# are validated by the OpenAPI models.
+OPENAPI_STREAMING_MIN_BYTES = int(
+    os.getenv("OPENAPI_STREAMING_MIN_BYTES", str(16 * 2**20))
+)
+OPENAPI_STREAMING_BATCH_OPERATIONS = int(
+    os.getenv("OPENAPI_STREAMING_BATCH_OPERATIONS", "1000")
+)
+# Tool call specs inline the schemas their $refs point to, up to this many
+# references deep. Deeper and recursive references are written once under the
+# parameters' "$defs" and referenced from there; 0 references every schema.
+TOOL_CALL_SPEC_MAX_REF_DEPTH = int(os.getenv("TOOL_CALL_SPEC_MAX_REF_DEPTH", "8"))
+# Compact tool call specs before storing them: schema keywords listed in
+# TOOL_CALL_SPEC_STRIP_KEYS, vendor extensions other than x-cuecode-*, and
+# examples longer than TOOL_CALL_SPEC_MAX_EXAMPLE_BYTES of JSON are dropped.
+# Sizes are reported in bytes and in tokens of TOOL_CALL_SPEC_TOKEN_ENCODING
+# (estimated from the bytes if tiktoken or the encoding is not available).
+TOOL_CALL_SPEC_COMPACT = os.getenv("TOOL_CALL_SPEC_COMPACT", "true").lower() == "true"
+TOOL_CALL_SPEC_STRIP_KEYS = os.getenv(
+    "TOOL_CALL_SPEC_STRIP_KEYS", "xml,externalDocs,$comment,$schema,$id"
+).split(",")
+TOOL_CALL_SPEC_MAX_EXAMPLE_BYTES = int(
+    os.getenv("TOOL_CALL_SPEC_MAX_EXAMPLE_BYTES", "256")
+)
+TOOL_CALL_SPEC_TOKEN_ENCODING = os.getenv(
+    "TOOL_CALL_SPEC_TOKEN_ENCODING", "cl100k_base"
+)
+# Rows per multi-row INSERT statement when the config algorithm writes a
+# spec's paths, operations and selection prompts
+CONFIG_BULK_INSERT_BATCH_SIZE = int(os.getenv("CONFIG_BULK_INSERT_BATCH_SIZE", "1000"))
+
+# HNSW index search settings for the runtime endpoint search.
+# ef_search is the size of the candidate list: higher means better recall and
+# slower queries. API callers may override it per request within these bounds.
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+HNSW_EF_SEARCH_MAX = int(os.getenv("HNSW_EF_SEARCH_MAX", "1000"))
+# pgvector >= 0.8 can keep scanning the index until enough rows pass the
+# spec filter. Set to "off" for older pgvector versions.
+HNSW_ITERATIVE_SCAN = os.getenv("HNSW_ITERATIVE_SCAN", "relaxed_order")
+
+# The runtime endpoint search returns distinct operations. It considers this
+# many nearest selection prompts per requested result, then scores each
+# operation by its best prompt ("max") or the mean of its candidate prompts
+# ("mean").
+RUNTIME_SEARCH_CANDIDATES_PER_RESULT = int(
+    os.getenv("RUNTIME_SEARCH_CANDIDATES_PER_RESULT", "5")
+)
+RUNTIME_SEARCH_AGGREGATION = os.getenv("RUNTIME_SEARCH_AGGREGATION", "max")
+
+# Which HNSW index the Postgres endpoint search scans for candidates: "full"
+# float32 vectors, "halfvec" (float16, half the index memory) or "binary"
+# (1 bit per dimension, 1/32 of the memory). The quantized modes take
+# RUNTIME_SEARCH_RERANK_FACTOR times as many candidates from their index and
+# re-score them against the full-precision embeddings. Binary quantization
+# loses more recall, so it usually wants a larger factor.
+EMBEDDING_INDEX_PRECISION = os.getenv("EMBEDDING_INDEX_PRECISION", "full")
+RUNTIME_SEARCH_RERANK_FACTOR = int(os.getenv("RUNTIME_SEARCH_RERANK_FACTOR", "4"))
+
+# Where the runtime endpoint search finds nearest neighbours: "postgres" runs
+# the pgvector index query per request; "memory" keeps each spec's embeddings
+# in a NumPy matrix in the web process and only asks Postgres for changes.
+RUNTIME_SEARCH_BACKEND = os.getenv("RUNTIME_SEARCH_BACKEND", "postgres")
+# Memory budget for all in-memory spec indexes in one process; least recently
+# used specs are dropped first.
+RUNTIME_VECTOR_INDEX_MAX_BYTES = int(
+    os.getenv("RUNTIME_VECTOR_INDEX_MAX_BYTES", str(512 * 2**20))
+)
+# How often a cached spec index checks whether the spec was re-configured
+RUNTIME_VECTOR_INDEX_REVALIDATE_SECONDS = float(
+    os.getenv("RUNTIME_VECTOR_INDEX_REVALIDATE_SECONDS", "30")
+)
+
+# Largest number of texts accepted by one batch endpoint selection request
+RUNTIME_BATCH_MAX_TEXTS = int(os.getenv("RUNTIME_BATCH_MAX_TEXTS", "1000"))
+
+# In-process cache of runtime query embeddings, so repeated phrasings skip
+# model inference. Set the size to 0 to disable the cache.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(
+    os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600")
+)
+
+# Concurrent runtime queries that miss the cache are embedded together: the
+# first query in a micro-batch waits at most this many milliseconds for others
+# to join, and a batch holds at most this many texts. Set the wait to 0 to
+# embed each query as soon as the model is free.
+RUNTIME_EMBEDDING_BATCH_MAX_SIZE = int(
+    os.getenv("RUNTIME_EMBEDDING_BATCH_MAX_SIZE", "32")
+)
+RUNTIME_EMBEDDING_BATCH_MAX_WAIT_MS = float(
+    os.getenv("RUNTIME_EMBEDDING_BATCH_MAX_WAIT_MS", "5")
+)
+
 
 # Flask
 # pylint: disable-next=too-few-public-methods
@@ -1,32 +1,97 @@
 """Management of SQLAlchemy database engine"""
 
-from sqlalchemy import create_engine
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import Connection, create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import scoped_session, sessionmaker
 
-from .app_config import DB_URI, SQLALCHEMY_POOL_RECYCLE, SQLALCHEMY_POOL_TIMEOUT
+from .app_config import (
+    DB_MAX_OVERFLOW_WEB,
+    DB_MAX_OVERFLOW_WORKER,
+    DB_POOL_SIZE_WEB,
+    DB_POOL_SIZE_WORKER,
+    DB_URI,
+    SQLALCHEMY_POOL_RECYCLE,
+    SQLALCHEMY_POOL_TIMEOUT,
+)
+from .vector_codec import register_vector_codec
 
 # See https://docs.sqlalchemy.org/en/20/core/pooling.html#dealing-with-disconnects
 # on how the pre_pool_ping prevents errors.
 
 # TODO: Flask SQLALchemy configuration function. pylint: disable=fixme
 
+# (pool_size, max_overflow) for each kind of process that talks to the DB
+POOL_SIZES_BY_PROCESS_TYPE = {
+    "web": (DB_POOL_SIZE_WEB, DB_MAX_OVERFLOW_WEB),
+    "worker": (DB_POOL_SIZE_WORKER, DB_MAX_OVERFLOW_WORKER),
+}
+
 
-class DBEngine:  # pylint: disable=too-few-public-methods
+class DBEngine:
     """Wrapper class for use in Dramatiq worker processes, not tied to
     Flask and does not instantiate connections by importing this module; must
     create a class instance first, which is good because this code will
     be imported by both the Flask app container code and the Dramatiq worker
-    container code."""
+    container code.
+
+    The engine holds a bounded connection pool sized for `process_type`.
+    Checking out a connection waits at most `SQLALCHEMY_POOL_TIMEOUT` seconds.
+    Connections bind and return embeddings as NumPy arrays; see `vector_codec`."""
 
-    def __init__(self):
+    def __init__(self, process_type: str = "worker"):
+        pool_size, max_overflow = POOL_SIZES_BY_PROCESS_TYPE[process_type]
+        self.process_type = process_type
         self.engine = create_engine(
             DB_URI,
             pool_pre_ping=True,
             pool_recycle=SQLALCHEMY_POOL_RECYCLE,
             pool_timeout=SQLALCHEMY_POOL_TIMEOUT,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
         )
+        self._stats_lock = threading.Lock()
+        self._checkout_timeouts = 0
+        self._peak_checked_out = 0
+        register_vector_codec(self.engine)
+        event.listen(self.engine, "checkout", self._on_checkout)
 
     def get_session(self) -> scoped_session:
         """Get a SQLALchemy session from the DB engine"""
         session_factory = sessionmaker(self.engine)
         return scoped_session(session_factory)
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """Check a connection out of the pool for the duration of the `with`
+        block. The connection goes back to the pool (rolled back) on exit."""
+        try:
+            conn = self.engine.connect()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self._checkout_timeouts += 1
+            raise
+        with conn:
+            yield conn
+
+    def pool_stats(self) -> dict:
+        """Pool saturation metrics for health checks and monitoring"""
+        pool = self.engine.pool
+        pool_size, max_overflow = POOL_SIZES_BY_PROCESS_TYPE[self.process_type]
+        with self._stats_lock:
+            return {
+                "process_type": self.process_type,
+                "capacity": pool_size + max_overflow,
+                "checked_out": pool.checkedout(),  # type: ignore[attr-defined]
+                "idle": pool.checkedin(),  # type: ignore[attr-defined]
+                "peak_checked_out": self._peak_checked_out,
+                "checkout_timeouts": self._checkout_timeouts,
+            }
+
+    def _on_checkout(self, *_args):
+        checked_out = self.engine.pool.checkedout()  # type: ignore[attr-defined]
+        with self._stats_lock:
+            self._peak_checked_out = max(self._peak_checked_out, checked_out)
@@ -0,0 +1,113 @@
+"""Process-wide registry of sentence embedding models. Loading a model is slow
+and memory hungry, so each process loads a given model once and shares it
+between all request/worker threads.
+
+All code that embeds text should go through `embed_texts()` rather than
+constructing its own `SentenceTransformer`."""
+
+import logging
+import resource
+import threading
+import time
+from dataclasses import dataclass
+from typing import List
+
+from numpy import ndarray
+from sentence_transformers import SentenceTransformer
+
+from .app_config import EMBEDDING_MODEL_NAME
+
+
+@dataclass(frozen=True)
+class EmbeddingModelLoadStats:
+    """What it cost to load one embedding model into this process"""
+
+    model_name: str
+    load_seconds: float
+    parameter_bytes: int
+    """Size of the model weights held in memory"""
+    peak_rss_growth_bytes: int
+    """Growth of the process' peak resident set size during the load"""
+
+
+# pylint: disable-next=too-few-public-methods
+class _RegisteredModel:
+    """A loaded model plus the lock that serializes calls into it. The Hugging
+    Face fast tokenizers are not safe to call from several threads at once."""
+
+    def __init__(self, model: SentenceTransformer, stats: EmbeddingModelLoadStats):
+        self.model = model
+        self.stats = stats
+        self.lock = threading.Lock()
+
+
+_registry: dict[str, _RegisteredModel] = {}
+_registry_lock = threading.Lock()
+
+
+def _peak_rss_bytes() -> int:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _load(model_name: str) -> _RegisteredModel:
+    logging.info("Loading embedding model %s", model_name)
+    rss_before = _peak_rss_bytes()
+    start = time.perf_counter()
+    model = SentenceTransformer(model_name)
+    model.eval()
+    stats = EmbeddingModelLoadStats(
+        model_name=model_name,
+        load_seconds=time.perf_counter() - start,
+        parameter_bytes=sum(p.numel() * p.element_size() for p in model.parameters()),
+        peak_rss_growth_bytes=_peak_rss_bytes() - rss_before,
+    )
+    logging.info(
+        "Loaded embedding model %s in %.2fs (weights %.1f MiB, peak RSS +%.1f MiB)",
+        model_name,
+        stats.load_seconds,
+        stats.parameter_bytes / 2**20,
+        stats.peak_rss_growth_bytes / 2**20,
+    )
+    return _RegisteredModel(model, stats)
+
+
+def _get_registered(model_name: str) -> _RegisteredModel:
+    registered = _registry.get(model_name)
+    if registered is None:
+        with _registry_lock:
+            # Another thread may have finished loading while we waited
+            registered = _registry.get(model_name)
+            if registered is None:
+                registered = _load(model_name)
+                _registry[model_name] = registered
+    return registered
+
+
+def warm_embedding_model(model_name: str = EMBEDDING_MODEL_NAME):
+    """Load the model now, at process start, so the first request does not pay
+    for it. Failures are logged rather than raised so that a missing model does
+    not keep the rest of the process from starting; the load is retried on the
+    first call to `embed_texts()`."""
+    try:
+        _get_registered(model_name)
+    except Exception:  # pylint: disable=broad-exception-caught
+        logging.exception("Could not preload embedding model %s", model_name)
+
+
+def get_embedding_model_stats(
+    model_name: str = EMBEDDING_MODEL_NAME,
+) -> EmbeddingModelLoadStats | None:
+    """Load stats for the model, or None if this process has not loaded it"""
+    registered = _registry.get(model_name)
+    return registered.stats if registered else None
+
+
+def embed_texts(
+    texts: List[str], model_name: str = EMBEDDING_MODEL_NAME, **encode_kwargs
+) -> ndarray:
+    """Embed each text with the shared model, returning one row per text.
+    `encode_kwargs` are passed through to `SentenceTransformer.encode()`."""
+    registered = _get_registered(model_name)
+    with registered.lock:
+        return registered.model.encode(texts, **encode_kwargs)
@@ -7,8 +7,10 @@ from .cuecode_config import CuecodeConfig  # isort:skip
 from .openapi_entity import OpenAPIEntity  # isort:skip
 from .openapi_server import OpenAPIServer  # isort:skip
 from .openapi_spec import OpenAPISpec  # isort:skip
+from .configuration_job import ConfigurationJob  # isort:skip
 
 from .openapi_path import OpenAPIPath  # isort:skip
 from .openapi_operation import OpenAPIOperation  # isort:skip
 from .openapi_operation_selection import OpenAPIOperationSelectionPrompt  # isort:skip
 from .account import Account  # isort:skip
+from .embedding_cache import EmbeddingCacheEntry  # isort:skip
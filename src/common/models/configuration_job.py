@@ -0,0 +1,42 @@
+"""Module for the class that tracks one run of the config algorithm"""
+
+import uuid
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from .base import Base
+
+# Values of ConfigurationJob.status, in the order a job moves through them
+JOB_STATUS_MAPPING = "mapping"
+JOB_STATUS_EMBEDDING = "embedding"
+JOB_STATUS_COMPLETE = "complete"
+# A job that stopped for good: its spec is invalid, or its retries ran out
+JOB_STATUS_FAILED = "failed"
+# Statuses of jobs that will not run again
+JOB_STATUSES_FINISHED = (JOB_STATUS_COMPLETE, JOB_STATUS_FAILED)
+
+
+class ConfigurationJob(Base):  # pylint: disable=too-few-public-methods
+    """A run of the config algorithm over one OpenAPI spec. A retried Dramatiq
+    message picks up the spec's unfinished job rather than starting over."""
+
+    __tablename__ = "configuration_job"
+
+    configuration_job_id = Column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    openapi_spec_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("openapi_spec.openapi_spec_id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    status = Column(String(255), nullable=False, default=JOB_STATUS_MAPPING)
+    # pylint: disable-next=not-callable
+    start_timestamp = Column(DateTime, nullable=False, server_default=func.now())
+    end_timestamp = Column(DateTime)
+    # Selection prompt embedding progress, updated as each chunk is committed
+    prompts_total = Column(Integer)
+    prompts_embedded = Column(Integer)
+    # How many of the embedded prompts were found in the embedding cache
+    embedding_cache_hits = Column(Integer)
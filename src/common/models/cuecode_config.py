@@ -3,7 +3,7 @@ worka gainst GraphQL and other API types"""
 
 import uuid
 
-from sqlalchemy import Boolean, Column
+from sqlalchemy import Boolean, Column, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 
 from .base import Base
@@ -18,3 +18,7 @@ class CuecodeConfig(Base):
     cuecode_config_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     config_is_finished = Column(Boolean, default=False)
     is_live = Column(Boolean, default=False)
+    belongs_to_cuecode_account_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("cuecode_account.cuecode_account_id", ondelete="CASCADE"),
+    )
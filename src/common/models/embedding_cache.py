@@ -0,0 +1,31 @@
+"""Module for the class that caches sentence embeddings by content"""
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, LargeBinary, Text, func
+from sqlalchemy.orm import mapped_column
+
+from .base import Base
+
+
+class EmbeddingCacheEntry(Base):  # pylint: disable=too-few-public-methods
+    """The embedding of one text by one model, keyed by a hash of both, so that
+    identical sentences in any spec or re-upload are only encoded once"""
+
+    __tablename__ = "embedding_cache"
+
+    content_hash = Column(LargeBinary, primary_key=True)
+    """SHA-256 of the model name and text; see `embedding_cache_key()`"""
+    model_name = Column(Text, nullable=False)
+    embedding = mapped_column(Vector(384), nullable=False)
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),  # pylint: disable=not-callable
+    )
+    # Refreshed (at most daily) when a config job reuses the entry; entries
+    # unused for EMBEDDING_CACHE_MAX_IDLE_DAYS are pruned
+    last_used_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),  # pylint: disable=not-callable
+    )
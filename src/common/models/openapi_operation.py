@@ -5,7 +5,7 @@ import enum
 import uuid
 from typing import List
 
-from sqlalchemy import JSON, Column, Enum, ForeignKey
+from sqlalchemy import JSON, Column, Enum, ForeignKey, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, relationship
 
@@ -46,6 +46,9 @@ class OpenAPIOperation(Base):  # pylint: disable=too-few-public-methods
     http_verb = Column(Enum(HttpVerb), nullable=False)
 
     llm_content_gen_tool_call_spec = Column(JSON)
+    # Hash of the operation's source in the spec text; re-configuring an
+    # updated spec only regenerates operations whose hash changed
+    source_hash = Column(LargeBinary)
 
     # path: Mapped["OpenAPIPath"] = relationship("OpenAPIPath", back_populates="operations", foreign_keys="[OpenAPIOperation.openapi_path_id]")  # type: ignore
     selection_prompts: Mapped[List["OpenAPIOperationSelectionPrompt"]] = relationship(  # type: ignore
@@ -3,7 +3,7 @@
 import uuid
 from typing import List
 
-from sqlalchemy import Column, ForeignKey, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, String, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -26,6 +26,8 @@ class OpenAPISpec(Base):  # pylint: disable=too-few-public-methods
     spec_text = Column(Text)
     file_name = Column(String)
     base_url = Column(String)
+    # Bumped each time the config algorithm writes this spec's embeddings
+    embeddings_updated_at = Column(DateTime(timezone=True))
 
     paths: Mapped[List[OpenAPIPath]] = relationship(
         "OpenAPIPath", back_populates="spec"
@@ -0,0 +1,35 @@
+"""How embeddings travel between NumPy and pgvector columns.
+
+Every engine that reads or writes vector columns registers the pgvector
+psycopg2 codec, so queries take float32 `ndarray`s (and lists of them, for
+`vector[]`) as parameters and return vector columns as float32 `ndarray`s.
+Code should pass arrays straight through rather than formatting vectors into
+SQL strings or converting them to Python lists."""
+
+from typing import Iterable
+
+import numpy as np
+from numpy import ndarray
+from pgvector.psycopg2 import register_vector
+from sqlalchemy import Engine, event
+
+
+def register_vector_codec(engine: Engine):
+    """Register the pgvector codec on each new DBAPI connection `engine` opens.
+    Does not connect; call it before the engine hands out its first connection."""
+    if not event.contains(engine, "connect", _on_connect):
+        event.listen(engine, "connect", _on_connect)
+
+
+def _on_connect(dbapi_connection, _connection_record):
+    # Looks up the vector/halfvec type OIDs once per connection
+    register_vector(dbapi_connection, arrays=True)
+
+
+def as_float32_rows(embeddings: ndarray | Iterable[ndarray]) -> list[ndarray]:
+    """Embeddings as a list of contiguous float32 vectors, ready to bind as a
+    `vector[]` parameter. Rows that are already float32 are not copied."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2:
+        raise ValueError(f"expected a 2-D batch of embeddings, got {matrix.ndim}-D")
+    return list(matrix)
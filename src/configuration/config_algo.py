@@ -1,23 +1,47 @@
 """The main driver for the CueCode configuration algorithm"""
 
+import logging
+import time
 from uuid import UUID
 
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.orm import scoped_session
+
+from common.app_config import OPENAPI_STREAMING_MIN_BYTES
 from common.database_engine import DBEngine
+from common.models.configuration_job import (
+    JOB_STATUS_COMPLETE,
+    JOB_STATUS_EMBEDDING,
+    JOB_STATUS_FAILED,
+    JOB_STATUS_MAPPING,
+    JOB_STATUSES_FINISHED,
+    ConfigurationJob,
+)
 from common.models.openapi_spec import OpenAPISpec
+from configuration.config_algo_metrics import observe_stage, timed_stage
+from configuration.openapi_mutation_model import build_openapi_model
 from configuration.openapi_operation_embedding import (
-    create_operation_prompt_embeddings_not_resumable,
+    create_operation_prompt_embeddings_resumable,
 )
-from configuration.openapi_schema_adapter import OpenAPISchemaAdapter
-from configuration.openapi_schema_validate import validate_openapi_spec
-from configuration.openapi_spec_entity_collection import OpenAPISpecEntityCollection
+from configuration.openapi_schema_validate import OpenAPISpecValidationError
+from configuration.openapi_spec_diff import operation_source_hashes
+from configuration.openapi_spec_document import load_spec_document
+from configuration.openapi_spec_stream import SpecStream
 from configuration.openapi_validator_to_cuecode import (
+    CueCodeOpenAPIConstraintError,
+    openapi_spec_stream_to_cuecode_config,
     openapi_spec_validator_to_cuecode_config,
 )
 
 from .openapi import OpenAPIObject
 
-db_engine_for_workaround = DBEngine()  # would be managed in dramatiq actor code
-# if workaround to avoid Dramatiq fails.
+# Errors in the spec itself, which fail its configuration job for good
+PERMANENT_CONFIG_ERRORS = (
+    OpenAPISpecValidationError,
+    CueCodeOpenAPIConstraintError,
+    ValidationError,
+)
 
 
 def config_algo_openapi(db_engine: DBEngine, openapi_spec_id: str):
@@ -26,37 +50,60 @@ def config_algo_openapi(db_engine: DBEngine, openapi_spec_id: str):
     one and then decorate the new function as the Dramatiq actor, all under a
     new 'actors' module."""
 
-    db_engine = db_engine_for_workaround
     session = db_engine.get_session()
 
-    # Fetch OpenAPI spec from PostgreSQL
-    db_spec = session.get(OpenAPISpec, openapi_spec_id)
-
-    # Ensure the text spec is a valid OpenAPI specification as such, apart any
-    # knowledge of CueCode's requirements for OpenAPI spec structure.
-    validate_openapi_spec(db_spec)
-
-    # Prepare the spec text for CueCode's parsing and validation, since
-    # CueCode constrains some OpenAPI options and also provides extensions
-    # to the OpenAPI spec
-    spec_adapter = OpenAPISchemaAdapter(db_spec)
-    spec_json = spec_adapter.get_cleaned_json_dict()
-
-    # Parse the OpenAPI specification
-    parsed_spec = from_formatted_json(UUID(openapi_spec_id), spec_json)
-
-    # Pull from the parsed spec all SQLAlchemy entities represented in the spec
-    # pylint: disable-next=unused-variable
-    spec_entities: OpenAPISpecEntityCollection = (
-        openapi_spec_validator_to_cuecode_config(session, parsed_spec, db_spec)
-    )
-
-    session.add(db_spec)
-
-    # Later, we might want to make the embedding resumable if it takes too long
-    # on very large OpenAPI spec files
-    create_operation_prompt_embeddings_not_resumable(db_spec, session)
-    session.commit()
+    # The worker process' pooled connection goes back to the pool even if the
+    # job fails, rather than staying checked out while Dramatiq holds on to
+    # the exception
+    try:
+        # Fetch OpenAPI spec from PostgreSQL
+        db_spec = session.get(OpenAPISpec, openapi_spec_id)
+
+        # A Dramatiq retry resumes the spec's unfinished job
+        job = start_or_resume_configuration_job(session, db_spec)
+
+        if job.status == JOB_STATUS_MAPPING:
+            try:
+                if len(db_spec.spec_text) >= OPENAPI_STREAMING_MIN_BYTES:
+                    # Very large specs are mapped one path item at a time, so
+                    # that the whole document is never held parsed, resolved
+                    # and modelled
+                    map_spec_stream(session, db_spec)
+                else:
+                    map_spec_document(session, db_spec)
+            except PERMANENT_CONFIG_ERRORS:
+                # No retry can fix the spec itself, so the job is marked failed
+                # rather than left in the mapping stage. The actor does not
+                # retry these errors.
+                session.rollback()
+                finish_configuration_job(session, job, JOB_STATUS_FAILED)
+                raise
+
+            session.add(db_spec)
+
+            # Commit the mapped entities, so that a retry after a crash in the
+            # embedding stage does not map the spec again. The mapping and the
+            # embeddings are not committed as one: until the job completes,
+            # the spec has selection prompts that are not embedded yet.
+            job.status = JOB_STATUS_EMBEDDING
+            session.commit()
+        else:
+            logging.info(
+                "Resuming configuration job %s for spec %s at the %s stage",
+                job.configuration_job_id,
+                openapi_spec_id,
+                job.status,
+            )
+
+        # Embeds and commits in chunks, skipping prompts embedded by earlier tries
+        with timed_stage("embedding"):
+            create_operation_prompt_embeddings_resumable(db_spec, session, job)
+        # Lets runtime processes know their in-memory copies of this spec's
+        # embeddings are stale
+        db_spec.embeddings_updated_at = func.now()  # pylint: disable=not-callable
+        finish_configuration_job(session, job, JOB_STATUS_COMPLETE)
+    finally:
+        session.remove()
 
     # NOTE The comments below describe the config algo from the Activity Diagram
     # in our Design docs, but it does NOT really follow how the code will be
@@ -108,8 +155,97 @@ def config_algo_openapi(db_engine: DBEngine, openapi_spec_id: str):
     # Needed in the event no server is specified in the servers array
 
 
-def from_formatted_json(spec_id: UUID, data: dict):
+def map_spec_document(session: scoped_session, db_spec: OpenAPISpec):
+    """Map a spec loaded as one document"""
+    # Parse the spec text once. The document is validated as an
+    # OpenAPI specification as such, apart any knowledge of CueCode's
+    # requirements for OpenAPI spec structure, and then prepared for
+    # CueCode's parsing, since CueCode constrains some OpenAPI options
+    # and also provides extensions to the OpenAPI spec
+    spec_document = load_spec_document(db_spec.spec_text)
+
+    # Parse the OpenAPI specification, by default only the parts the
+    # mapping reads
+    with spec_document.timed("build_model"):
+        parsed_spec = from_formatted_json(
+            db_spec.openapi_spec_id, spec_document.resolved
+        )
+    spec_document.log_timings(db_spec.openapi_spec_id)
+    for stage, seconds in spec_document.timings.items():
+        observe_stage(stage, seconds)
+
+    # Pull from the parsed spec all SQLAlchemy entities represented in
+    # the spec. If the spec was updated after an earlier configuration,
+    # only the operations whose source changed are regenerated.
+    with timed_stage("map"):
+        openapi_spec_validator_to_cuecode_config(
+            session, parsed_spec, db_spec, operation_source_hashes(spec_document.raw)
+        )
+
+
+def finish_configuration_job(session: scoped_session, job: ConfigurationJob, status):
+    """Commit `job` as finished with `status`"""
+    job.status = status
+    job.end_timestamp = func.now()  # pylint: disable=not-callable
+    session.commit()
+
+
+def fail_unfinished_configuration_job(db_engine: DBEngine, openapi_spec_id: str):
+    """Mark the spec's unfinished configuration job, if any, as failed"""
+    session = db_engine.get_session()
+    try:
+        job = unfinished_configuration_job(session, openapi_spec_id)
+        if job is not None:
+            finish_configuration_job(session, job, JOB_STATUS_FAILED)
+    finally:
+        session.remove()
+
+
+def start_or_resume_configuration_job(
+    session: scoped_session, db_spec: OpenAPISpec
+) -> ConfigurationJob:
+    """The spec's unfinished configuration job, or a new, committed one"""
+    job = unfinished_configuration_job(session, db_spec.openapi_spec_id)
+    if job is None:
+        job = ConfigurationJob(
+            openapi_spec_id=db_spec.openapi_spec_id, status=JOB_STATUS_MAPPING
+        )
+        session.add(job)
+        session.commit()
+    return job
+
+
+def unfinished_configuration_job(
+    session: scoped_session, openapi_spec_id
+) -> ConfigurationJob | None:
+    """The spec's latest configuration job that is neither complete nor
+    failed, if any"""
+    return session.scalars(
+        select(ConfigurationJob)
+        .where(ConfigurationJob.openapi_spec_id == openapi_spec_id)
+        .where(ConfigurationJob.status.not_in(JOB_STATUSES_FINISHED))
+        .order_by(ConfigurationJob.start_timestamp.desc())
+        .limit(1)
+    ).first()
+
+
+def from_formatted_json(spec_id: UUID, data: dict) -> OpenAPIObject:
     """create openapi object from json"""
-    return OpenAPIObject(
-        openapi_spec_uuid=spec_id, base_url=data["servers"][0]["url"], **data
+    return build_openapi_model(spec_id, data["servers"][0]["url"], data)
+
+
+def map_spec_stream(session: scoped_session, db_spec: OpenAPISpec):
+    """Map a very large spec from a stream of its path items"""
+    start = time.perf_counter()
+    with timed_stage("parse"):
+        stream = SpecStream(db_spec.spec_text)
+    with timed_stage("validate"):
+        stream.validate()
+    with timed_stage("map"):
+        openapi_spec_stream_to_cuecode_config(session, stream, db_spec)
+    logging.info(
+        "Mapped spec %s from a stream of %d paths in %.3fs",
+        db_spec.openapi_spec_id,
+        len(stream),
+        time.perf_counter() - start,
     )
@@ -0,0 +1,108 @@
+"""Prometheus metrics of the config algorithm: how long each stage of a job
+takes, how much a job produced, and how many jobs are running.
+
+In a Dramatiq worker they are served with Dramatiq's own metrics, by the
+exposition server of its Prometheus middleware (port 9191, or
+`dramatiq_prom_port`). That middleware shares metrics between worker processes
+through the directory it sets as `PROMETHEUS_MULTIPROC_DIR` when a process
+boots, and `prometheus_client` only looks for that directory when it is first
+imported. The metrics are therefore created, and `prometheus_client` imported,
+on first use rather than when this module is imported. Elsewhere, such as in
+tests and benchmarks, they are only kept in the process' `registry`."""
+
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator
+
+# Stages of a job, in the order they run: parse, validate, resolve_refs,
+# clean, build_model, map (which includes tool_call_specs, selection_prompts
+# and insert) and embedding (which includes encode). Specs mapped from a
+# stream skip resolve_refs, clean and build_model.
+#
+# Stage durations range from milliseconds for small specs to many minutes for
+# embedding very large ones
+STAGE_DURATION_BUCKETS = (
+    0.01,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+    600,
+    1800,
+    float("inf"),
+)
+
+
+# pylint: disable-next=too-few-public-methods, too-many-instance-attributes
+class ConfigAlgoMetrics:
+    """The config algorithm's metrics, in their own registry"""
+
+    def __init__(self):
+        # pylint: disable-next=import-outside-toplevel
+        import prometheus_client as prom
+
+        self.registry = prom.CollectorRegistry()
+        self.stage_seconds = prom.Histogram(
+            "cuecode_config_stage_duration_seconds",
+            "Time spent in each stage of configuration jobs.",
+            ["stage"],
+            buckets=STAGE_DURATION_BUCKETS,
+            registry=self.registry,
+        )
+        self.paths = prom.Counter(
+            "cuecode_config_paths",
+            "Spec paths read by configuration jobs.",
+            registry=self.registry,
+        )
+        self.operations = prom.Counter(
+            "cuecode_config_operations",
+            "Operations mapped, or re-mapped after they changed, by configuration jobs.",
+            registry=self.registry,
+        )
+        self.selection_prompts = prom.Counter(
+            "cuecode_config_selection_prompts",
+            "Selection prompts created by configuration jobs.",
+            registry=self.registry,
+        )
+        self.embedded_prompts = prom.Counter(
+            "cuecode_config_embedded_prompts",
+            "Selection prompt sentences embedded by configuration jobs.",
+            registry=self.registry,
+        )
+        self.jobs_in_progress = prom.Gauge(
+            "cuecode_config_jobs_in_progress",
+            "Configuration jobs running.",
+            registry=self.registry,
+            multiprocess_mode="livesum",
+        )
+
+
+@lru_cache(maxsize=None)
+def config_algo_metrics() -> ConfigAlgoMetrics:
+    """This process' config algorithm metrics, created on first use"""
+    return ConfigAlgoMetrics()
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record that a stage of a configuration job took `seconds`"""
+    config_algo_metrics().stage_seconds.labels(stage=stage).observe(seconds)
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Record the time spent in the `with` block as a stage of a configuration
+    job, even if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
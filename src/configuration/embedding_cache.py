@@ -0,0 +1,110 @@
+"""Persistent, content-addressed cache of sentence embeddings for the config
+algorithm. Re-uploaded specs and boilerplate sentences shared between
+operations are embedded by the model once, then read back from the
+`embedding_cache` table."""
+
+import hashlib
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+from numpy import ndarray
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import scoped_session
+
+from common.app_config import EMBEDDING_CACHE_MAX_IDLE_DAYS, EMBEDDING_MODEL_NAME
+from common.embedding_model import embed_texts
+from common.models.embedding_cache import EmbeddingCacheEntry
+
+# last_used_at is only rewritten when older than this, so that hot entries do
+# not cost a write on every job
+LAST_USED_RESOLUTION = timedelta(days=1)
+
+
+def embedding_cache_key(model_name: str, text: str) -> bytes:
+    """SHA-256 of the model name and the exact text"""
+    return hashlib.sha256(
+        model_name.encode("utf-8") + b"\0" + text.encode("utf-8")
+    ).digest()
+
+
+def embed_texts_cached(
+    session: scoped_session, texts: List[str], model_name: str = EMBEDDING_MODEL_NAME
+) -> Tuple[ndarray, int]:
+    """Unit-length embeddings of `texts`, one row per text, and how many of the
+    texts were cache hits. Only the distinct misses are passed to the model;
+    their embeddings are added to the cache in the session's transaction."""
+    keys = [embedding_cache_key(model_name, text) for text in texts]
+    found = lookup_cached_embeddings(session, model_name, list(dict.fromkeys(keys)))
+
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+    if missing:
+        new_embeddings = embed_texts(
+            list(missing.values()), model_name, normalize_embeddings=True
+        )
+        added = dict(zip(missing, new_embeddings))
+        insert_cached_embeddings(session, model_name, added)
+        found.update(added)
+
+    hits = sum(1 for key in keys if key not in missing)
+    return np.vstack([found[key] for key in keys]).astype(np.float32), hits
+
+
+def lookup_cached_embeddings(
+    session: scoped_session, model_name: str, keys: List[bytes]
+) -> Dict[bytes, ndarray]:
+    """The cached embeddings of the model among `keys`, by key. The entries
+    found are marked as used."""
+    found = {
+        bytes(content_hash): np.asarray(embedding, dtype=np.float32)
+        for content_hash, embedding in session.execute(
+            select(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding)
+            .where(EmbeddingCacheEntry.model_name == model_name)
+            .where(EmbeddingCacheEntry.content_hash.in_(keys))
+        )
+    }
+    if found:
+        session.execute(
+            update(EmbeddingCacheEntry)
+            .where(EmbeddingCacheEntry.content_hash.in_(list(found)))
+            .where(
+                EmbeddingCacheEntry.last_used_at
+                # pylint: disable-next=not-callable
+                < func.now() - LAST_USED_RESOLUTION
+            )
+            # pylint: disable-next=not-callable
+            .values(last_used_at=func.now())
+        )
+    return found
+
+
+def insert_cached_embeddings(
+    session: scoped_session, model_name: str, embeddings: Dict[bytes, ndarray]
+):
+    """Add the model's `embeddings`, by key, to the cache. Keys another
+    transaction cached first are left as they are."""
+    session.execute(
+        insert(EmbeddingCacheEntry)
+        .values(
+            [
+                {"content_hash": key, "model_name": model_name, "embedding": embedding}
+                for key, embedding in embeddings.items()
+            ]
+        )
+        .on_conflict_do_nothing()
+    )
+
+
+def prune_embedding_cache(
+    session: scoped_session, max_idle_days: int = EMBEDDING_CACHE_MAX_IDLE_DAYS
+) -> int:
+    """Delete entries no config job has used for `max_idle_days`. Does not
+    commit. Returns the number of entries deleted."""
+    return session.execute(
+        delete(EmbeddingCacheEntry).where(
+            EmbeddingCacheEntry.last_used_at
+            # pylint: disable-next=not-callable
+            < func.now() - timedelta(days=max_idle_days)
+        )
+    ).rowcount
@@ -393,30 +393,20 @@ class ParameterObject(BaseModel):
     @model_validator(mode="before")
     @classmethod
     def validate_style(cls, values) -> dict:
-        if "schema" in values:
-            if "style" not in values:
-                if values["in"] == "query" or values["in"] == "cookie":
-                    values["style"] = "form"
-                elif values["in"] == "path" or values["in"] == "header":
-                    values["style"] = "simple"
+        """Default the style by location, for parameters given by alias or by
+        field name. This is a before validator rather than a custom
+        `__init__`, which would make pydantic validate nested parameters
+        twice."""
+        if "schema" in values or "schema_" in values:
+            if values.get("style") is None:
+                location = values.get("in", values.get("in_"))
+                # Copied, since the input may be shared with the spec document
+                if location == "query" or location == "cookie":
+                    values = {**values, "style": "form"}
+                elif location == "path" or location == "header":
+                    values = {**values, "style": "simple"}
         return values
 
-    def __init__(self, **values):
-
-        super().__init__(**values)
-        # if "schema" in values:
-        #     if "style" not in values:
-        #         if values["in"] == "query" or "cookie":
-        #             values["style"] = "form"
-        #         elif values["in"] == "path" or "header":
-        #             values["style"] = "simple"
-        if self.schema_ is not None:
-            if self.style is None:
-                if self.in_ == "query" or "cookie":
-                    self.style = "form"
-                elif self.in_ == "path" or "header":
-                    self.style = "simple"
-
     explode: bool | None = False
 
     allow_reserved: bool | None = False
@@ -0,0 +1,66 @@
+"""Bulk persistence of the config algorithm's output. The mapper produces plain
+row dicts rather than ORM objects, and they are written with batched,
+multi-row INSERTs (SQLAlchemy's "insertmanyvalues"), skipping the unit of
+work's per-object bookkeeping.
+
+Rows are inserted in the caller's transaction, which is left open. The config
+algorithm commits a spec's mapped rows as one, before its embedding stage,
+which then commits the embeddings chunk by chunk; the rows and their
+embeddings are not committed together."""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import scoped_session
+
+from common.app_config import CONFIG_BULK_INSERT_BATCH_SIZE
+from common.models.openapi_operation import OpenAPIOperation
+from common.models.openapi_operation_selection import OpenAPIOperationSelectionPrompt
+from common.models.openapi_path import OpenAPIPath
+
+
+@dataclass
+class ConfigOutputRows:
+    """Rows for each table the mapper writes, with client-generated primary
+    keys so that child rows can reference their parents before insertion"""
+
+    paths: List[dict] = field(default_factory=list)
+    operations: List[dict] = field(default_factory=list)
+    selection_prompts: List[dict] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.paths) + len(self.operations) + len(self.selection_prompts)
+
+
+def insert_config_output_rows(
+    session: scoped_session,
+    rows: ConfigOutputRows,
+    batch_size: int = CONFIG_BULK_INSERT_BATCH_SIZE,
+) -> float:
+    """Insert `rows`, parents first, in batches of `batch_size`. Does not
+    commit. Returns the insert rate in rows per second."""
+    # Rows added through the ORM so far (e.g. the server) must exist first
+    session.flush()
+    start = time.perf_counter()
+    for model, table_rows in (
+        (OpenAPIPath, rows.paths),
+        (OpenAPIOperation, rows.operations),
+        (OpenAPIOperationSelectionPrompt, rows.selection_prompts),
+    ):
+        for i in range(0, len(table_rows), batch_size):
+            session.execute(insert(model), table_rows[i : i + batch_size])
+    seconds = time.perf_counter() - start
+    rows_per_second = len(rows) / seconds if seconds > 0 else float("inf")
+    logging.info(
+        "Inserted %d paths, %d operations and %d selection prompts"
+        + " in %.2fs (%.0f rows/s)",
+        len(rows.paths),
+        len(rows.operations),
+        len(rows.selection_prompts),
+        seconds,
+        rows_per_second,
+    )
+    return rows_per_second
@@ -0,0 +1,76 @@
+"""Builds the config algorithm's `OpenAPIObject` from only the parts of the spec
+the algorithm reads. Validating the full model builds every GET, HEAD, OPTIONS
+and TRACE operation, every response and every component schema, none of which
+are mapped, and whose `$ref`s are already resolved into the operations that
+use them. The skipped parts stay available in the spec document."""
+
+from collections.abc import Mapping
+from uuid import UUID
+
+from common.app_config import OPENAPI_MODEL_MUTATIONS_ONLY
+
+from .openapi import OpenAPIObject, PathItemObject
+from .openapi_spec_diff import MAPPED_VERBS
+
+# Top-level fields the config algorithm does not read
+SKIPPED_SPEC_FIELDS = {"components", "webhooks", "tags"}
+# Operation fields the config algorithm does not read
+SKIPPED_OPERATION_FIELDS = {"responses", "callbacks"}
+
+_PATH_ITEM_VERBS = {"get", "put", "post", "delete", "options", "head", "patch", "trace"}
+_MAPPED_VERBS = {verb.lower() for verb in MAPPED_VERBS}
+
+
+def build_openapi_model(
+    spec_id: UUID,
+    base_url: str,
+    data: dict,
+    mutations_only: bool = OPENAPI_MODEL_MUTATIONS_ONLY,
+) -> OpenAPIObject:
+    """The `OpenAPIObject` for the resolved spec `data`, built from only the
+    mapped operations and the fields the config algorithm reads if
+    `mutations_only` is set. `data` is not modified."""
+    if mutations_only:
+        data = mutation_only_spec_data(data)
+    return OpenAPIObject.from_formatted_json(spec_id, base_url, data)
+
+
+def build_path_item_model(
+    path_item,
+    mutations_only: bool = OPENAPI_MODEL_MUTATIONS_ONLY,
+) -> PathItemObject:
+    """The `PathItemObject` for one resolved path item, built as
+    `build_openapi_model` builds those of a whole spec"""
+    if mutations_only:
+        path_item = mutation_only_path_item(path_item)
+    return PathItemObject.model_validate(path_item)
+
+
+def mutation_only_spec_data(data: dict) -> dict:
+    """A shallow copy of the resolved spec `data` without the fields and
+    operations the config algorithm does not read. Unchanged parts are shared
+    with `data`."""
+    out = {key: value for key, value in data.items() if key not in SKIPPED_SPEC_FIELDS}
+    out["paths"] = {
+        path_key: mutation_only_path_item(path_item)
+        for path_key, path_item in (data.get("paths") or {}).items()
+    }
+    return out
+
+
+def mutation_only_path_item(path_item):
+    """A shallow copy of the resolved path item without the operations and
+    fields the config algorithm does not read"""
+    if not isinstance(path_item, Mapping):
+        return path_item
+    out = {}
+    for key, value in path_item.items():
+        if key in _MAPPED_VERBS and isinstance(value, Mapping):
+            out[key] = {
+                field: field_value
+                for field, field_value in value.items()
+                if field not in SKIPPED_OPERATION_FIELDS
+            }
+        elif key not in _PATH_ITEM_VERBS:
+            out[key] = value
+    return out
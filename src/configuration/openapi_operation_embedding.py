@@ -1,20 +1,65 @@
 """Embed OpenAPI Operation descriptions for similiarity search at runtime"""
 
 import logging
-from typing import List
+import uuid
+from functools import lru_cache
+from typing import List, Tuple
 
 import spacy
-from sentence_transformers import SentenceTransformer
-from sqlalchemy import select
+from spacy.language import Language
+from sqlalchemy import func, select
+from sqlalchemy import text as sql_text
 from sqlalchemy.orm import scoped_session
 
+from common.app_config import (
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CHUNK_SIZE,
+    SPACY_SENTENCE_FALLBACK,
+    SPACY_SENTENCE_MIN_TEXTS_PER_PROCESS,
+    SPACY_SENTENCE_MODEL,
+    SPACY_SENTENCE_N_PROCESS,
+)
+from common.embedding_model import embed_texts
+from common.models.configuration_job import ConfigurationJob
 from common.models.openapi_operation import OpenAPIOperation
 from common.models.openapi_operation_selection import OpenAPIOperationSelectionPrompt
 from common.models.openapi_path import OpenAPIPath
 from common.models.openapi_spec import OpenAPISpec
+from common.vector_codec import as_float32_rows
 
+from .config_algo_metrics import config_algo_metrics, timed_stage
+from .embedding_cache import embed_texts_cached
 from .openapi import OperationObject, PathItemObject
 
+# Writes a chunk of prompts' embeddings in one statement. The ids and embeddings are
+# bound as two arrays, which the vector codec sends without per-row ORM
+# bookkeeping.
+BULK_UPDATE_EMBEDDINGS_SQL = sql_text(
+    """
+UPDATE openapi_operation_selection_prompt AS sp
+SET selection_prompt_embedding = e.embedding
+FROM unnest(CAST(:prompt_ids AS uuid[]), CAST(:embeddings AS vector[]))
+    AS e(openapi_operation_selection_prompt_id, embedding)
+WHERE sp.openapi_operation_selection_prompt_id
+    = e.openapi_operation_selection_prompt_id
+"""
+)
+
+
+# Non-sentence-segmentation components of the trained spaCy pipelines, which
+# are not even loaded
+_SPACY_EXCLUDED_COMPONENTS = [
+    "tagger",
+    "parser",
+    "attribute_ruler",
+    "lemmatizer",
+    "ner",
+]
+
+# (operation id, HTTP verb, path string, operation object) for one operation
+# whose selection prompts are still to be created
+PendingOperationPrompts = Tuple[uuid.UUID, str, str, OperationObject]
+
 
 # pylint: disable-next=too-many-arguments, too-many-positional-arguments
 def create_operation_prompts_without_embeddings(
@@ -27,76 +72,159 @@ def create_operation_prompts_without_embeddings(
 ):
     """Build OpenAPI Operation Selection Prompts from the Pydantic model and add
     them to the DB session without committing."""
+    # Handle the description vs x-cuecode-prompt behavior for old spec files
+    description_sentences = get_all_sentences(pick_op_description_field(op))
+    for prompt in make_operation_prompt_texts(
+        http_verb, path_str, op, description_sentences
+    ):
+        this_oapi_op_select_prompt = OpenAPIOperationSelectionPrompt(
+            openapi_operation_id=db_op.openapi_operation_id,
+            selection_prompt=prompt,
+        )
+        db_op.selection_prompts.append(this_oapi_op_select_prompt)
+    session.add(db_op)
+
 
+def make_spec_selection_prompt_rows(
+    operations: List[PendingOperationPrompts],
+) -> List[dict]:
+    """`openapi_operation_selection_prompt` rows, without embeddings, for all
+    of a spec's operations. Every description is split into sentences in one
+    pass."""
+    sentence_lists = split_sentences(
+        [pick_op_description_field(op) for _, _, _, op in operations]
+    )
+    rows = []
+    for (operation_id, http_verb, path_str, op), description_sentences in zip(
+        operations, sentence_lists
+    ):
+        for prompt in make_operation_prompt_texts(
+            http_verb, path_str, op, description_sentences
+        ):
+            rows.append(
+                {
+                    "openapi_operation_selection_prompt_id": uuid.uuid4(),
+                    "openapi_operation_id": operation_id,
+                    "selection_prompt": prompt,
+                }
+            )
+    return rows
+
+
+def make_operation_prompt_texts(
+    http_verb: str,
+    path_str: str,
+    op: OperationObject,
+    description_sentences: List[str],
+) -> List[str]:
+    """All selection prompts for one operation: the HTTP oriented prompt, the
+    description's sentences and any `x-cuecode-prompts`"""
     prompt_list: List[str] = []
     prompt_list.append(
         make_http_oriented_selection_prompt_for_operation(path_str, http_verb)
     )
-    # Handle the description vs x-cuecode-prompt behavior for old spec files
-    prompt_list.extend(get_all_sentences(pick_op_description_field(op)))
+    prompt_list.extend(description_sentences)
 
     if op.x_cuecode_prompts:
         for prompt in op.x_cuecode_prompts:
             prompt_list.append(prompt)
-
-    for prompt in prompt_list:
-        this_oapi_op_select_prompt = OpenAPIOperationSelectionPrompt(
-            openapi_operation_id=db_op.openapi_operation_id,
-            selection_prompt=prompt,
-        )
-        db_op.selection_prompts.append(this_oapi_op_select_prompt)
-        session.add(db_op)
+    return prompt_list
 
 
-def create_operation_prompt_embeddings_not_resumable(db_spec, session: scoped_session):
-    """Create sentence embeddings for all `OpenAPIOperationSelectionPrompt`s associated
-    with the passed `db_spec`. Side effect: all `OpenAPIOperationSelectionPrompt`s associated
-    with the `db_spec` have been updated with a vector embedding value AND have been added
-    to the ORM session."""
-    # Get all Operation promtps from the db and embed all at once.
-
-    # Get all Operation selection prompts for this target API from the DB
-    logging.debug(
-        "create_operation_prompt_embeddings_not_resumable getting selection prompt objets from db."
-    )
-    rows = session.execute(
-        select(OpenAPIOperationSelectionPrompt)
+def spec_selection_prompts_query(spec_id):
+    """Select (prompt id, prompt text) for every selection prompt of a spec"""
+    return (
+        select(
+            OpenAPIOperationSelectionPrompt.openapi_operation_selection_prompt_id,
+            OpenAPIOperationSelectionPrompt.selection_prompt,
+        )
         .join(OpenAPISpec.paths)
         .join(OpenAPIPath.operations)
         .join(OpenAPIOperation.selection_prompts)
-        .where(OpenAPISpec.openapi_spec_id == db_spec.openapi_spec_id)
-        .order_by(OpenAPIOperation.openapi_operation_id)
-    ).all()
-
-    # Embed all prompts
-    sentence_list: List[str] = []
-    for row in rows:
-        sentence_list.append(row.OpenAPIOperationSelectionPrompt.selection_prompt)
-    model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-    logging.debug(
-        "create_operation_prompt_embeddings_not_resumable beginning embeddings"
-    )
-    embeddings = model.encode(sentence_list)
-    logging.debug(
-        "create_operation_prompt_embeddings_not_resumable done with embeddings"
+        .where(OpenAPISpec.openapi_spec_id == spec_id)
     )
-    assert len(embeddings) == len(sentence_list)
-    assert len(sentence_list) == len(rows)
 
-    # Store embeddings in the DB
-    logging.debug(
-        "create_operation_prompt_embeddings_not_resumable adding embeddings to DB records"
-    )
-    print(embeddings)
-
-    for i, row in enumerate(rows):
-        prompt: OpenAPIOperationSelectionPrompt = row.OpenAPIOperationSelectionPrompt
-        prompt.selection_prompt_embedding = embeddings[i]
-        session.add(prompt)
-    logging.debug(
-        "create_operation_prompt_embeddings_not_resumable done adding embeddings to DB records"
+
+def create_operation_prompt_embeddings_resumable(
+    db_spec,
+    session: scoped_session,
+    job: ConfigurationJob | None = None,
+    chunk_size: int = EMBEDDING_CHUNK_SIZE,
+) -> int:
+    """Create sentence embeddings for the `OpenAPIOperationSelectionPrompt`s of
+    the passed `db_spec` that do not have one yet, `chunk_size` prompts at a
+    time. Each chunk's embeddings are committed before the next chunk is
+    embedded, so a retry after a crash only embeds the prompts still missing,
+    and memory use does not grow with the spec. Unless `EMBEDDING_CACHE_ENABLED`
+    is off, prompts already in the embedding cache are not re-encoded. Progress
+    and cache hits are recorded on `job` in the same commits. Returns the
+    number of prompts embedded by this call."""
+    prompts = spec_selection_prompts_query(db_spec.openapi_spec_id)
+    missing = prompts.where(
+        OpenAPIOperationSelectionPrompt.selection_prompt_embedding.is_(None)
+    ).order_by(OpenAPIOperationSelectionPrompt.openapi_operation_selection_prompt_id)
+    total = session.execute(
+        # pylint: disable-next=not-callable
+        select(func.count()).select_from(prompts.subquery())
+    ).scalar_one()
+    remaining = session.execute(
+        # pylint: disable-next=not-callable
+        select(func.count()).select_from(missing.subquery())
+    ).scalar_one()
+    logging.info(
+        "Embedding %d of %d selection prompts for spec %s",
+        remaining,
+        total,
+        db_spec.openapi_spec_id,
     )
 
+    embedded = 0
+    cache_hits = 0
+    while True:
+        rows = session.execute(missing.limit(chunk_size)).all()
+        if not rows:
+            break
+        texts = [row.selection_prompt for row in rows]
+        with timed_stage("encode"):
+            if EMBEDDING_CACHE_ENABLED:
+                embeddings, hits = embed_texts_cached(session, texts)
+                cache_hits += hits
+            else:
+                embeddings = embed_texts(texts, normalize_embeddings=True)
+                hits = 0
+        assert len(embeddings) == len(rows)
+        session.execute(
+            BULK_UPDATE_EMBEDDINGS_SQL,
+            {
+                "prompt_ids": [
+                    str(row.openapi_operation_selection_prompt_id) for row in rows
+                ],
+                "embeddings": as_float32_rows(embeddings),
+            },
+        )
+        embedded += len(rows)
+        if job is not None:
+            job.prompts_total = total
+            job.prompts_embedded = total - remaining + embedded
+            job.embedding_cache_hits = (job.embedding_cache_hits or 0) + hits
+        session.commit()
+        config_algo_metrics().embedded_prompts.inc(len(rows))
+        logging.info(
+            "Embedded %d/%d selection prompts for spec %s",
+            total - remaining + embedded,
+            total,
+            db_spec.openapi_spec_id,
+        )
+    if EMBEDDING_CACHE_ENABLED and embedded:
+        logging.info(
+            "Embedding cache hit rate for spec %s: %d/%d (%.0f%%)",
+            db_spec.openapi_spec_id,
+            cache_hits,
+            embedded,
+            100 * cache_hits / embedded,
+        )
+    return embedded
+
 
 def pick_op_description_field(
     operation_object: OperationObject,
@@ -127,9 +255,51 @@ def make_http_oriented_selection_prompt_for_operation(
     return prompt
 
 
+@lru_cache(maxsize=None)
+def get_sentence_pipeline(
+    model_name: str = SPACY_SENTENCE_MODEL,
+    fallback: bool = SPACY_SENTENCE_FALLBACK,
+) -> Language:
+    """A spaCy pipeline that only splits sentences, loaded once per process.
+    Uses the trained pipeline's statistical sentence segmenter. Raises
+    `OSError` if `model_name` is not installed, unless `fallback` is set, in
+    which case spaCy's rule-based sentencizer is used instead."""
+    try:
+        nlp = spacy.load(model_name, exclude=_SPACY_EXCLUDED_COMPONENTS)
+    except OSError:
+        if not fallback:
+            raise
+        logging.warning(
+            "spaCy pipeline %s is not installed; splitting sentences by rule",
+            model_name,
+        )
+        nlp = spacy.blank("en")
+        nlp.add_pipe("sentencizer")
+        return nlp
+    if "senter" in nlp.disabled:
+        nlp.enable_pipe("senter")
+    elif "senter" not in nlp.pipe_names:
+        nlp.add_pipe("sentencizer")
+    return nlp
+
+
+def split_sentences(texts: List[str]) -> List[List[str]]:
+    """The sentences in each of `texts`, in one batched pass over the shared
+    pipeline. Large batches are split across processes if configured."""
+    nlp = get_sentence_pipeline()
+    n_process = max(
+        1,
+        min(
+            SPACY_SENTENCE_N_PROCESS,
+            len(texts) // max(1, SPACY_SENTENCE_MIN_TEXTS_PER_PROCESS),
+        ),
+    )
+    sentence_lists = []
+    for doc in nlp.pipe((text or "" for text in texts), n_process=n_process):
+        sentence_lists.append([sent.text for sent in doc.sents])
+    return sentence_lists
+
+
 def get_all_sentences(text) -> List[str]:
     """Get the sentences in a string"""
-    nlp = spacy.load("en_core_web_sm")
-    doc = nlp(text)
-    assert doc.has_annotation("SENT_START")
-    return [sent.text for sent in doc.sents]
+    return split_sentences([text])[0]
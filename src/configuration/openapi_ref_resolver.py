@@ -0,0 +1,137 @@
+"""Replaces the `$ref` proxies in tool call specs with plain JSON. Each
+referenced schema is expanded once per resolver and the expansion is reused
+by every operation that refers to it. Recursive schemas, and schemas nested
+deeper than the inlining limit, are written once under `$defs` and referenced
+from there, so they neither recurse forever nor repeat."""
+
+import re
+from collections.abc import Mapping
+from typing import Any, Dict, Set, Tuple
+
+from jsonref import JsonRef, JsonRefError  # pylint: disable=import-error
+
+from common.app_config import TOOL_CALL_SPEC_MAX_REF_DEPTH
+
+# Stands for "a reference was cut at the depth limit" in the set of
+# references an expansion depends on
+_DEPTH_CUT = ""
+
+
+class RefResolver:  # pylint: disable=too-few-public-methods
+    """Memoized `$ref` resolution shared by the tool call specs of one spec.
+    Expansions are cached by JSON pointer and shared between results, which
+    must therefore be treated as read-only."""
+
+    def __init__(self, max_depth: int = TOOL_CALL_SPEC_MAX_REF_DEPTH):
+        self.max_depth = max_depth
+        # pointer -> (expansion, how many references deep it inlines, pointers
+        # it references in $defs)
+        self._cache: Dict[str, Tuple[Any, int, Set[str]]] = {}
+        self._targets: Dict[str, JsonRef] = {}
+        self._names: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, node) -> Tuple[Any, Dict[str, Any]]:
+        """`node` as plain JSON, and the `$defs` its references point to"""
+        referenced: Set[str] = set()
+        value = self._resolve(node, (), referenced)[0]
+        defs: Dict[str, Any] = {}
+        pending = list(referenced)
+        while pending:
+            pointer = pending.pop()
+            name = self._names[pointer]
+            if name in defs:
+                continue
+            def_referenced: Set[str] = set()
+            defs[name] = self._expand(pointer, (), def_referenced)[0]
+            pending.extend(def_referenced)
+        return value, defs
+
+    def _resolve(
+        self, node, stack: Tuple[str, ...], referenced: Set[str]
+    ) -> Tuple[Any, Set[str], int]:
+        """Plain JSON for `node`, expanded under the references in `stack`; the
+        ancestors in `stack` (or `_DEPTH_CUT`) the result depends on; and how
+        many references deep the result inlines. Pointers the result
+        references in `$defs` are added to `referenced`."""
+        if isinstance(node, JsonRef):
+            pointer = node.__reference__["$ref"]
+            if pointer in stack or len(stack) >= self.max_depth:
+                self._targets.setdefault(pointer, node)
+                referenced.add(pointer)
+                return (
+                    {"$ref": "#/$defs/" + self._def_name(pointer)},
+                    {pointer if pointer in stack else _DEPTH_CUT},
+                    0,
+                )
+            return self._expand(pointer, stack, referenced, node)
+        if isinstance(node, Mapping):
+            depends: Set[str] = set()
+            height = 0
+            out = {}
+            for key, child in node.items():
+                out[key], child_depends, child_height = self._resolve(
+                    child, stack, referenced
+                )
+                depends |= child_depends
+                height = max(height, child_height)
+            return out, depends, height
+        if isinstance(node, list):
+            depends = set()
+            height = 0
+            items = []
+            for child in node:
+                item, child_depends, child_height = self._resolve(
+                    child, stack, referenced
+                )
+                items.append(item)
+                depends |= child_depends
+                height = max(height, child_height)
+            return items, depends, height
+        return node, set(), 0
+
+    def _expand(
+        self,
+        pointer: str,
+        stack: Tuple[str, ...],
+        referenced: Set[str],
+        proxy: JsonRef | None = None,
+    ) -> Tuple[Any, Set[str], int]:
+        """The expansion of the schema at `pointer`, from the cache if it does
+        not depend on where it is expanded and fits under the depth limit"""
+        cached = self._cache.get(pointer)
+        if cached is not None and len(stack) + cached[1] <= self.max_depth:
+            self.hits += 1
+            referenced |= cached[2]
+            return cached[0], set(), cached[1]
+        self.misses += 1
+        proxy = self._targets.setdefault(pointer, proxy)
+        try:
+            target = proxy.__subject__
+        except JsonRefError:
+            # Unresolvable (e.g. remote) references are kept as they are
+            return dict(proxy.__reference__), set(), 0
+        own_referenced: Set[str] = set()
+        value, depends, height = self._resolve(
+            target, stack + (pointer,), own_referenced
+        )
+        referenced |= own_referenced
+        depends.discard(pointer)
+        if not depends:
+            self._cache[pointer] = (value, height + 1, own_referenced)
+        return value, depends, height + 1
+
+    def _def_name(self, pointer: str) -> str:
+        """A `$defs` key for `pointer`, unique within this resolver"""
+        name = self._names.get(pointer)
+        if name is None:
+            base = re.sub(r"[^A-Za-z0-9_.-]", "_", pointer.rsplit("/", 1)[-1])
+            name = base or "def"
+            taken = set(self._names.values())
+            suffix = 2
+            while name in taken:
+                name = f"{base}_{suffix}"
+                suffix += 1
+            self._names[pointer] = name
+        return name
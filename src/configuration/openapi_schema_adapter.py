@@ -32,8 +32,13 @@ class OpenAPISchemaAdapter:
         Preprocessing applies fixes to common, easily corrected CueCode
         compatability problems in OpenAPI specs
         """
-        raw = self.get_raw_json_dict()
-        cleaned = OpenAPISchemaAdapter._fix_empty_schemas(raw)
+        return OpenAPISchemaAdapter.clean_json_dict(self.get_raw_json_dict())
+
+    @staticmethod
+    def clean_json_dict(d: JsonRef) -> JsonRef:
+        """Apply the preprocessing fixes to an already loaded spec dict, in
+        place, and return it"""
+        cleaned = OpenAPISchemaAdapter._fix_empty_schemas(d)
         cleaned = OpenAPISchemaAdapter._fix_broken_security(cleaned)
         return cleaned
 
@@ -1,29 +1,102 @@
 """Validator for OpenAPI schema
 """
 
-import os
-from uuid import uuid4
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List
 
-from openapi_spec_validator import validate
-from openapi_spec_validator.readers import read_from_filename
+import orjson
+from jsonschema_path import SchemaPath
+from openapi_spec_validator.shortcuts import get_validator_cls
+from openapi_spec_validator.validation.exceptions import ValidatorDetectError
 
 from common.models.openapi_spec import OpenAPISpec
 
+# Hashes of the spec texts this process has already validated, so that a
+# retried job or an unchanged re-upload skips validation
+_VALIDATED_SPEC_HASHES: OrderedDict[bytes, None] = OrderedDict()
+_VALIDATED_SPEC_HASHES_SIZE = 256
+_validated_spec_hashes_lock = threading.Lock()
 
-def validate_openapi_spec(spec: OpenAPISpec, temp_file_dir="/tmp"):
-    """Raises an error if the OpenAPI spec text is not a valid OpenAPI spec."""
-    # Build file at /tmp from text in spec.spec_text
-    # This is advantageous because we keep the text in the DB
-    # and avoid having to have a distributed file system - we only
-    # need this temp file on the host (in the container) that our program
-    # is running on (in).
-    file_name = "cuecode_openapi_spec_" + str(uuid4())
-    file_path = os.path.join(temp_file_dir, file_name)
+# Errors listed in an OpenAPISpecValidationError's message; all are kept on
+# its `errors`
+_REPORTED_ERRORS = 10
 
-    # Create temp directory if it doesn't exist.
-    os.makedirs(temp_file_dir, exist_ok=True)
 
-    with open(file_path, "w", encoding="UTF-8") as f:
-        f.write(spec.spec_text)
-    spec_tuple = read_from_filename(file_path)
-    validate(spec_tuple[0])
+class OpenAPISpecValidationError(ValueError):
+    """Raised when the spec text is not a valid OpenAPI spec. `errors` has one
+    line per problem found, each starting with where in the spec it is."""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        listed = "\n".join(f"- {error}" for error in errors[:_REPORTED_ERRORS])
+        more = len(errors) - _REPORTED_ERRORS
+        if more > 0:
+            listed += f"\n- ... and {more} more"
+        super().__init__(f"Invalid OpenAPI spec ({len(errors)} errors):\n{listed}")
+
+
+def validate_openapi_spec(spec: OpenAPISpec) -> dict:
+    """Parse the spec text and raise an `OpenAPISpecValidationError` if it is
+    not a valid OpenAPI spec. Returns the parsed document, with its `$ref`s
+    unresolved, for the later config stages."""
+    document = parse_spec_text(spec.spec_text)
+    validate_openapi_document(document, spec_text_hash(spec.spec_text))
+    return document
+
+
+def parse_spec_text(spec_text: str) -> dict:
+    """The spec text parsed as JSON, or an `OpenAPISpecValidationError` giving
+    the position of the syntax error"""
+    try:
+        document = orjson.loads(spec_text)
+    except orjson.JSONDecodeError as e:
+        raise OpenAPISpecValidationError(
+            [f"line {e.lineno}, column {e.colno}: {e.msg}"]
+        ) from e
+    if not isinstance(document, dict):
+        raise OpenAPISpecValidationError(["/: the spec must be a JSON object"])
+    return document
+
+
+def spec_text_hash(spec_text: str) -> bytes:
+    """SHA-256 of the spec text, identifying already validated content"""
+    return hashlib.sha256(spec_text.encode("utf-8")).digest()
+
+
+def validate_openapi_document(document: dict, text_hash: bytes):
+    """Raise an `OpenAPISpecValidationError` if the parsed spec is not a valid
+    OpenAPI spec. Skipped if this process already validated the text with
+    `text_hash`."""
+    with _validated_spec_hashes_lock:
+        if text_hash in _VALIDATED_SPEC_HASHES:
+            _VALIDATED_SPEC_HASHES.move_to_end(text_hash)
+            return
+
+    errors = list_validation_errors(document)
+    if errors:
+        raise OpenAPISpecValidationError(errors)
+
+    with _validated_spec_hashes_lock:
+        _VALIDATED_SPEC_HASHES[text_hash] = None
+        if len(_VALIDATED_SPEC_HASHES) > _VALIDATED_SPEC_HASHES_SIZE:
+            _VALIDATED_SPEC_HASHES.popitem(last=False)
+
+
+def list_validation_errors(document: dict) -> List[str]:
+    """Every problem the OpenAPI validator finds in the parsed document, as
+    "<location>: <message>" lines. Empty if the document is valid."""
+    try:
+        validator = get_validator_cls(document)(SchemaPath.from_dict(document))
+    except ValidatorDetectError as e:
+        return [f"/: {e}"]
+    errors = []
+    try:
+        for error in validator.iter_errors():
+            location = "/" + "/".join(str(part) for part in error.absolute_path)
+            errors.append(f"{location}: {error.message}")
+    # The validator can fail on malformed documents instead of reporting them
+    except (TypeError, AttributeError, KeyError) as e:
+        errors.append(f"/: could not be validated: {e!r}")
+    return errors
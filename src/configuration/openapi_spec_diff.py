@@ -0,0 +1,172 @@
+"""Operation-level diff of a spec against its previous configuration, so that
+re-configuring an updated spec only regenerates the operations that changed.
+
+Each configured operation stores a `source_hash`: a SHA-256 of the operation's
+JSON in the spec text, its path's parameters, every component its `$ref`s
+lead to, directly or through other components, and the `GENERATOR`
+fingerprint of the code and settings that turn them into tool call specs,
+selection prompts and embeddings. Anything that can change an operation's
+tool call spec or selection prompts changes its hash."""
+
+import hashlib
+import json
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Set, Tuple
+
+from common.app_config import (
+    EMBEDDING_MODEL_NAME,
+    SPACY_SENTENCE_FALLBACK,
+    SPACY_SENTENCE_MODEL,
+    TOOL_CALL_SPEC_COMPACT,
+    TOOL_CALL_SPEC_MAX_EXAMPLE_BYTES,
+    TOOL_CALL_SPEC_MAX_REF_DEPTH,
+    TOOL_CALL_SPEC_STRIP_KEYS,
+)
+
+# (path string, HTTP verb) identifying an operation within a spec
+OperationKey = Tuple[str, str]
+
+# The HTTP verbs whose operations the config algorithm maps; see
+# `mutating_operations()`
+MAPPED_VERBS = ["POST", "PATCH", "PUT", "DELETE"]
+
+# Bump when a code change alters the tool call specs or selection prompts made
+# from the same spec, so that re-configured specs regenerate every operation
+GENERATOR_VERSION = 1
+
+# Everything besides the spec that an operation's tool call spec, selection
+# prompts and their embeddings depend on
+GENERATOR = {
+    "version": GENERATOR_VERSION,
+    "tool_call_spec_compact": TOOL_CALL_SPEC_COMPACT,
+    "tool_call_spec_strip_keys": TOOL_CALL_SPEC_STRIP_KEYS,
+    "tool_call_spec_max_example_bytes": TOOL_CALL_SPEC_MAX_EXAMPLE_BYTES,
+    "tool_call_spec_max_ref_depth": TOOL_CALL_SPEC_MAX_REF_DEPTH,
+    "spacy_sentence_model": SPACY_SENTENCE_MODEL,
+    "spacy_sentence_fallback": SPACY_SENTENCE_FALLBACK,
+    "embedding_model": EMBEDDING_MODEL_NAME,
+}
+
+
+@dataclass
+class ExistingOperation:
+    """An operation already configured for the spec"""
+
+    openapi_operation_id: uuid.UUID
+    openapi_path_id: uuid.UUID
+    source_hash: bytes | None
+
+
+@dataclass
+class SpecDiff:
+    """How the operations of an updated spec differ from its configured ones"""
+
+    added: List[OperationKey] = field(default_factory=list)
+    # Operations to regenerate in place, keeping their ids
+    changed: Dict[OperationKey, uuid.UUID] = field(default_factory=dict)
+    removed: List[uuid.UUID] = field(default_factory=list)
+    unchanged: int = 0
+
+    def is_regenerated(self, key: OperationKey) -> bool:
+        """Whether the operation's tool call spec and prompts are (re)built"""
+        return key in self.changed or key in self.added
+
+    def compare(
+        self,
+        key: OperationKey,
+        source_hash: bytes | None,
+        previous: ExistingOperation | None,
+    ):
+        """Sort one operation of the updated spec into added, changed or
+        unchanged. Operations without a source hash on either side cannot be
+        compared, so they always count as changed."""
+        if previous is None:
+            self.added.append(key)
+        elif source_hash is None or previous.source_hash != source_hash:
+            self.changed[key] = previous.openapi_operation_id
+        else:
+            self.unchanged += 1
+
+    def find_removed(
+        self,
+        existing: Dict[OperationKey, ExistingOperation],
+        keys: Iterable[OperationKey],
+    ):
+        """Set `removed` to the configured operations not among `keys`, those
+        of the updated spec"""
+        keys = set(keys)
+        self.removed = [
+            previous.openapi_operation_id
+            for key, previous in existing.items()
+            if key not in keys
+        ]
+
+
+def operation_source_hashes(
+    spec: dict, generator: dict | None = None
+) -> Dict[OperationKey, bytes]:
+    """Source hash of each mapped operation in `spec`, the spec text parsed as
+    plain JSON (with its `$ref`s unresolved), made with the `generator`
+    fingerprint, `GENERATOR` by default"""
+    generator = GENERATOR if generator is None else generator
+    hashes = {}
+    for path_key, path_item in spec.get("paths", {}).items():
+        for verb in MAPPED_VERBS:
+            operation = path_item.get(verb.lower())
+            if not operation:
+                continue
+            source = {
+                "path": path_key,
+                "verb": verb,
+                "path_parameters": path_item.get("parameters"),
+                "operation": operation,
+            }
+            source["refs"] = _referenced_components(spec, source)
+            source["generator"] = generator
+            hashes[(path_key, verb)] = hashlib.sha256(
+                json.dumps(source, sort_keys=True, separators=(",", ":")).encode()
+            ).digest()
+    return hashes
+
+
+def _referenced_components(spec: dict, node) -> Dict[str, object]:
+    """Every local `$ref` reachable from `node`, mapped to what it points to"""
+    found: Dict[str, object] = {}
+    pending = [node]
+    while pending:
+        for ref in _local_refs(pending.pop()):
+            if ref in found:
+                continue
+            found[ref] = _resolve_pointer(spec, ref)
+            pending.append(found[ref])
+    return found
+
+
+def _local_refs(node) -> Set[str]:
+    refs = set()
+    pending = [node]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, dict):
+            ref = item.get("$ref")
+            if isinstance(ref, str) and ref.startswith("#/"):
+                refs.add(ref)
+            pending.extend(item.values())
+        elif isinstance(item, list):
+            pending.extend(item)
+    return refs
+
+
+def _resolve_pointer(spec: dict, ref: str):
+    """The target of a local JSON pointer, or None if it does not resolve"""
+    target = spec
+    for token in ref[2:].split("/"):
+        token = token.replace("~1", "/").replace("~0", "~")
+        if isinstance(target, dict) and token in target:
+            target = target[token]
+        elif isinstance(target, list) and token.isdigit() and int(token) < len(target):
+            target = target[int(token)]
+        else:
+            return None
+    return target
@@ -0,0 +1,70 @@
+"""The config algorithm's spec-loading stage. The spec text is parsed once,
+and every later stage works from the resulting `SpecDocument` instead of
+parsing the text again."""
+
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator
+
+import jsonref
+
+from .openapi_schema_adapter import OpenAPISchemaAdapter
+from .openapi_schema_validate import (
+    parse_spec_text,
+    spec_text_hash,
+    validate_openapi_document,
+)
+
+
+@dataclass
+class SpecDocument:
+    """A parsed, validated spec. Both views are shared by the config stages
+    and must not be modified after loading."""
+
+    # The spec as written, with its `$ref`s unresolved
+    raw: dict
+    # A copy of `raw` with every `$ref` replaced by a proxy to its (shared)
+    # target, and CueCode's preprocessing fixes applied
+    resolved: dict
+    # Seconds spent in each stage, in the order the stages ran
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """Add the time spent in the `with` block to `timings[stage]`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = (
+                self.timings.get(stage, 0.0) + time.perf_counter() - start
+            )
+
+    def log_timings(self, spec_id):
+        """Log the time spent in each stage"""
+        logging.info(
+            "Loaded spec %s in %.3fs (%s)",
+            spec_id,
+            sum(self.timings.values()),
+            ", ".join(
+                f"{stage} {seconds:.3f}s" for stage, seconds in self.timings.items()
+            ),
+        )
+
+
+def load_spec_document(spec_text: str) -> SpecDocument:
+    """Parse and validate the spec text, then resolve its `$ref`s eagerly, so
+    that each is looked up once rather than on every access. Raises an
+    `OpenAPISpecValidationError` if the text is not a valid OpenAPI spec."""
+    document = SpecDocument(raw={}, resolved={})
+    with document.timed("parse"):
+        document.raw = parse_spec_text(spec_text)
+    with document.timed("validate"):
+        validate_openapi_document(document.raw, spec_text_hash(spec_text))
+    with document.timed("resolve_refs"):
+        document.resolved = jsonref.replace_refs(document.raw, lazy_load=False)
+    with document.timed("clean"):
+        OpenAPISchemaAdapter.clean_json_dict(document.resolved)
+    return document
@@ -0,0 +1,158 @@
+"""Streaming ingestion of very large specs. Loading a spec as one document
+holds the parsed JSON, a copy with `$ref` proxies and the pydantic model all at
+once, several times the size of the spec text. A `SpecStream` instead parses
+every top-level member except `paths`, and hands out the path items one at a
+time, with their `$ref`s resolved on demand against the parsed components."""
+
+import json
+import re
+from typing import Dict, Iterator, List, Tuple
+
+import jsonref
+import orjson
+from jsonref import JsonRef, URIDict  # pylint: disable=import-error
+
+from .openapi_schema_adapter import OpenAPISchemaAdapter
+from .openapi_schema_validate import OpenAPISpecValidationError, list_validation_errors
+from .openapi_spec_diff import OperationKey, operation_source_hashes
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_DECODER = json.JSONDecoder()
+
+
+class SpecStream:
+    """A spec whose path items are parsed one at a time from the spec text.
+    `document` has every other top-level member, parsed as plain JSON."""
+
+    def __init__(self, spec_text: str):
+        self.spec_text = spec_text
+        self.document: dict = {}
+        self._paths: List[Tuple[str, int, int]] = []
+        try:
+            start = _skip_whitespace(spec_text, 0)
+            if not spec_text.startswith("{", start):
+                raise _syntax_error(spec_text, start, "the spec must be a JSON object")
+            members: List[Tuple[str, int, int]] = []
+            end = _object_members(
+                spec_text, start, members, expand={"paths": self._paths}
+            )
+            end = _skip_whitespace(spec_text, end)
+            if end != len(spec_text):
+                raise _syntax_error(spec_text, end, "unexpected data after the spec")
+            for key, value_start, value_end in members:
+                if key != "paths":
+                    self.document[key] = orjson.loads(spec_text[value_start:value_end])
+        # orjson.JSONDecodeError is a json.JSONDecodeError
+        except json.JSONDecodeError as e:
+            raise OpenAPISpecValidationError(
+                [f"line {e.lineno}, column {e.colno}: {e.msg}"]
+            ) from e
+        # Path items' $refs resolve against a copy of the document with its own
+        # $refs replaced by proxies, the way the whole spec is resolved
+        self._resolved = OpenAPISchemaAdapter.clean_json_dict(
+            jsonref.replace_refs(self.document)
+        )
+        self._store = URIDict()
+        self._store[""] = self._resolved
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    @property
+    def servers(self) -> list:
+        """The spec's top-level servers, as plain JSON"""
+        return self.document.get("servers") or []
+
+    def validate(self):
+        """Raise an `OpenAPISpecValidationError` if the spec without its paths is
+        not a valid OpenAPI spec. Path items are only checked as their models
+        are built."""
+        errors = list_validation_errors({**self.document, "paths": {}})
+        if errors:
+            raise OpenAPISpecValidationError(errors)
+
+    def iter_raw_paths(self) -> Iterator[Tuple[str, dict]]:
+        """(path, path item) for each path, parsed as plain JSON when reached"""
+        for path_key, start, end in self._paths:
+            yield path_key, orjson.loads(self.spec_text[start:end])
+
+    def iter_resolved_paths(self) -> Iterator[Tuple[str, dict]]:
+        """(path, path item) for each path, with `$ref`s replaced by proxies to
+        their targets"""
+        for path_key, path_item, _ in self.iter_hashed_paths():
+            yield path_key, path_item
+
+    def iter_hashed_paths(
+        self,
+    ) -> Iterator[Tuple[str, dict, Dict[OperationKey, bytes]]]:
+        """(path, path item, source hashes) for each path, the path item as
+        `iter_resolved_paths` gives it, and the source hash of each of its
+        mapped operations as `operation_source_hashes` gives it for the whole
+        spec. Each path item is parsed once for both."""
+        for path_key, path_item in self.iter_raw_paths():
+            hashes = operation_source_hashes(
+                {**self.document, "paths": {path_key: path_item}}
+            )
+            yield path_key, self.resolve(path_item), hashes
+
+    def resolve(self, node):
+        """A copy of `node` with each `$ref` replaced by a lazy proxy to its
+        target in this spec"""
+        if isinstance(node, dict):
+            out = {key: self.resolve(value) for key, value in node.items()}
+            if isinstance(out.get("$ref"), str):
+                return JsonRef(out, _store=self._store)
+            return out
+        if isinstance(node, list):
+            return [self.resolve(item) for item in node]
+        return node
+
+
+def _object_members(
+    text: str,
+    start: int,
+    members: List[Tuple[str, int, int]],
+    expand: Dict[str, List[Tuple[str, int, int]]] | None = None,
+) -> int:
+    """Append (key, value start, value end) for each member of the JSON object
+    at `start` to `members`, and return the index after the object. The
+    members of the object values of `expand`'s keys are appended to its lists
+    in turn, so that they are only scanned once."""
+    index = _skip_whitespace(text, start + 1)
+    if text.startswith("}", index):
+        return index + 1
+    while True:
+        match = _STRING.match(text, index)
+        if match is None:
+            raise _syntax_error(text, index, "expected a property name")
+        key = orjson.loads(match.group())
+        index = _skip_whitespace(text, match.end())
+        if not text.startswith(":", index):
+            raise _syntax_error(text, index, "expected ':'")
+        value_start = _skip_whitespace(text, index + 1)
+        if expand and key in expand:
+            if not text.startswith("{", value_start):
+                raise _syntax_error(text, value_start, f"{key} must be an object")
+            value_end = _object_members(text, value_start, expand[key])
+        else:
+            # The C decoder finds the end of a value much faster than a scan
+            # in Python; the value itself is dropped
+            value_end = _DECODER.raw_decode(text, value_start)[1]
+        members.append((key, value_start, value_end))
+        index = _skip_whitespace(text, value_end)
+        if text.startswith("}", index):
+            return index + 1
+        if not text.startswith(",", index):
+            raise _syntax_error(text, index, "expected ',' or '}'")
+        index = _skip_whitespace(text, index + 1)
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    return _WHITESPACE.match(text, index).end()
+
+
+def _syntax_error(text: str, index: int, message: str) -> OpenAPISpecValidationError:
+    line = text.count("\n", 0, index) + 1
+    column = index - (text.rfind("\n", 0, index) + 1) + 1
+    return OpenAPISpecValidationError([f"line {line}, column {column}: {message}"])
@@ -68,7 +68,9 @@ def make_tool_call_spec(
 
             param_info: dict = {}
             if param.schema_ is not None:
-                param_info = param.schema_
+                # Copy, since the schema may be shared with other parameters
+                # through a $ref
+                param_info = {**param.schema_}
 
             if param_description is not None:
                 param_info["description"] = param_description
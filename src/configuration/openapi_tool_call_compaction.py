@@ -0,0 +1,190 @@
+"""Compaction of LLM tool call specs. The schemas copied from the OpenAPI spec
+carry keywords the LLM does not need to fill in a payload (XML mappings,
+external docs, vendor extensions, long examples); dropping them shrinks the
+stored specs, the runtime search responses and the LLM prompts."""
+
+import logging
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Tuple
+
+import orjson
+
+from common.app_config import (
+    TOOL_CALL_SPEC_MAX_EXAMPLE_BYTES,
+    TOOL_CALL_SPEC_STRIP_KEYS,
+    TOOL_CALL_SPEC_TOKEN_ENCODING,
+)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Keywords whose value maps names to subschemas. In tool call specs the
+# request body's "oneOf" maps media types to schemas.
+_SCHEMA_MAPS = {
+    "properties",
+    "patternProperties",
+    "$defs",
+    "definitions",
+    "dependentSchemas",
+    "oneOf",
+}
+# Keywords whose value is a subschema or a list of subschemas
+_SUBSCHEMAS = {
+    "items",
+    "additionalItems",
+    "prefixItems",
+    "additionalProperties",
+    "unevaluatedItems",
+    "unevaluatedProperties",
+    "propertyNames",
+    "contains",
+    "not",
+    "if",
+    "then",
+    "else",
+    "allOf",
+    "anyOf",
+    "oneOf",
+}
+_EXAMPLE_KEYS = {"example", "examples"}
+# Vendor extensions CueCode itself reads are kept
+_KEPT_EXTENSION_PREFIX = "x-cuecode"
+
+
+@dataclass
+class ToolCallSpecSizes:
+    """Total size of tool call specs before and after compaction"""
+
+    specs: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    def add(self, other: "ToolCallSpecSizes"):
+        """Add `other`'s totals to these"""
+        self.specs += other.specs
+        self.bytes_before += other.bytes_before
+        self.bytes_after += other.bytes_after
+        self.tokens_before += other.tokens_before
+        self.tokens_after += other.tokens_after
+
+
+class ToolCallSpecCompactor:
+    """Strips non-essential keywords from the schemas of tool call specs and
+    keeps size totals in `sizes`. Subschemas shared between specs, e.g. by
+    the `RefResolver`, are compacted once and shared in the results."""
+
+    def __init__(
+        self,
+        strip_keys: Iterable[str] = tuple(TOOL_CALL_SPEC_STRIP_KEYS),
+        max_example_bytes: int = TOOL_CALL_SPEC_MAX_EXAMPLE_BYTES,
+    ):
+        self.strip_keys = {key for key in strip_keys if key}
+        self.max_example_bytes = max_example_bytes
+        self.sizes = ToolCallSpecSizes()
+        # id(schema) -> (schema, compacted schema); holding the schema keeps
+        # its id from being reused
+        self._memo: Dict[int, Tuple[Any, Any]] = {}
+
+    def compact_tool_call_spec(self, spec: dict) -> dict:
+        """A copy of the tool call spec with its parameter schemas compacted"""
+        function = spec["function"]
+        compacted = {
+            **spec,
+            "function": {
+                **function,
+                "parameters": self.compact_schema(function["parameters"]),
+            },
+        }
+        before = spec_size(spec)
+        after = spec_size(compacted)
+        self.sizes.add(
+            ToolCallSpecSizes(
+                specs=1,
+                bytes_before=before[0],
+                bytes_after=after[0],
+                tokens_before=before[1],
+                tokens_after=after[1],
+            )
+        )
+        logging.debug(
+            "Compacted tool call spec %s from %d to %d bytes, %d to %d tokens",
+            function.get("name"),
+            before[0],
+            after[0],
+            before[1],
+            after[1],
+        )
+        return compacted
+
+    def compact_schema(self, schema):
+        """A copy of the JSON schema without the stripped keywords"""
+        if not isinstance(schema, Mapping):
+            return schema
+        memo = self._memo.get(id(schema))
+        if memo is not None and memo[0] is schema:
+            return memo[1]
+        out = {}
+        for key, value in schema.items():
+            if key in self.strip_keys or (
+                key.startswith("x-") and not key.startswith(_KEPT_EXTENSION_PREFIX)
+            ):
+                continue
+            if key in _EXAMPLE_KEYS and self._too_long(value):
+                continue
+            if key in _SCHEMA_MAPS and isinstance(value, Mapping):
+                out[key] = {
+                    name: self.compact_schema(subschema)
+                    for name, subschema in value.items()
+                }
+            elif key in _SUBSCHEMAS and isinstance(value, list):
+                out[key] = [self.compact_schema(subschema) for subschema in value]
+            elif key in _SUBSCHEMAS:
+                out[key] = self.compact_schema(value)
+            else:
+                out[key] = value
+        self._memo[id(schema)] = (schema, out)
+        return out
+
+    def _too_long(self, value) -> bool:
+        try:
+            return len(orjson.dumps(value)) > self.max_example_bytes
+        except TypeError:
+            return True
+
+
+def spec_size(spec: dict) -> Tuple[int, int]:
+    """(bytes, tokens) of the spec serialized as JSON"""
+    text = orjson.dumps(spec)
+    return len(text), count_tokens(text.decode("utf-8"))
+
+
+def count_tokens(text: str, encoding_name: str = TOOL_CALL_SPEC_TOKEN_ENCODING) -> int:
+    """Tokens in `text`, or an estimate of 4 bytes per token if the encoding
+    cannot be loaded"""
+    encoding = _token_encoding(encoding_name)
+    if encoding is None:
+        return -(-len(text.encode("utf-8")) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=None)
+def _token_encoding(encoding_name: str):
+    if tiktoken is None:
+        logging.info("tiktoken is not installed; estimating token counts")
+        return None
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    # Loading an encoding may need to download it
+    except Exception:  # pylint: disable=broad-exception-caught
+        logging.warning(
+            "Could not load token encoding %s; estimating token counts",
+            encoding_name,
+            exc_info=True,
+        )
+        return None
@@ -1,21 +1,57 @@
 """Module for OpenAPIValidatorToSpecEntitiesMapper"""
 
+import logging
+import multiprocessing
+import pickle
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+from typing import Dict, Iterable, List, Tuple
 from urllib.parse import urlparse
 
-import jsonref
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import scoped_session
 
+from common.app_config import (
+    CONFIG_ALGO_PARALLEL_MIN_OPERATIONS,
+    CONFIG_ALGO_WORKERS,
+    OPENAPI_STREAMING_BATCH_OPERATIONS,
+    TOOL_CALL_SPEC_COMPACT,
+)
 from common.models.openapi_operation import OpenAPIOperation
+from common.models.openapi_operation_selection import OpenAPIOperationSelectionPrompt
 from common.models.openapi_path import OpenAPIPath
 from common.models.openapi_server import OpenAPIServer
 from common.models.openapi_spec import OpenAPISpec
-from configuration.openapi import OpenAPIObject, OperationObject
+from configuration.config_algo_metrics import config_algo_metrics, timed_stage
+from configuration.openapi import (
+    OpenAPIObject,
+    OperationObject,
+    PathItemObject,
+    ServerObject,
+)
+from configuration.openapi_bulk_insert import (
+    ConfigOutputRows,
+    insert_config_output_rows,
+)
+from configuration.openapi_mutation_model import build_path_item_model
 from configuration.openapi_operation_embedding import (
-    create_operation_prompts_without_embeddings,
+    PendingOperationPrompts,
+    make_spec_selection_prompt_rows,
 )
+from configuration.openapi_ref_resolver import RefResolver
+from configuration.openapi_spec_diff import ExistingOperation, OperationKey, SpecDiff
 from configuration.openapi_spec_entity_collection import OpenAPISpecEntityCollection
+from configuration.openapi_spec_stream import SpecStream
 from configuration.openapi_tool_call import make_tool_call_spec
+from configuration.openapi_tool_call_compaction import (
+    ToolCallSpecCompactor,
+    ToolCallSpecSizes,
+)
+
+# (path string, HTTP verb, operation object) for one operation's tool call spec
+ToolCallSpecJob = Tuple[str, str, OperationObject]
 
 
 class CueCodeOpenAPIConstraintError(ValueError):
@@ -26,30 +62,36 @@ class CueCodeOpenAPIConstraintError(ValueError):
 
 
 def build_and_add_server_from_spec(
-    validator: OpenAPIObject, db_spec: OpenAPISpec, session: scoped_session
+    servers: List[ServerObject], db_spec: OpenAPISpec, session: scoped_session
 ) -> OpenAPIServer:
-    """Builds the OpenAPI server model instance and raises an exception if the spec
-    does not meet CueCode's constraints on OpenAPI spec structure with
-    respect to Servers."""
+    """Builds the OpenAPI server model instance, or updates the spec's existing
+    one, and raises an exception if the spec does not meet CueCode's
+    constraints on OpenAPI spec structure with respect to Servers."""
 
-    if len(validator.servers) > 1 or len(validator.servers) < 1:
+    if len(servers) > 1 or len(servers) < 1:
         raise CueCodeOpenAPIConstraintError(
             "CueCode accepts 1 and only 1 OpenAPI server. "
-            + f"You have supplied {len(validator.servers)}"
+            + f"You have supplied {len(servers)}"
         )
 
-    validator_server = validator.servers[0]
+    validator_server = servers[0]
 
     if not urlparse(validator_server.url):
         raise CueCodeOpenAPIConstraintError(
             f"OpenAPI server URL {validator_server.url} is not a fully qualified URL."
         )
 
-    openapi_server = OpenAPIServer(
-        openapi_server_id=uuid.uuid4(),
-        spec_id=db_spec.openapi_spec_id,
-        base_url=validator_server.url,
-    )
+    # Re-configuring an updated spec keeps its server, which the unchanged
+    # operations reference
+    openapi_server = session.scalars(
+        select(OpenAPIServer).where(OpenAPIServer.spec_id == db_spec.openapi_spec_id)
+    ).first()
+    if openapi_server is None:
+        openapi_server = OpenAPIServer(
+            openapi_server_id=uuid.uuid4(),
+            spec_id=db_spec.openapi_spec_id,
+        )
+    openapi_server.base_url = validator_server.url
     session.add(openapi_server)
     return openapi_server
 
@@ -57,64 +99,370 @@ def build_and_add_server_from_spec(
 def openapi_spec_validator_to_cuecode_config(
     session: scoped_session,
     validator: OpenAPIObject,
-    db_spec: OpenAPISpec,  # pylint: disable=unused-argument
+    db_spec: OpenAPISpec,
+    source_hashes: Dict[OperationKey, bytes] | None = None,
 ) -> OpenAPISpecEntityCollection:
     """Map the OpenAPI OpenAPIObject object members to SQLAlchemy entities that are
-    relevant to the runtime algorithm
+    relevant to the runtime algorithm, and write them in bulk without
+    committing
+
+    If the spec was configured before, only operations that were added or
+    whose `source_hashes` entry changed are regenerated; removed operations
+    are deleted and the others are left untouched.
 
     Guarantees consistent entity relationships.
     """
+    path_hashes: Dict[str, Dict[OperationKey, bytes]] = {}
+    for (path_key, verb), source_hash in (source_hashes or {}).items():
+        path_hashes.setdefault(path_key, {})[(path_key, verb)] = source_hash
+    return map_spec_paths(
+        session,
+        db_spec,
+        validator.servers,
+        (
+            (path_key, path, path_hashes.get(path_key, {}))
+            for path_key, path in validator.paths.items()
+        ),
+    )
+
+
+def openapi_spec_stream_to_cuecode_config(
+    session: scoped_session,
+    stream: SpecStream,
+    db_spec: OpenAPISpec,
+    batch_operations: int = OPENAPI_STREAMING_BATCH_OPERATIONS,
+) -> OpenAPISpecEntityCollection:
+    """Map a streamed spec like `openapi_spec_validator_to_cuecode_config`
+    maps a parsed one. Path items are parsed, modelled and mapped one at a
+    time, and the tool call specs and selection prompts of every
+    `batch_operations` regenerated operations are made and their rows written
+    before moving on, so only one batch of operation models and rows is held
+    at a time."""
+    servers = [ServerObject.model_validate(server) for server in stream.servers]
+    # The stream's path items were not validated against the OpenAPI schema;
+    # their models validate them
+    paths = (
+        (path_key, build_path_item_model(path_item), hashes)
+        for path_key, path_item, hashes in stream.iter_hashed_paths()
+    )
+    return map_spec_paths(session, db_spec, servers, paths, batch_operations)
+
 
+# pylint: disable-next=too-many-arguments, too-many-positional-arguments, too-many-locals
+def map_spec_paths(
+    session: scoped_session,
+    db_spec: OpenAPISpec,
+    servers: List[ServerObject],
+    paths: Iterable[Tuple[str, PathItemObject, Dict[OperationKey, bytes]]],
+    batch_operations: int | None = None,
+) -> OpenAPISpecEntityCollection:
+    """Map the spec's `paths`, read once and in order, each with the source
+    hashes of its mapped operations. Operations are diffed against the spec's
+    configured ones as they are read. Tool call specs and selection prompts
+    are made for every `batch_operations` regenerated operations, or all at
+    once if it is None."""
     openapi_server = build_and_add_server_from_spec(
-        validator=validator, db_spec=db_spec, session=session
+        servers=servers, db_spec=db_spec, session=session
     )
+    existing, path_ids = load_existing_operations(session, db_spec.openapi_spec_id)
+    diff = SpecDiff()
+    keys: List[OperationKey] = []
+    spec_paths = set()
 
-    for path_key in validator.paths:
-        # Get Path obj
-        v_path = validator.paths[path_key]
-        path = OpenAPIPath(
-            openapi_path_id=uuid.uuid4(),
-            openapi_spec_id=db_spec.openapi_spec_id,
-            spec=db_spec,
-            path_templated=make_templated_path(path_key),
-        )
-        session.add(path)
-        # Pull only HTTP methods used for data mutation
-
-        operation_info: list[dict[str, OperationObject]] = [
-            {"verb": "POST", "op_obj": v_path.post},
-            {"verb": "PATCH", "op_obj": v_path.patch},
-            {"verb": "PUT", "op_obj": v_path.put},
-            {"verb": "DELETE", "op_obj": v_path.delete},
-        ]
-
-        for op in operation_info:
-            op_obj: OperationObject = op["op_obj"]
-            if not op_obj:
+    # Tool call specs are the CPU-heavy part, so they are built for a batch of
+    # regenerated operations at once, possibly in parallel; the batch's
+    # selection prompts are made together too, so that its descriptions are
+    # split into sentences in one pass. Each batch's rows are then written in
+    # bulk, so only one batch of rows is held at a time.
+    batch = _OperationBatch()
+    path_count = 0
+    prompt_count = 0
+    for path_key, v_path, hashes in paths:
+        path_count += 1
+        path_templated = make_templated_path(path_key)
+        spec_paths.add(path_templated)
+        path_id = path_ids.get(path_templated)
+        if path_id is None:
+            path_id = uuid.uuid4()
+            path_ids[path_templated] = path_id
+            batch.rows.paths.append(
+                {
+                    "openapi_path_id": path_id,
+                    "openapi_spec_id": db_spec.openapi_spec_id,
+                    "path_templated": path_templated,
+                }
+            )
+        for verb, op_obj in mutating_operations(v_path):
+            key = (path_key, verb)
+            keys.append(key)
+            diff.compare(key, hashes.get(key), existing.get(key))
+            if not diff.is_regenerated(key):
                 continue
+            operation = {
+                "openapi_operation_id": diff.changed.get(key) or uuid.uuid4(),
+                "openapi_path_id": path_id,
+                "openapi_server_id": openapi_server.openapi_server_id,
+                "http_verb": verb,
+                "llm_content_gen_tool_call_spec": None,
+                "source_hash": hashes.get(key),
+            }
+            batch.add(operation, path_key, verb, op_obj, key in diff.changed)
+        if batch_operations is not None and len(batch) >= batch_operations:
+            prompt_count += batch.finish(session)
+    prompt_count += batch.finish(session)
+    diff.find_removed(existing, keys)
+    logging.info(
+        "Spec %s: %d operations added, %d changed, %d removed, %d unchanged",
+        db_spec.openapi_spec_id,
+        len(diff.added),
+        len(diff.changed),
+        len(diff.removed),
+        diff.unchanged,
+    )
+
+    # Deleting an operation deletes its prompts. Paths the updated spec no
+    # longer has are deleted too, whether or not they had operations; the
+    # others are kept, as configuring the spec afresh would.
+    if diff.removed:
+        session.execute(
+            delete(OpenAPIOperation).where(
+                OpenAPIOperation.openapi_operation_id.in_(diff.removed)
+            )
+        )
+    delete_paths(
+        session,
+        [
+            path_id
+            for path_templated, path_id in path_ids.items()
+            if path_templated not in spec_paths
+        ],
+    )
+
+    metrics = config_algo_metrics()
+    metrics.paths.inc(path_count)
+    metrics.operations.inc(len(diff.added) + len(diff.changed))
+    metrics.selection_prompts.inc(prompt_count)
+
+    return OpenAPISpecEntityCollection()
+
+
+class _OperationBatch:
+    """Regenerated operations whose tool call specs and selection prompts are
+    still to be made, and the rows still to be written with them"""
+
+    def __init__(self):
+        self.rows = ConfigOutputRows()
+        # Rows of changed operations, which update their configured rows
+        self.updates: List[dict] = []
+        self.operations: List[dict] = []
+        self.jobs: List[ToolCallSpecJob] = []
+        self.pending_prompts: List[PendingOperationPrompts] = []
 
-            tool_call_spec = jsonref.replace_refs(
-                make_tool_call_spec(
-                    path_name=path_key, operation_object=op_obj, http_verb=op["verb"]
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    # pylint: disable-next=too-many-arguments, too-many-positional-arguments
+    def add(
+        self,
+        operation: dict,
+        path_key: str,
+        verb: str,
+        op_obj: OperationObject,
+        changed: bool,
+    ):
+        """Add an operation row, whose tool call spec is filled in later. A
+        `changed` operation's row updates its configured one."""
+        (self.updates if changed else self.rows.operations).append(operation)
+        self.operations.append(operation)
+        self.jobs.append((path_key, verb, op_obj))
+        self.pending_prompts.append(
+            (operation["openapi_operation_id"], verb, path_key, op_obj)
+        )
+
+    def finish(self, session: scoped_session) -> int:
+        """Fill in the operation rows' tool call specs, make their selection
+        prompts, write the batch's rows without committing, and empty the
+        batch. Returns the number of selection prompts made."""
+        if self.jobs:
+            with timed_stage("tool_call_specs"):
+                specs = build_tool_call_specs(self.jobs)
+            for operation, spec in zip(self.operations, specs):
+                operation["llm_content_gen_tool_call_spec"] = spec
+            with timed_stage("selection_prompts"):
+                self.rows.selection_prompts = make_spec_selection_prompt_rows(
+                    self.pending_prompts
+                )
+        prompt_count = len(self.rows.selection_prompts)
+
+        with timed_stage("insert"):
+            if self.updates:
+                # Changed operations get new prompts; the server their rows
+                # reference may only have been added through the ORM
+                session.flush()
+                session.execute(
+                    delete(OpenAPIOperationSelectionPrompt).where(
+                        OpenAPIOperationSelectionPrompt.openapi_operation_id.in_(
+                            [op["openapi_operation_id"] for op in self.updates]
+                        )
+                    )
                 )
+                session.execute(update(OpenAPIOperation), self.updates)
+            if self.rows:
+                insert_config_output_rows(session, self.rows)
+
+        self.rows = ConfigOutputRows()
+        self.updates, self.operations = [], []
+        self.jobs, self.pending_prompts = [], []
+        return prompt_count
+
+
+def load_existing_operations(
+    session: scoped_session, spec_id
+) -> Tuple[Dict[OperationKey, ExistingOperation], Dict[str, uuid.UUID]]:
+    """The spec's configured operations by (path, verb), and its configured
+    paths' ids by templated path"""
+    operations: Dict[OperationKey, ExistingOperation] = {}
+    path_ids: Dict[str, uuid.UUID] = {}
+    for row in session.execute(
+        select(
+            OpenAPIPath.openapi_path_id,
+            OpenAPIPath.path_templated,
+            OpenAPIOperation.openapi_operation_id,
+            OpenAPIOperation.http_verb,
+            OpenAPIOperation.source_hash,
+        )
+        .outerjoin(OpenAPIPath.operations)
+        .where(OpenAPIPath.openapi_spec_id == spec_id)
+    ):
+        path_ids[row.path_templated] = row.openapi_path_id
+        if row.openapi_operation_id is not None:
+            operations[(row.path_templated, row.http_verb.value)] = ExistingOperation(
+                openapi_operation_id=row.openapi_operation_id,
+                openapi_path_id=row.openapi_path_id,
+                source_hash=row.source_hash,
             )
-            print(type(tool_call_spec))  # DEBUG
-
-            db_op = OpenAPIOperation(
-                openapi_path_id=path.openapi_path_id,
-                # path=path,
-                openapi_server_id=openapi_server.openapi_server_id,
-                http_verb=op["verb"],
-                llm_content_gen_tool_call_spec=tool_call_spec,
+    return operations, path_ids
+
+
+def delete_paths(session: scoped_session, path_ids: List[uuid.UUID]):
+    """Delete the given paths, and their operations with them"""
+    if path_ids:
+        session.execute(
+            delete(OpenAPIPath).where(OpenAPIPath.openapi_path_id.in_(path_ids))
+        )
+
+
+def mutating_operations(path: PathItemObject) -> List[Tuple[str, OperationObject]]:
+    """(HTTP verb, operation) for each of the path's operations that mutate
+    data, the only ones CueCode calls"""
+    operation_info = [
+        ("POST", path.post),
+        ("PATCH", path.patch),
+        ("PUT", path.put),
+        ("DELETE", path.delete),
+    ]
+    return [(verb, op_obj) for verb, op_obj in operation_info if op_obj]
+
+
+def build_tool_call_spec(
+    job: ToolCallSpecJob,
+    resolver: RefResolver | None = None,
+    compactor: ToolCallSpecCompactor | None = None,
+) -> dict:
+    """The LLM tool call spec for one operation, with its `$ref`s replaced and,
+    given a `compactor`, its schemas compacted. Pass the same `resolver` for
+    all of a spec's operations to expand each shared schema once."""
+    path_key, verb, op_obj = job
+    spec, defs = (resolver or RefResolver()).resolve(
+        make_tool_call_spec(path_name=path_key, operation_object=op_obj, http_verb=verb)
+    )
+    if defs:
+        spec["function"]["parameters"]["$defs"] = defs
+    if compactor is not None:
+        spec = compactor.compact_tool_call_spec(spec)
+    return spec
+
+
+def build_tool_call_spec_chunk(
+    jobs: List[ToolCallSpecJob], compact: bool = TOOL_CALL_SPEC_COMPACT
+) -> Tuple[List[dict], ToolCallSpecSizes | None]:
+    """Tool call specs for `jobs`, sharing one `RefResolver`, and their total
+    sizes before and after compaction if `compact` is set"""
+    resolver = RefResolver()
+    compactor = ToolCallSpecCompactor() if compact else None
+    specs = [build_tool_call_spec(job, resolver, compactor) for job in jobs]
+    logging.debug(
+        "Resolved $refs for %d tool call specs: %d cache hits, %d misses",
+        len(specs),
+        resolver.hits,
+        resolver.misses,
+    )
+    return specs, compactor.sizes if compactor else None
+
+
+@lru_cache(maxsize=None)
+def tool_call_spec_pool(workers: int) -> ProcessPoolExecutor:
+    """This process' pool of `workers` processes for building tool call specs,
+    started on first use and kept for later specs. Workers come from a
+    forkserver rather than forking this process, which may have other threads
+    running and torch loaded."""
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("forkserver")
+    )
+
+
+def build_tool_call_specs(
+    jobs: List[ToolCallSpecJob],
+    workers: int = CONFIG_ALGO_WORKERS,
+    min_parallel_jobs: int = CONFIG_ALGO_PARALLEL_MIN_OPERATIONS,
+    compact: bool = TOOL_CALL_SPEC_COMPACT,
+) -> List[dict]:
+    """Tool call specs for `jobs`, in the same order. Large specs are spread
+    over a pool of `workers` processes, in chunks that each share a
+    `RefResolver`; small ones, or specs whose objects cannot be sent to
+    another process, are built serially."""
+    if workers <= 1 or len(jobs) < max(2, min_parallel_jobs):
+        chunk_results = [build_tool_call_spec_chunk(jobs, compact)]
+    else:
+        chunk_size = max(1, len(jobs) // (workers * 4))
+        chunks = [jobs[i : i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        try:
+            # map() yields results in job order, whichever worker finishes first
+            chunk_results = list(
+                tool_call_spec_pool(workers).map(
+                    partial(build_tool_call_spec_chunk, compact=compact), chunks
+                )
             )
-            create_operation_prompts_without_embeddings(
-                db_op, op["verb"], path, path_key, op_obj, session
+        except (
+            pickle.PicklingError,
+            TypeError,
+            AttributeError,
+            BrokenProcessPool,
+        ) as e:
+            if isinstance(e, BrokenProcessPool):
+                # Start a new pool for the next spec
+                tool_call_spec_pool.cache_clear()
+            logging.warning(
+                "Could not build tool call specs in worker processes; "
+                + "building serially",
+                exc_info=True,
             )
-            path.operations.append(db_op)
+            chunk_results = [build_tool_call_spec_chunk(jobs, compact)]
 
-        db_spec.paths.append(path)
-
-    return OpenAPISpecEntityCollection()
+    sizes = ToolCallSpecSizes()
+    for _, chunk_sizes in chunk_results:
+        if chunk_sizes is not None:
+            sizes.add(chunk_sizes)
+    if sizes.specs:
+        logging.info(
+            "Compacted %d tool call specs from %d to %d bytes, %d to %d tokens",
+            sizes.specs,
+            sizes.bytes_before,
+            sizes.bytes_after,
+            sizes.tokens_before,
+            sizes.tokens_after,
+        )
+    return [spec for chunk_specs, _ in chunk_results for spec in chunk_specs]
 
 
 def create_selection_embeddings(db_spec: OpenAPISpec, session: scoped_session):
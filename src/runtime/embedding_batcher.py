@@ -0,0 +1,167 @@
+"""Dynamic micro-batching of runtime query embeddings. Encoding 32 sentences
+in one call costs little more than encoding one, so queries that arrive while
+the model is busy, or within a few milliseconds of each other, are queued and
+embedded together by a single worker thread.
+
+Request threads call `embed()`, which blocks; asyncio code awaits
+`embed_async()`. Both wait on the same queue."""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Callable, List
+
+from numpy import ndarray
+
+from common.app_config import (
+    EMBEDDING_MODEL_NAME,
+    RUNTIME_EMBEDDING_BATCH_MAX_SIZE,
+    RUNTIME_EMBEDDING_BATCH_MAX_WAIT_MS,
+)
+from common.embedding_model import embed_texts
+
+
+def _embed_normalized(texts: List[str], model_name: str) -> ndarray:
+    return embed_texts(texts, model_name, normalize_embeddings=True)
+
+
+# pylint: disable-next=too-few-public-methods
+class _PendingQuery:
+    def __init__(self, text: str):
+        self.text = text
+        self.enqueued_at = time.monotonic()
+        self.future: Future = Future()
+
+
+# pylint: disable-next=too-many-instance-attributes
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into batches of at
+    most `max_batch_size`. The oldest queued text waits at most `max_wait_ms`
+    for a batch to fill before the batch is encoded.
+
+    The worker thread starts on first use, and again in a forked child, so
+    creating a batcher at import time is safe under pre-forking servers."""
+
+    def __init__(
+        self,
+        max_batch_size: int,
+        max_wait_ms: float,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        embed: Callable[[List[str], str], ndarray] = _embed_normalized,
+    ):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0.0, max_wait_ms) / 1000
+        self.model_name = model_name
+        self._embed = embed
+        self._queue: queue.SimpleQueue[_PendingQuery] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._thread_pid: int | None = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter[int] = Counter()
+        self._total_queue_seconds = 0.0
+        self._max_queue_seconds = 0.0
+        self._total_encode_seconds = 0.0
+
+    def submit(self, text: str) -> Future:
+        """Queue `text`; the future resolves to its unit-length embedding"""
+        self._ensure_worker()
+        pending = _PendingQuery(text)
+        self._queue.put(pending)
+        return pending.future
+
+    def embed(self, text: str) -> ndarray:
+        """Embedding of `text`, blocking until its batch has been encoded"""
+        return self.submit(text).result()
+
+    async def embed_async(self, text: str) -> ndarray:
+        """Embedding of `text`, without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def stats(self) -> dict:
+        """Batch size distribution and queueing delay"""
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            texts = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+                "batches": batches,
+                "texts": texts,
+                "mean_batch_size": texts / batches if batches else 0.0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+                "mean_queue_ms": (
+                    self._total_queue_seconds / texts * 1000 if texts else 0.0
+                ),
+                "max_queue_ms": self._max_queue_seconds * 1000,
+                "mean_encode_ms": (
+                    self._total_encode_seconds / batches * 1000 if batches else 0.0
+                ),
+            }
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._thread_pid == pid and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread_pid != pid or self._thread is None:
+                if self._thread_pid != pid:
+                    # Queued items from the parent process have no waiter here
+                    self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._thread.start()
+                self._thread_pid = pid
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._encode(batch)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logging.exception("Embedding batch worker failed")
+
+    def _next_batch(self) -> List[_PendingQuery]:
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Take whatever is already queued, without waiting
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _encode(self, batch: List[_PendingQuery]):
+        started = time.monotonic()
+        try:
+            embeddings = self._embed([p.text for p in batch], self.model_name)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            for pending in batch:
+                pending.future.set_exception(e)
+            return
+        finished = time.monotonic()
+        for pending, embedding in zip(batch, embeddings):
+            pending.future.set_result(embedding)
+
+        queue_seconds = [started - p.enqueued_at for p in batch]
+        with self._stats_lock:
+            self._batch_sizes[len(batch)] += 1
+            self._total_queue_seconds += sum(queue_seconds)
+            self._max_queue_seconds = max(self._max_queue_seconds, *queue_seconds)
+            self._total_encode_seconds += finished - started
+
+
+query_embedding_batcher = EmbeddingBatcher(
+    RUNTIME_EMBEDDING_BATCH_MAX_SIZE, RUNTIME_EMBEDDING_BATCH_MAX_WAIT_MS
+)
@@ -1,67 +1,307 @@
 """Module to general API payloads"""
 
+import asyncio
 import logging
+from typing import List
 
-import psycopg2
+import numpy as np
 from numpy import ndarray
-from sentence_transformers import SentenceTransformer
+from sqlalchemy import Connection
 
+from common.app_config import (
+    EMBEDDING_INDEX_PRECISION,
+    HNSW_EF_SEARCH,
+    HNSW_ITERATIVE_SCAN,
+    RUNTIME_SEARCH_AGGREGATION,
+    RUNTIME_SEARCH_BACKEND,
+    RUNTIME_SEARCH_CANDIDATES_PER_RESULT,
+    RUNTIME_SEARCH_RERANK_FACTOR,
+)
+from common.database_engine import DBEngine
+from common.vector_codec import as_float32_rows
 
-def simple_endpoint_search(configuration_id: str, sentence: str):
-    """Example of the similarity search"""
+from .in_memory_vector_index import aggregate_by_operation, spec_vector_indexes
+from .query_embedding_cache import embed_queries, embed_query, embed_query_async
 
-    model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-    logging.debug("simple_endpoint_search starting embedding for text")
-    sentence_list = [sentence]
-    embeddings: ndarray = model.encode(sentence_list)
-    sentence_embedding = embeddings[0]
-
-    # Use config instead
-    conn = psycopg2.connect(
-        database="postgres",
-        host="localhost",
-        user="postgres",
-        password="postgres",
-        port="5432",
+# Nearest operations to one query vector, `{query}`. The candidate prompts,
+# `{candidates}`, come from an HNSW index scan; there are a few per result
+# because operations have several prompts each. Candidates are then grouped by
+# operation, so each operation (and its large tool call spec) is returned once,
+# scored by its best prompt ("max" similarity) or the mean over its candidate
+# prompts ("mean"). The final sort also undoes any reordering from relaxed
+# iterative index scans.
+PER_OPERATION_SEARCH_SQL = """
+    SELECT per_op.cosine_distance, o.openapi_operation_id, o.openapi_server_id,
+        o.openapi_path_id, o.http_verb, per_op.selection_prompt,
+        o.llm_content_gen_tool_call_spec
+    FROM (
+        SELECT c.openapi_operation_id,
+            {aggregate}(c.cosine_distance) AS cosine_distance,
+            (array_agg(c.selection_prompt ORDER BY c.cosine_distance))[1]
+                AS selection_prompt
+        FROM ({candidates}) AS c
+        GROUP BY c.openapi_operation_id
+    ) AS per_op
+    INNER JOIN openapi_operation AS o
+        ON o.openapi_operation_id = per_op.openapi_operation_id
+    ORDER BY per_op.cosine_distance
+    LIMIT %(limit)s
+"""
+
+# Ordering by the bare distance expression, ascending, lets Postgres walk the
+# full-precision HNSW cosine index.
+FULL_PRECISION_CANDIDATES_SQL = """
+            SELECT sp.openapi_operation_id, sp.selection_prompt,
+                sp.selection_prompt_embedding <=> {query} AS cosine_distance
+            FROM openapi_operation_selection_prompt sp
+            INNER JOIN openapi_operation AS o
+                ON sp.openapi_operation_id = o.openapi_operation_id
+            INNER JOIN openapi_server AS s
+                ON s.openapi_server_id = o.openapi_server_id
+            WHERE s.spec_id = %(spec_id)s
+            ORDER BY cosine_distance
+            LIMIT %(candidate_limit)s
+"""
+
+# Two-pass candidates for the quantized index precisions: the first pass walks
+# a smaller, quantized index for `first_pass_limit` prompts, which are then
+# re-scored against the full-precision embeddings.
+RERANKED_CANDIDATES_SQL = """
+            SELECT first_pass.openapi_operation_id, first_pass.selection_prompt,
+                first_pass.selection_prompt_embedding <=> {query}
+                    AS cosine_distance
+            FROM (
+                SELECT sp.openapi_operation_id, sp.selection_prompt,
+                    sp.selection_prompt_embedding
+                FROM openapi_operation_selection_prompt sp
+                INNER JOIN openapi_operation AS o
+                    ON sp.openapi_operation_id = o.openapi_operation_id
+                INNER JOIN openapi_server AS s
+                    ON s.openapi_server_id = o.openapi_server_id
+                WHERE s.spec_id = %(spec_id)s
+                ORDER BY {first_pass_distance}
+                LIMIT %(first_pass_limit)s
+            ) AS first_pass
+            ORDER BY cosine_distance
+            LIMIT %(candidate_limit)s
+"""
+
+# First pass distance for each quantized index precision. Each expression must
+# match its index in db/migrations exactly for Postgres to use the index.
+# 384 is the embedding model's dimension count.
+FIRST_PASS_DISTANCES = {
+    "halfvec": "sp.selection_prompt_embedding::halfvec(384)"
+    + " <=> {query}::halfvec(384)",
+    "binary": "binary_quantize(sp.selection_prompt_embedding)::bit(384)"
+    + " <~> binary_quantize({query}::vector)",
+}
+
+# Aggregate over an operation's prompt distances for each aggregation mode
+DISTANCE_AGGREGATES = {"max": "min", "mean": "avg"}
+
+
+def build_search_sql(query: str, precision: str, aggregation: str) -> str:
+    """Per-operation search SQL for the query vector expression `query`, using
+    the `precision` ("full", "halfvec" or "binary") index for the candidate
+    scan"""
+    if precision == "full":
+        candidates = FULL_PRECISION_CANDIDATES_SQL
+    else:
+        candidates = RERANKED_CANDIDATES_SQL.replace(
+            "{first_pass_distance}", FIRST_PASS_DISTANCES[precision]
+        )
+    return PER_OPERATION_SEARCH_SQL.format(
+        aggregate=DISTANCE_AGGREGATES[aggregation],
+        candidates=candidates.format(query=query),
+    )
+
+
+def build_batch_search_sql(precision: str, aggregation: str) -> str:
+    """The same search for many query vectors, `%(embeddings)s`, in one round
+    trip: each query vector drives its own index scan through the LATERAL
+    join"""
+    return (
+        """
+SELECT q.query_index, r.*
+FROM unnest(%(embeddings)s::vector[]) WITH ORDINALITY AS q(embedding, query_index)
+CROSS JOIN LATERAL ("""
+        + build_search_sql("q.embedding", precision, aggregation)
+        + """) AS r
+ORDER BY q.query_index, r.cosine_distance
+"""
     )
 
-    cursor = conn.cursor()
-
-    cosine_simililarity_search_sql = (
-        "SELECT 1 - (selection_prompt_embedding <=> %s) AS cosine_similarity, "
-        + " o.openapi_operation_id, "
-        + "o.openapi_server_id, openapi_path_id, http_verb, selection_prompt, "
-        + "llm_content_gen_tool_call_spec "
-        + "FROM openapi_operation_selection_prompt sp "
-        + "INNER JOIN openapi_operation as o "
-        + "ON sp.openapi_operation_id = o.openapi_operation_id "
-        + "INNER JOIN openapi_server as s on s.openapi_server_id = o.openapi_server_id "
-        + "WHERE s.spec_id = %s "
-        + "ORDER BY 1 - (selection_prompt_embedding <=> %s) desc LIMIT 10;"
+
+COSINE_SIMILARITY_SEARCH_SQL = build_search_sql(
+    "%(embedding)s", EMBEDDING_INDEX_PRECISION, RUNTIME_SEARCH_AGGREGATION
+)
+BATCH_COSINE_SIMILARITY_SEARCH_SQL = build_batch_search_sql(
+    EMBEDDING_INDEX_PRECISION, RUNTIME_SEARCH_AGGREGATION
+)
+
+
+# pylint: disable-next=too-many-arguments, too-many-positional-arguments
+def simple_endpoint_search(
+    db_engine: DBEngine,
+    configuration_id: str,
+    sentence: str,
+    ef_search: int = HNSW_EF_SEARCH,
+    limit: int = 10,
+    candidates_per_result: int = RUNTIME_SEARCH_CANDIDATES_PER_RESULT,
+):
+    """Example of the similarity search. Returns the `limit` operations whose
+    selection prompts best match `sentence`, one result per operation.
+    Queries through a pooled connection from `db_engine`. `ef_search` trades
+    recall (higher) for latency (lower) in the HNSW index scan."""
+
+    logging.debug("simple_endpoint_search starting embedding for text")
+    # Unit-length vector, matching how selection prompts are embedded
+    sentence_embedding: ndarray = embed_query(sentence)
+    return _search_by_embedding(
+        db_engine,
+        configuration_id,
+        sentence_embedding,
+        ef_search,
+        limit,
+        candidates_per_result,
     )
-    input_vec_string = str(sentence_embedding.tolist()).replace(
-        "ARRAY", ""
-    )  # Update this.
-    cosine_simililarity_search_variables = (
-        input_vec_string,
+
+
+# pylint: disable-next=too-many-arguments, too-many-positional-arguments
+async def simple_endpoint_search_async(
+    db_engine: DBEngine,
+    configuration_id: str,
+    sentence: str,
+    ef_search: int = HNSW_EF_SEARCH,
+    limit: int = 10,
+    candidates_per_result: int = RUNTIME_SEARCH_CANDIDATES_PER_RESULT,
+):
+    """`simple_endpoint_search` for asyncio callers. The embedding joins the
+    shared micro-batch and the search runs on a worker thread, so the event
+    loop is never blocked."""
+    sentence_embedding = await embed_query_async(sentence)
+    return await asyncio.to_thread(
+        _search_by_embedding,
+        db_engine,
         configuration_id,
-        input_vec_string,
+        sentence_embedding,
+        ef_search,
+        limit,
+        candidates_per_result,
     )
 
-    cursor.execute(cosine_simililarity_search_sql, cosine_simililarity_search_variables)
-    results = cursor.fetchall()
-    conn.commit()
-    keyed_results = []
-    for row in results:
-        keyed_results.append(
+
+# pylint: disable-next=too-many-arguments, too-many-positional-arguments
+def _search_by_embedding(
+    db_engine: DBEngine,
+    configuration_id: str,
+    sentence_embedding: ndarray,
+    ef_search: int,
+    limit: int,
+    candidates_per_result: int,
+) -> list:
+    if RUNTIME_SEARCH_BACKEND == "memory":
+        index = spec_vector_indexes.get(db_engine, configuration_id)
+        rows = index.search(sentence_embedding, limit * candidates_per_result)
+        return [
+            _keyed_result(row)
+            for row in aggregate_by_operation(rows, limit, RUNTIME_SEARCH_AGGREGATION)
+        ]
+
+    with db_engine.connection() as conn:
+        set_index_search_options(conn, ef_search)
+        results = conn.exec_driver_sql(
+            COSINE_SIMILARITY_SEARCH_SQL,
             {
-                "cosine_similiarity": row[0],
-                "openapi_operation_id": row[1],
-                "openapi_server_id": row[2],
-                "openapi_path_id": row[3],
-                "http_verb": row[4],
-                "selection_prompt": row[5],
-                "llm_content_gen_tool_call_spec": row[6],
-            }
-        )
+                "embedding": sentence_embedding,
+                **search_params(configuration_id, limit, candidates_per_result),
+            },
+        ).fetchall()
+    return [_keyed_result(row) for row in results]
+
+
+# pylint: disable-next=too-many-arguments, too-many-positional-arguments
+def batch_endpoint_search(
+    db_engine: DBEngine,
+    configuration_id: str,
+    sentences: List[str],
+    ef_search: int = HNSW_EF_SEARCH,
+    limit: int = 10,
+    candidates_per_result: int = RUNTIME_SEARCH_CANDIDATES_PER_RESULT,
+) -> List[list]:
+    """`simple_endpoint_search` for many sentences at once: one embedding batch
+    and one SQL round trip. Returns one result list per sentence, in input
+    order."""
+
+    logging.debug("batch_endpoint_search embedding %d texts", len(sentences))
+    embeddings = embed_queries(sentences)
+
+    if RUNTIME_SEARCH_BACKEND == "memory":
+        index = spec_vector_indexes.get(db_engine, configuration_id)
+        return [
+            [
+                _keyed_result(row)
+                for row in aggregate_by_operation(
+                    rows, limit, RUNTIME_SEARCH_AGGREGATION
+                )
+            ]
+            for rows in index.search_many(
+                np.vstack(embeddings), limit * candidates_per_result
+            )
+        ]
+
+    with db_engine.connection() as conn:
+        set_index_search_options(conn, ef_search)
+        results = conn.exec_driver_sql(
+            BATCH_COSINE_SIMILARITY_SEARCH_SQL,
+            {
+                "embeddings": as_float32_rows(embeddings),
+                **search_params(configuration_id, limit, candidates_per_result),
+            },
+        ).fetchall()
+
+    keyed_results: List[list] = [[] for _ in sentences]
+    for row in results:
+        # WITH ORDINALITY counts from 1
+        keyed_results[row[0] - 1].append(_keyed_result(row[1:]))
     return keyed_results
+
+
+def search_params(
+    configuration_id: str, limit: int, candidates_per_result: int
+) -> dict:
+    """Query parameters shared by the search SQL, apart from the query vector"""
+    candidate_limit = limit * candidates_per_result
+    return {
+        "spec_id": configuration_id,
+        "candidate_limit": candidate_limit,
+        "first_pass_limit": candidate_limit * RUNTIME_SEARCH_RERANK_FACTOR,
+        "limit": limit,
+    }
+
+
+def set_index_search_options(conn: Connection, ef_search: int):
+    """Apply the HNSW search settings for the rest of `conn`'s transaction.
+    set_config(..., true) scopes the settings to the transaction, so they do
+    not leak to the next user of the pooled connection."""
+    conn.exec_driver_sql(
+        "SELECT set_config('hnsw.ef_search', %(ef_search)s, true)",
+        {"ef_search": str(ef_search)},
+    )
+    if HNSW_ITERATIVE_SCAN != "off":
+        conn.exec_driver_sql(
+            "SELECT set_config('hnsw.iterative_scan', %(mode)s, true)",
+            {"mode": HNSW_ITERATIVE_SCAN},
+        )
+
+
+def _keyed_result(row) -> dict:
+    return {
+        "cosine_similiarity": 1 - row[0],
+        "openapi_operation_id": row[1],
+        "openapi_server_id": row[2],
+        "openapi_path_id": row[3],
+        "http_verb": row[4],
+        "selection_prompt": row[5],
+        "llm_content_gen_tool_call_spec": row[6],
+    }
@@ -0,0 +1,262 @@
+"""In-memory nearest neighbour search over one spec's selection prompt
+embeddings. A typical spec has a few thousand 384-dim prompts, so a matrix
+product answers top-k faster than a round trip to Postgres.
+
+Indexes are loaded lazily per spec, kept in a memory-bounded LRU, and
+reloaded when the config algorithm bumps `openapi_spec.embeddings_updated_at`."""
+
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List
+
+import numpy as np
+from numpy import ndarray
+from sqlalchemy import Connection
+
+from common.app_config import (
+    RUNTIME_VECTOR_INDEX_MAX_BYTES,
+    RUNTIME_VECTOR_INDEX_REVALIDATE_SECONDS,
+)
+from common.database_engine import DBEngine
+
+SPEC_VERSION_SQL = """
+SELECT embeddings_updated_at FROM openapi_spec WHERE openapi_spec_id = %(spec_id)s
+"""
+
+SPEC_PROMPTS_SQL = """
+SELECT sp.selection_prompt_embedding, sp.openapi_operation_id, sp.selection_prompt
+FROM openapi_operation_selection_prompt sp
+INNER JOIN openapi_operation AS o
+    ON sp.openapi_operation_id = o.openapi_operation_id
+INNER JOIN openapi_server AS s ON s.openapi_server_id = o.openapi_server_id
+WHERE s.spec_id = %(spec_id)s AND sp.selection_prompt_embedding IS NOT NULL
+"""
+
+SPEC_OPERATIONS_SQL = """
+SELECT o.openapi_operation_id, o.openapi_server_id, o.openapi_path_id,
+    o.http_verb, o.llm_content_gen_tool_call_spec
+FROM openapi_operation AS o
+INNER JOIN openapi_server AS s ON s.openapi_server_id = o.openapi_server_id
+WHERE s.spec_id = %(spec_id)s
+"""
+
+
+def parse_vector(value) -> ndarray:
+    """A vector column value as a float32 array. Connections with the vector
+    codec already return arrays; pgvector's text form, `[1,2,3]`, is parsed."""
+    if isinstance(value, str):
+        return np.array(value[1:-1].split(","), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+class SpecVectorIndex:
+    """All of one spec's selection prompt embeddings as a contiguous,
+    row-normalized float32 matrix, with the prompt and operation metadata needed
+    to build search results."""
+
+    # pylint: disable-next=too-many-arguments, too-many-positional-arguments
+    def __init__(
+        self,
+        matrix: ndarray,
+        operation_ids: List,
+        selection_prompts: List[str],
+        operations: dict,
+        version=None,
+    ):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+        self.operation_ids = operation_ids
+        self.selection_prompts = selection_prompts
+        self.operations = operations
+        """openapi_operation_id -> (server id, path id, http verb, tool call spec)"""
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.nbytes = (
+            self.matrix.nbytes
+            + sum(sys.getsizeof(p) for p in selection_prompts)
+            + sys.getsizeof(operation_ids)
+            + 1024 * len(operations)  # tool call specs, roughly
+        )
+        """Approximate memory held by this index"""
+
+    def search(self, query: ndarray, limit: int) -> list:
+        """Top-`limit` prompts by cosine similarity to the unit-length `query`,
+        best first, as `(cosine_distance, operation id, server id, path id,
+        http verb, selection prompt, tool call spec)` rows"""
+        return self.search_many(query.reshape(1, -1), limit)[0]
+
+    def search_many(self, queries: ndarray, limit: int) -> List[list]:
+        """`search()` for each row of `queries`, with one matrix product"""
+        if len(self.operation_ids) == 0:
+            return [[] for _ in queries]
+        scores = queries.astype(np.float32, copy=False) @ self.matrix.T
+        k = min(limit, scores.shape[1])
+        results = []
+        for query_scores in scores:
+            top = np.argpartition(-query_scores, k - 1)[:k]
+            top = top[np.argsort(-query_scores[top])]
+            results.append([self._result_row(i, query_scores[i]) for i in top])
+        return results
+
+    def _result_row(self, i: int, score: float) -> tuple:
+        op_id = self.operation_ids[i]
+        server_id, path_id, http_verb, tool_call_spec = self.operations[op_id]
+        return (
+            1 - float(score),
+            op_id,
+            server_id,
+            path_id,
+            http_verb,
+            self.selection_prompts[i],
+            tool_call_spec,
+        )
+
+
+def aggregate_by_operation(rows: list, limit: int, aggregation: str = "max") -> list:
+    """Collapse prompt-level search rows, as returned by `search()`, to one row
+    per operation. The distance is the best prompt's ("max" similarity) or the
+    mean over the operation's rows ("mean"); the selection prompt is always the
+    best matching one. Returns the `limit` closest operations."""
+    best_rows: dict = {}
+    distances: dict = {}
+    for row in rows:
+        op_id = row[1]
+        distances.setdefault(op_id, []).append(row[0])
+        if op_id not in best_rows or row[0] < best_rows[op_id][0]:
+            best_rows[op_id] = row
+    aggregated = []
+    for op_id, row in best_rows.items():
+        if aggregation == "mean":
+            row = (sum(distances[op_id]) / len(distances[op_id]),) + row[1:]
+        aggregated.append(row)
+    aggregated.sort(key=lambda row: row[0])
+    return aggregated[:limit]
+
+
+def load_spec_vector_index(conn: Connection, spec_id: str) -> SpecVectorIndex:
+    """Read one spec's embeddings and operation metadata from the DB"""
+    params = {"spec_id": spec_id}
+    version = conn.exec_driver_sql(SPEC_VERSION_SQL, params).scalar()
+    prompt_rows = conn.exec_driver_sql(SPEC_PROMPTS_SQL, params).fetchall()
+    operation_rows = conn.exec_driver_sql(SPEC_OPERATIONS_SQL, params).fetchall()
+
+    matrix = np.empty((len(prompt_rows), 0), dtype=np.float32)
+    if prompt_rows:
+        matrix = np.vstack([parse_vector(row[0]) for row in prompt_rows])
+    return SpecVectorIndex(
+        matrix=matrix,
+        operation_ids=[row[1] for row in prompt_rows],
+        selection_prompts=[row[2] for row in prompt_rows],
+        operations={row[0]: tuple(row[1:]) for row in operation_rows},
+        version=version,
+    )
+
+
+# pylint: disable-next=too-many-instance-attributes
+class SpecVectorIndexCache:
+    """Per-spec indexes in an LRU bounded by total bytes. Each index checks
+    the spec's embeddings version at most once per `revalidate_seconds`, and
+    is reloaded if the spec was re-configured since it was loaded."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        revalidate_seconds: float,
+        loader: Callable[[Connection, str], SpecVectorIndex] = load_spec_vector_index,
+    ):
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self._loader = loader
+        self._indexes: OrderedDict[str, SpecVectorIndex] = OrderedDict()
+        self._lock = threading.Lock()
+        # One load at a time per spec; other specs can load concurrently.
+        # A spec's lock is dropped with its index, so that the specs ever
+        # searched do not each keep one.
+        self._load_locks: dict[str, threading.Lock] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, db_engine: DBEngine, spec_id: str) -> SpecVectorIndex:
+        """The current index for `spec_id`, loading it if needed"""
+        with self._lock:
+            index = self._indexes.get(spec_id)
+            if index is not None:
+                self._indexes.move_to_end(spec_id)
+            load_lock = self._load_locks.setdefault(spec_id, threading.Lock())
+
+        if index is not None and not self._due_for_check(index):
+            return index
+
+        with load_lock:
+            # Another thread may have (re)loaded the index while we waited
+            with self._lock:
+                current = self._indexes.get(spec_id)
+            if current is not index and current is not None:
+                return current
+            with db_engine.connection() as conn:
+                if index is not None:
+                    version = conn.exec_driver_sql(
+                        SPEC_VERSION_SQL, {"spec_id": spec_id}
+                    ).scalar()
+                    if version == index.version:
+                        index.checked_at = time.monotonic()
+                        return index
+                logging.info("Loading in-memory vector index for spec %s", spec_id)
+                index = self._loader(conn, spec_id)
+            self._store(spec_id, index, loaded=True)
+        return index
+
+    def put(self, spec_id: str, index: SpecVectorIndex):
+        """Add an already built index"""
+        self._store(spec_id, index)
+
+    def invalidate(self, spec_id: str):
+        """Drop the index for `spec_id` so the next search reloads it"""
+        with self._lock:
+            self._indexes.pop(spec_id, None)
+            self._drop_load_lock(spec_id)
+
+    def stats(self) -> dict:
+        """Size and load/eviction counters"""
+        with self._lock:
+            return {
+                "specs": len(self._indexes),
+                "bytes": sum(i.nbytes for i in self._indexes.values()),
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    def _due_for_check(self, index: SpecVectorIndex) -> bool:
+        return time.monotonic() - index.checked_at >= self.revalidate_seconds
+
+    def _store(self, spec_id: str, index: SpecVectorIndex, loaded: bool = False):
+        with self._lock:
+            if loaded:
+                self.loads += 1
+            self._indexes[spec_id] = index
+            self._indexes.move_to_end(spec_id)
+            total = sum(i.nbytes for i in self._indexes.values())
+            # Always keep the index just stored, even if it alone is over budget
+            while total > self.max_bytes and len(self._indexes) > 1:
+                evicted_id, evicted = self._indexes.popitem(last=False)
+                self._drop_load_lock(evicted_id)
+                total -= evicted.nbytes
+                self.evictions += 1
+
+    def _drop_load_lock(self, spec_id: str):
+        # Called with self._lock held. A lock held by a load in progress is
+        # kept; at worst, a thread that fetched a dropped lock but has not
+        # acquired it yet loads the spec alongside another one.
+        load_lock = self._load_locks.get(spec_id)
+        if load_lock is not None and not load_lock.locked():
+            del self._load_locks[spec_id]
+
+
+spec_vector_indexes = SpecVectorIndexCache(
+    RUNTIME_VECTOR_INDEX_MAX_BYTES, RUNTIME_VECTOR_INDEX_REVALIDATE_SECONDS
+)
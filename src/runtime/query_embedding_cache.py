@@ -0,0 +1,169 @@
+"""In-process cache of query text embeddings for the runtime search. Users
+send the same phrasings over and over, so repeats skip model inference."""
+
+import asyncio
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, List
+
+import numpy as np
+from numpy import ndarray
+
+from common.app_config import (
+    EMBEDDING_MODEL_NAME,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+)
+from common.embedding_model import embed_texts
+
+from .embedding_batcher import query_embedding_batcher
+
+
+def normalize_query_text(text: str) -> str:
+    """Cache key form of a query: NFC-normalized, with runs of whitespace
+    collapsed and the ends stripped. The tokenizer splits on whitespace, so
+    neither changes the embedding. Case is kept, since whether it matters
+    depends on the model."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+# pylint: disable-next=too-many-instance-attributes
+class QueryEmbeddingCache:
+    """Size-bounded LRU cache with a per-entry time to live, keyed by model
+    name and normalized text. Safe to share between request threads.
+
+    Cached arrays are marked read-only since every caller shares them."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, str], tuple[float, ndarray]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, model_name: str, text: str) -> ndarray | None:
+        """The cached embedding, or None on a miss or expired entry"""
+        key = (model_name, normalize_query_text(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, embedding = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, model_name: str, text: str, embedding: ndarray):
+        """Cache an embedding, evicting the least recently used entries when
+        the cache is full"""
+        if self.max_entries <= 0:
+            return
+        embedding.setflags(write=False)
+        key = (model_name, normalize_query_text(text))
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL_SECONDS
+)
+
+
+def embed_query(text: str, model_name: str = EMBEDDING_MODEL_NAME) -> ndarray:
+    """Unit-length embedding of one runtime query, served from the cache
+    when possible. Misses are micro-batched with concurrent queries."""
+    embedding = query_embedding_cache.get(model_name, text)
+    if embedding is None:
+        if model_name == query_embedding_batcher.model_name:
+            embedding = query_embedding_batcher.embed(text)
+        else:
+            embedding = embed_texts([text], model_name, normalize_embeddings=True)[0]
+        query_embedding_cache.put(model_name, text, embedding)
+    return embedding
+
+
+async def embed_query_async(
+    text: str, model_name: str = EMBEDDING_MODEL_NAME
+) -> ndarray:
+    """`embed_query()` for asyncio callers: waits for the micro-batch
+    without blocking the event loop"""
+    embedding = query_embedding_cache.get(model_name, text)
+    if embedding is None:
+        if model_name == query_embedding_batcher.model_name:
+            embedding = await query_embedding_batcher.embed_async(text)
+        else:
+            embedding = await asyncio.to_thread(
+                embed_texts, [text], model_name, normalize_embeddings=True
+            )
+            embedding = embedding[0]
+        query_embedding_cache.put(model_name, text, embedding)
+    return embedding
+
+
+def embed_queries(
+    texts: List[str], model_name: str = EMBEDDING_MODEL_NAME
+) -> List[ndarray]:
+    """Unit-length embeddings of many runtime queries, in input order. Cache
+    misses are embedded together in one batch, once per distinct text."""
+    embeddings: List[ndarray | None] = [
+        query_embedding_cache.get(model_name, text) for text in texts
+    ]
+    # Distinct missing texts, keyed by cache key so near-duplicates embed once
+    missing: dict[str, str] = {}
+    for text, embedding in zip(texts, embeddings):
+        if embedding is None:
+            missing.setdefault(normalize_query_text(text), text)
+    if missing:
+        new_embeddings = embed_texts(
+            list(missing.values()), model_name, normalize_embeddings=True
+        )
+        by_key = dict(zip(missing.keys(), np.asarray(new_embeddings)))
+        for key, text in missing.items():
+            query_embedding_cache.put(model_name, text, by_key[key])
+        embeddings = [
+            by_key[normalize_query_text(text)] if embedding is None else embedding
+            for text, embedding in zip(texts, embeddings)
+        ]
+    return embeddings  # type: ignore[return-value]
@@ -11,6 +11,7 @@ from hamcrest import assert_that, contains_string, equal_to
 
 # pylint: disable-next=import-error
 from app.api import create_blueprint  # type: ignore
+from app.api.bp_api import ef_search_from_request_body  # type: ignore
 
 API_KEY = "TEST_API_KEY"
 
@@ -66,3 +67,31 @@ def test_not_found(client):
     """Test a route not found"""
     response = client.get("/walruses")
     assert_that(response.content_type, equal_to("application/json"))
+
+
+def test_endpoint_selection_rejects_bad_ef_search(client):
+    """ef_search outside the allowed range is a client error"""
+    response = client.post(
+        "/openapi/ca754e5d-4f5d-47b6-a06e-e786b8e45b55/show-endpoint-selections-for-input/",
+        headers={"Authorization": API_KEY},
+        json={"text": "create a new pet", "ef_search": 0},
+    )
+    assert_that(response.status_code, equal_to(400))
+    assert_that(str(response.data), contains_string("ef_search"))
+
+
+def test_ef_search_rejects_booleans():
+    """JSON true is not an ef_search of 1"""
+    assert_that(ef_search_from_request_body({"ef_search": True}), equal_to(None))
+    assert_that(ef_search_from_request_body({"ef_search": 1}), equal_to(1))
+
+
+def test_batch_endpoint_selection_requires_text_list(client):
+    """The batch route rejects a body without a list of texts"""
+    response = client.post(
+        "/openapi/ca754e5d-4f5d-47b6-a06e-e786b8e45b55/show-endpoint-selections-for-inputs/",
+        headers={"Authorization": API_KEY},
+        json={"texts": "create a new pet"},
+    )
+    assert_that(response.status_code, equal_to(400))
+    assert_that(str(response.data), contains_string("texts"))
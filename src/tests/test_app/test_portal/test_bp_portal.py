@@ -2,14 +2,25 @@
 Fixture code adapted from the following source:
 https://flask.palletsprojects.com/en/stable/testing/"""
 
+import io
+import uuid
+
 import pytest
 from flask import Flask
 
 # pylint: disable=redefined-outer-name
-from hamcrest import assert_that, contains_string, equal_to
+from hamcrest import assert_that, contains_string, equal_to, has_length
+from sqlalchemy import delete, select, text
+from sqlalchemy.exc import OperationalError
+
+# pylint: disable-next=import-error
+from app import create_app  # type: ignore
 
 # pylint: disable-next=import-error
-from app.portal import create_blueprint  # type: ignore
+from app.portal import bp_portal, create_blueprint  # type: ignore
+from common.models import Account, ConfigurationJob, CuecodeConfig, OpenAPISpec
+from common.models.base import db
+from common.models.configuration_job import JOB_STATUS_FAILED, JOB_STATUS_MAPPING
 
 
 @pytest.fixture()
@@ -52,3 +63,153 @@ def test_upload_spec(client):
     response = client.get("/upload-spec")
     assert_that(response.status_code, equal_to(200))
     assert_that(str(response.data), contains_string(("<html")))
+
+
+@pytest.fixture()
+def db_app():
+    """The whole application, with the migrated database CI provides"""
+    flask_app = create_app()
+    flask_app.config.update(
+        {"TESTING": True, "SECRET_KEY": "neededForTheForms", "WTF_CSRF_ENABLED": False}
+    )
+    with flask_app.app_context():
+        try:
+            db.session.execute(text("SELECT 1"))
+        except OperationalError:
+            pytest.skip("No database to test against")
+    yield flask_app
+
+
+@pytest.fixture()
+def spec_id(db_app):
+    """A spec whose config belongs to owner@example.com, and a second account,
+    other@example.com. Both are deleted after the test."""
+    owner = Account(cuecode_account_id=uuid.uuid4(), email="owner@example.com")
+    other = Account(cuecode_account_id=uuid.uuid4(), email="other@example.com")
+    config = CuecodeConfig(
+        cuecode_config_id=uuid.uuid4(),
+        belongs_to_cuecode_account_id=owner.cuecode_account_id,
+    )
+    spec = OpenAPISpec(
+        openapi_spec_id=uuid.uuid4(),
+        cuecode_config_id=config.cuecode_config_id,
+        spec_text="{}",
+    )
+    with db_app.app_context():
+        db.session.add_all([owner, other])
+        db.session.flush()
+        db.session.add(config)
+        db.session.flush()
+        db.session.add(spec)
+        db.session.commit()
+        ids = (
+            spec.openapi_spec_id,
+            config.cuecode_config_id,
+            [owner.cuecode_account_id, other.cuecode_account_id],
+        )
+
+    yield ids[0]
+
+    with db_app.app_context():
+        # The spec's jobs are deleted with it
+        db.session.execute(
+            delete(OpenAPISpec).where(OpenAPISpec.openapi_spec_id == ids[0])
+        )
+        db.session.execute(
+            delete(CuecodeConfig).where(CuecodeConfig.cuecode_config_id == ids[1])
+        )
+        db.session.execute(
+            delete(Account).where(Account.cuecode_account_id.in_(ids[2]))
+        )
+        db.session.commit()
+
+
+@pytest.fixture()
+def sent(monkeypatch):
+    """Spec ids the portal queued for the config algorithm"""
+    messages = []
+    monkeypatch.setattr(
+        bp_portal.actor_config_algo_openapi_spec, "send", messages.append
+    )
+    return messages
+
+
+def log_in(test_client, email: str):
+    """Log the client in as `email`"""
+    with test_client.session_transaction() as flask_session:
+        flask_session["logged_in"] = True
+        flask_session["username"] = email
+
+
+def post_spec(test_client, spec_id):
+    """Upload new spec text for `spec_id`"""
+    return test_client.post(
+        f"/portal/update-spec/{spec_id}",
+        data={"spec_file": (io.BytesIO(b'{"openapi": "3.1.0"}'), "spec.json")},
+        content_type="multipart/form-data",
+    )
+
+
+def add_job(db_app, spec_id, status: str):
+    """Give the spec a configuration job with `status`"""
+    with db_app.app_context():
+        db.session.add(ConfigurationJob(openapi_spec_id=spec_id, status=status))
+        db.session.commit()
+
+
+def spec_jobs(db_app, spec_id) -> list:
+    """The statuses of the spec's configuration jobs, and its text"""
+    with db_app.app_context():
+        statuses = db.session.scalars(
+            select(ConfigurationJob.status).where(
+                ConfigurationJob.openapi_spec_id == spec_id
+            )
+        ).all()
+        return sorted(statuses), db.session.get(OpenAPISpec, spec_id).spec_text
+
+
+def test_update_spec_requires_login(client):
+    """Logged out users are sent to the login page"""
+    response = client.get(f"/update-spec/{uuid.uuid4()}")
+    assert_that(response.status_code, equal_to(302))
+    assert_that(response.location, contains_string("/login"))
+
+
+def test_update_spec_of_another_account_is_not_found(db_app, spec_id, sent):
+    """Specs of other accounts' configs cannot be seen or updated"""
+    test_client = db_app.test_client()
+    log_in(test_client, "other@example.com")
+    assert_that(
+        test_client.get(f"/portal/update-spec/{spec_id}").status_code, equal_to(404)
+    )
+    assert_that(post_spec(test_client, spec_id).status_code, equal_to(404))
+    assert_that(sent, has_length(0))
+    assert_that(spec_jobs(db_app, spec_id), equal_to(([], "{}")))
+
+
+def test_update_spec_while_configuring_is_refused(db_app, spec_id, sent):
+    """A spec is not updated while its configuration job is running"""
+    add_job(db_app, spec_id, JOB_STATUS_MAPPING)
+    test_client = db_app.test_client()
+    log_in(test_client, "owner@example.com")
+
+    assert_that(post_spec(test_client, spec_id).status_code, equal_to(302))
+    assert_that(sent, has_length(0))
+    assert_that(spec_jobs(db_app, spec_id), equal_to(([JOB_STATUS_MAPPING], "{}")))
+
+
+def test_update_spec_creates_the_job_before_queueing(db_app, spec_id, sent):
+    """Updating a spec whose last job failed saves the text and creates the
+    job the config algorithm picks up, then queues the spec"""
+    add_job(db_app, spec_id, JOB_STATUS_FAILED)
+    test_client = db_app.test_client()
+    log_in(test_client, "owner@example.com")
+
+    assert_that(post_spec(test_client, spec_id).status_code, equal_to(302))
+    assert_that(sent, equal_to([str(spec_id)]))
+    assert_that(
+        spec_jobs(db_app, spec_id),
+        equal_to(
+            (sorted([JOB_STATUS_FAILED, JOB_STATUS_MAPPING]), '{"openapi": "3.1.0"}')
+        ),
+    )
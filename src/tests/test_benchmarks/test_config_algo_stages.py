@@ -0,0 +1,66 @@
+"""Unit tests for the config algorithm stage benchmark"""
+
+import numpy as np
+import pytest
+from hamcrest import assert_that, contains_string, equal_to, has_entries, has_length
+
+from benchmarks.config_algo_stages import (
+    DEFAULT_SPECS,
+    STAGES,
+    benchmark_spec,
+    compare_results,
+    stub_embed_texts,
+)
+
+
+def test_stages_run_on_pet_store_without_database():
+    """Every stage but persist is measured with the stub embedding backend"""
+    pytest.importorskip("en_core_web_sm")
+    result = benchmark_spec(DEFAULT_SPECS[0].read_text(), "stub", 1, warmup=0)
+
+    assert_that(list(result["stages"]), equal_to(STAGES[:-1]))
+    assert_that(
+        result["counts"],
+        has_entries(validation_errors=0, paths=13, operations=11),
+    )
+    for metrics in result["stages"].values():
+        assert_that(
+            sorted(metrics),
+            equal_to(["cpu_s", "gc_objects", "rss_bytes", "wall_s"]),
+        )
+
+
+def test_stub_embeddings_are_deterministic_unit_vectors():
+    """The stub backend gives each text the same unit vector every time"""
+    embeddings = stub_embed_texts(["Add a pet.", "Delete a pet.", "Add a pet."])
+    assert_that(embeddings.shape, equal_to((3, 384)))
+    assert_that(
+        bool(np.allclose(np.linalg.norm(embeddings, axis=1), 1, atol=1e-6)),
+        equal_to(True),
+    )
+    assert_that(bool(np.array_equal(embeddings[0], embeddings[2])), equal_to(True))
+
+
+def test_compare_flags_regressions_beyond_threshold_and_floor():
+    """Only increases beyond both the threshold and the metric's floor count"""
+
+    def results(wall_s, cpu_s, gc_objects):
+        stage = {
+            "wall_s": wall_s,
+            "cpu_s": cpu_s,
+            "rss_bytes": 2**20,
+            "gc_objects": gc_objects,
+        }
+        return {"specs": {"spec.json": {"stages": {"map": stage}}}}
+
+    baseline = results(1.0, 0.001, 100_000)
+    regressions = compare_results(baseline, results(1.5, 0.004, 110_000), 0.2)
+    assert_that(regressions, has_length(1))
+    assert_that(regressions[0], contains_string("spec.json map wall_s"))
+    assert_that(
+        compare_results(baseline, results(1.1, 0.001, 100_000), 0.2), has_length(0)
+    )
+    assert_that(
+        compare_results(baseline, results(1.0, 0.01, 100_000), 0.2, 0.1),
+        has_length(0),
+    )
@@ -0,0 +1,22 @@
+"""Unit tests for the OpenAPI model parse benchmark"""
+
+from hamcrest import assert_that, equal_to, greater_than
+
+from benchmarks.openapi_model_parse import (
+    DEFAULT_SPEC,
+    benchmark_mode,
+    load_resolved_spec,
+)
+
+
+def test_mutations_only_model_builds_nextcloud():
+    """The Nextcloud spec's GET and POST responses have invalid schemas, which
+    only the full model reads"""
+    data = load_resolved_spec(DEFAULT_SPEC.read_text(encoding="utf-8"))
+    assert_that(data["servers"], equal_to([{"url": "/"}]))
+
+    full = benchmark_mode(data, False, 1)
+    mutations_only = benchmark_mode(data, True, 1)
+    assert_that(full["errors"], greater_than(0))
+    assert_that(mutations_only["errors"], equal_to(0))
+    assert_that(mutations_only["retained_bytes"], greater_than(0))
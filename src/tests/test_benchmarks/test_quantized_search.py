@@ -0,0 +1,19 @@
+"""Unit tests for the quantized search benchmark's statistics"""
+
+from hamcrest import assert_that, equal_to
+
+from benchmarks.quantized_search import percentile, recall_at_k
+
+
+def test_recall_at_k():
+    """Recall counts exact results found, in any order"""
+    assert_that(recall_at_k(["b", "a", "x"], ["a", "b", "c", "d"]), equal_to(0.5))
+    assert_that(recall_at_k([], []), equal_to(1.0))
+
+
+def test_percentile():
+    """Nearest-rank percentiles"""
+    values = [float(v) for v in range(1, 101)]
+    assert_that(percentile(values, 50), equal_to(50.0))
+    assert_that(percentile(values, 95), equal_to(95.0))
+    assert_that(percentile([3.0], 95), equal_to(3.0))
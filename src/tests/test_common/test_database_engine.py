@@ -0,0 +1,33 @@
+"""Unit tests for the pooled DBEngine"""
+
+from hamcrest import assert_that, equal_to, has_entries
+
+from common.app_config import (
+    DB_MAX_OVERFLOW_WEB,
+    DB_MAX_OVERFLOW_WORKER,
+    DB_POOL_SIZE_WEB,
+    DB_POOL_SIZE_WORKER,
+)
+from common.database_engine import DBEngine
+
+
+def test_pool_sized_per_process_type():
+    """Web and worker engines get the pool sizes configured for them"""
+    web = DBEngine(process_type="web")
+    worker = DBEngine(process_type="worker")
+    assert_that(
+        web.pool_stats()["capacity"], equal_to(DB_POOL_SIZE_WEB + DB_MAX_OVERFLOW_WEB)
+    )
+    assert_that(
+        worker.pool_stats()["capacity"],
+        equal_to(DB_POOL_SIZE_WORKER + DB_MAX_OVERFLOW_WORKER),
+    )
+
+
+def test_pool_stats_before_any_connection():
+    """Creating an engine does not open connections"""
+    engine = DBEngine(process_type="web")
+    assert_that(
+        engine.pool_stats(),
+        has_entries({"checked_out": 0, "peak_checked_out": 0, "checkout_timeouts": 0}),
+    )
@@ -1,23 +1,59 @@
 """Test the validation function for OpenAPI specs"""
 
+import json
 import os
 
+from hamcrest import assert_that, calling, equal_to, has_item, raises
+
 from common.models.openapi_spec import OpenAPISpec
-from configuration.openapi_schema_validate import validate_openapi_spec
+from configuration.openapi_schema_validate import (
+    OpenAPISpecValidationError,
+    validate_openapi_spec,
+)
 
 
-def test_valid_spec_does_not_throw_pet_store():
-    """Tests if a valid OpenAPI spec will throw an error."""
-    spec_text = ""
+def read_pet_store() -> str:
+    """The pet store spec text"""
     with open(
         os.path.join("src", "tests", "fixtures", "openapi", "pet-store.json"),
         "r",
         encoding="utf-8",
     ) as f:
-        spec_text = f.read()
+        return f.read()
+
+
+def test_valid_spec_does_not_throw_pet_store():
+    """Tests if a valid OpenAPI spec will throw an error."""
+    spec_text = read_pet_store()
 
     spec: OpenAPISpec = OpenAPISpec(spec_text=spec_text)  # type: ignore
-    validate_openapi_spec(spec, "./tmp")
+    document = validate_openapi_spec(spec)
+    assert_that(document, equal_to(json.loads(spec_text)))
+
+
+def test_invalid_spec_reports_every_error():
+    """All problems are reported, each with its location in the spec"""
+    document = json.loads(read_pet_store())
+    del document["info"]["title"]
+    document["paths"]["/pet"]["put"]["operationId"] = "addPet"
+    spec: OpenAPISpec = OpenAPISpec(spec_text=json.dumps(document))  # type: ignore
+
+    try:
+        validate_openapi_spec(spec)
+    except OpenAPISpecValidationError as e:
+        assert_that(e.errors, has_item("/info: 'title' is a required property"))
+        assert_that(len(e.errors), equal_to(2))
+    else:
+        raise AssertionError("the invalid spec was accepted")
+
+
+def test_unparsable_spec_reports_location():
+    """JSON syntax errors are reported as validation errors"""
+    spec: OpenAPISpec = OpenAPISpec(spec_text='{"openapi": }')  # type: ignore
+    assert_that(
+        calling(validate_openapi_spec).with_args(spec),
+        raises(OpenAPISpecValidationError, "line 1, column 13"),
+    )
 
 
 # TODO: Commented out because the Nextcloud spec fails validation. Seeking insight pylint: disable=fixme
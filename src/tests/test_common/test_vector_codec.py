@@ -0,0 +1,41 @@
+"""Unit tests for the NumPy <-> pgvector codec"""
+
+import numpy as np
+from hamcrest import assert_that, calling, equal_to, has_length, raises
+from pgvector import Vector
+from sqlalchemy import event
+
+from common.database_engine import DBEngine
+from common.vector_codec import _on_connect, as_float32_rows, register_vector_codec
+
+
+def test_db_engine_registers_codec_once():
+    """DBEngine connections get the codec, and registering again is a no-op"""
+    engine = DBEngine()
+    register_vector_codec(engine.engine)
+    assert_that(event.contains(engine.engine, "connect", _on_connect), equal_to(True))
+
+
+def test_as_float32_rows():
+    """A batch of embeddings becomes float32 rows without copying float32 input"""
+    batch = np.arange(6, dtype=np.float32).reshape(2, 3)
+    rows = as_float32_rows(batch)
+    assert_that(rows, has_length(2))
+    assert_that(rows[1].dtype, equal_to(np.float32))
+    assert_that(np.shares_memory(rows[0], batch), equal_to(True))
+    assert_that(
+        as_float32_rows([np.ones(3), np.zeros(3)])[0].dtype, equal_to(np.float32)
+    )
+
+
+def test_as_float32_rows_rejects_single_vector():
+    """One vector is not a batch"""
+    assert_that(calling(as_float32_rows).with_args(np.ones(3)), raises(ValueError))
+
+
+def test_vector_wire_form_is_exact():
+    """The codec's wire form of a float32 vector parses back bit for bit"""
+    embedding = np.random.default_rng(0).standard_normal(384).astype(np.float32)
+    # pylint: disable-next=protected-access
+    decoded = Vector._from_db(Vector._to_db(embedding))
+    assert_that(np.array_equal(decoded, embedding), equal_to(True))
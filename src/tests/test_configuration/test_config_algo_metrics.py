@@ -0,0 +1,50 @@
+"""Unit tests for the config algorithm's Prometheus metrics"""
+
+import pytest
+from hamcrest import assert_that, equal_to, greater_than
+
+from configuration.config_algo_metrics import config_algo_metrics, timed_stage
+
+
+def stage_count(stage: str) -> float:
+    """Number of recorded durations of `stage`"""
+    return (
+        config_algo_metrics().registry.get_sample_value(
+            "cuecode_config_stage_duration_seconds_count", {"stage": stage}
+        )
+        or 0.0
+    )
+
+
+def test_metrics_are_created_once():
+    """Every caller shares the process' metrics"""
+    assert_that(config_algo_metrics() is config_algo_metrics(), equal_to(True))
+
+
+def test_timed_stage_records_failed_stages():
+    """A stage that raises still records how long it took"""
+    before = stage_count("test_failed")
+    with pytest.raises(ValueError):
+        with timed_stage("test_failed"):
+            raise ValueError("stuck")
+    assert_that(stage_count("test_failed"), equal_to(before + 1))
+    assert_that(
+        config_algo_metrics().registry.get_sample_value(
+            "cuecode_config_stage_duration_seconds_sum", {"stage": "test_failed"}
+        ),
+        greater_than(0),
+    )
+
+
+def test_jobs_in_progress_tracks_running_jobs():
+    """The gauge counts jobs while they run"""
+    metrics = config_algo_metrics()
+    with metrics.jobs_in_progress.track_inprogress():
+        assert_that(
+            metrics.registry.get_sample_value("cuecode_config_jobs_in_progress"),
+            equal_to(1.0),
+        )
+    assert_that(
+        metrics.registry.get_sample_value("cuecode_config_jobs_in_progress"),
+        equal_to(0.0),
+    )
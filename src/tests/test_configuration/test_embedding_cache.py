@@ -0,0 +1,117 @@
+"""Unit tests for the config algorithm's embedding cache"""
+
+import numpy as np
+from hamcrest import assert_that, contains_inanyorder, equal_to, has_length, is_not
+
+from configuration import embedding_cache
+from configuration.embedding_cache import embed_texts_cached, embedding_cache_key
+
+MODEL = "model-a"
+
+
+class FakeModel:  # pylint: disable=too-few-public-methods
+    """Embeds text as [len(text), 1] and records each batch it was given"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts, _model_name, normalize_embeddings=False):
+        self.batches.append(list(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+class FakeCache:
+    """Stands in for the cache table: serves lookups from `entries`, keyed by
+    model name and content hash, and records what was inserted"""
+
+    def __init__(self, monkeypatch):
+        self.entries = {}
+        self.inserted = []
+        monkeypatch.setattr(embedding_cache, "lookup_cached_embeddings", self.lookup)
+        monkeypatch.setattr(embedding_cache, "insert_cached_embeddings", self.insert)
+
+    def lookup(self, _session, model_name, keys):
+        """The cached embeddings among `keys`"""
+        return {
+            key: self.entries[(model_name, key)]
+            for key in keys
+            if (model_name, key) in self.entries
+        }
+
+    def insert(self, _session, model_name, embeddings):
+        """Record the inserted rows"""
+        self.inserted.extend((key, model_name) for key in embeddings)
+
+    def cached(self, text):
+        """Cache the embedding of `text` as [-1, -1]"""
+        self.entries[(MODEL, embedding_cache_key(MODEL, text))] = np.array(
+            [-1.0, -1.0], dtype=np.float32
+        )
+
+
+def test_key_is_deterministic_sha256():
+    """The same model and text always hash to the same 32-byte key"""
+    key = embedding_cache_key("model-a", "List all pets")
+    assert_that(key, has_length(32))
+    assert_that(embedding_cache_key("model-a", "List all pets"), equal_to(key))
+
+
+def test_key_depends_on_model_and_text():
+    """Changing the model or the text changes the key"""
+    key = embedding_cache_key("model-a", "List all pets")
+    assert_that(embedding_cache_key("model-b", "List all pets"), is_not(key))
+    assert_that(embedding_cache_key("model-a", "List all pets."), is_not(key))
+
+
+def test_key_separates_model_from_text():
+    """Moving characters between the model name and the text changes the key"""
+    assert_that(
+        embedding_cache_key("model-a", "bc"),
+        is_not(embedding_cache_key("model-ab", "c")),
+    )
+
+
+def test_cache_hits_skip_the_model(monkeypatch):
+    """Texts found in the cache are not encoded and count as hits"""
+    model = FakeModel()
+    monkeypatch.setattr(embedding_cache, "embed_texts", model)
+    cache = FakeCache(monkeypatch)
+    cache.cached("List all pets")
+    cache.cached("Delete a pet")
+
+    embeddings, hits = embed_texts_cached(
+        None, ["List all pets", "Delete a pet"], MODEL
+    )
+
+    assert_that(model.batches, has_length(0))
+    assert_that(cache.inserted, has_length(0))
+    assert_that(hits, equal_to(2))
+    assert_that(embeddings.tolist(), equal_to([[-1.0, -1.0], [-1.0, -1.0]]))
+
+
+def test_misses_are_encoded_once_and_inserted(monkeypatch):
+    """Each distinct missing text is encoded once and added to the cache, and
+    every text gets its embedding in input order"""
+    model = FakeModel()
+    monkeypatch.setattr(embedding_cache, "embed_texts", model)
+    cache = FakeCache(monkeypatch)
+    cache.cached("List all pets")
+
+    embeddings, hits = embed_texts_cached(
+        None, ["Add a pet", "List all pets", "Add a pet", "Delete"], MODEL
+    )
+
+    assert_that(model.batches, equal_to([["Add a pet", "Delete"]]))
+    assert_that(
+        cache.inserted,
+        contains_inanyorder(
+            (embedding_cache_key(MODEL, "Add a pet"), MODEL),
+            (embedding_cache_key(MODEL, "Delete"), MODEL),
+        ),
+    )
+    assert_that(hits, equal_to(1))
+    assert_that(
+        embeddings.tolist(),
+        equal_to([[9.0, 1.0], [-1.0, -1.0], [9.0, 1.0], [6.0, 1.0]]),
+    )
+    assert_that(embeddings.dtype, equal_to(np.float32))
@@ -0,0 +1,57 @@
+"""Unit tests for the config output bulk insert"""
+
+from uuid import uuid4
+
+from hamcrest import assert_that, contains_exactly, equal_to
+
+from configuration.openapi_bulk_insert import (
+    ConfigOutputRows,
+    insert_config_output_rows,
+)
+
+
+class RecordingSession:
+    """Records the statements a bulk insert executes"""
+
+    def __init__(self):
+        self.calls = []
+        self.flushed = False
+        self.committed = False
+
+    def flush(self):
+        """Record that pending ORM changes were flushed"""
+        self.flushed = True
+
+    def execute(self, statement, rows):
+        """Record the table and row count of one batch"""
+        self.calls.append((statement.table.name, len(rows)))
+
+    def commit(self):
+        """Record a commit, which the bulk insert must not make"""
+        self.committed = True
+
+
+def test_inserts_parents_first_in_batches():
+    """Paths, then operations, then prompts, in batches, without committing"""
+    path_id, operation_id = uuid4(), uuid4()
+    rows = ConfigOutputRows(
+        paths=[{"openapi_path_id": path_id}],
+        operations=[{"openapi_operation_id": operation_id}],
+        selection_prompts=[{"openapi_operation_id": operation_id}] * 5,
+    )
+    session = RecordingSession()
+    insert_config_output_rows(session, rows, batch_size=2)
+
+    assert_that(session.flushed, equal_to(True))
+    assert_that(session.committed, equal_to(False))
+    assert_that(
+        session.calls,
+        contains_exactly(
+            ("openapi_path", 1),
+            ("openapi_operation", 1),
+            ("openapi_operation_selection_prompt", 2),
+            ("openapi_operation_selection_prompt", 2),
+            ("openapi_operation_selection_prompt", 1),
+        ),
+    )
+    assert_that(len(rows), equal_to(7))
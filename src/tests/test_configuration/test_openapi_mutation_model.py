@@ -0,0 +1,84 @@
+"""Unit tests for building the OpenAPI model from the mutating operations only"""
+
+import copy
+from pathlib import Path
+from uuid import uuid4
+
+from hamcrest import assert_that, equal_to, has_length, is_, none
+
+from configuration.openapi import ParameterObject
+from configuration.openapi_mutation_model import (
+    build_openapi_model,
+    mutation_only_spec_data,
+)
+from configuration.openapi_spec_document import load_spec_document
+from configuration.openapi_validator_to_cuecode import mutating_operations
+
+PET_STORE = Path(__file__).parent.parent / "fixtures" / "openapi" / "pet-store-31.json"
+BASE_URL = "https://petstore3.swagger.io/"
+SKIPPED = {"responses", "callbacks"}
+
+
+def test_mutating_operations_match_full_model():
+    """The mapped operations are the full model's, without the fields the
+    config algorithm does not read"""
+    document = load_spec_document(PET_STORE.read_text())
+    spec_id = uuid4()
+    full = build_openapi_model(spec_id, BASE_URL, document.resolved, False)
+    lazy = build_openapi_model(spec_id, BASE_URL, document.resolved, True)
+
+    assert_that(list(lazy.paths), equal_to(list(full.paths)))
+    mapped = 0
+    for path_key, path in full.paths.items():
+        lazy_operations = mutating_operations(lazy.paths[path_key])
+        assert_that(
+            [
+                (verb, operation.model_dump(exclude=SKIPPED))
+                for verb, operation in lazy_operations
+            ],
+            equal_to(
+                [
+                    (verb, operation.model_dump(exclude=SKIPPED))
+                    for verb, operation in mutating_operations(path)
+                ]
+            ),
+        )
+        mapped += len(lazy_operations)
+        assert_that(lazy.paths[path_key].get, is_(none()))
+    assert_that(mapped, equal_to(11))
+    assert_that(lazy.components, is_(none()))
+    assert_that(lazy.servers, has_length(1))
+
+
+def test_parameter_style_defaults_still_apply():
+    """Parameters are still validated, including their default styles"""
+    document = load_spec_document(PET_STORE.read_text())
+    lazy = build_openapi_model(uuid4(), BASE_URL, document.resolved, True)
+    parameters = lazy.paths["/pet/{petId}"].post.parameters
+    assert_that([p.style for p in parameters], equal_to(["simple", "form", "form"]))
+
+
+def test_parameter_style_default_leaves_input_alone():
+    """A parameter's default style depends on its location, an explicit style
+    is kept, and the input is not modified"""
+    data = {"name": "id", "in": "path", "required": True, "schema": {"type": "string"}}
+    before = copy.deepcopy(data)
+    assert_that(ParameterObject.model_validate(data).style, equal_to("simple"))
+    assert_that(data, equal_to(before))
+    query = {"name": "q", "in": "query", "schema": {}}
+    assert_that(ParameterObject.model_validate(query).style, equal_to("form"))
+    assert_that(
+        ParameterObject.model_validate({**query, "style": "deepObject"}).style,
+        equal_to("deepObject"),
+    )
+
+
+def test_spec_data_is_not_modified():
+    """The shared spec document is left as it is"""
+    document = load_spec_document(PET_STORE.read_text())
+    before = copy.deepcopy(document.raw)
+    data = mutation_only_spec_data(document.raw)
+    assert_that(document.raw, equal_to(before))
+    assert_that("components" in data, is_(False))
+    assert_that("get" in data["paths"]["/pet/findByStatus"], is_(False))
+    assert_that("responses" in data["paths"]["/pet"]["put"], is_(False))
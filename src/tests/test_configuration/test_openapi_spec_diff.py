@@ -0,0 +1,114 @@
+"""Unit tests for diffing an updated spec against its configured operations"""
+
+import copy
+import json
+from pathlib import Path
+from uuid import uuid4
+
+from hamcrest import assert_that, contains_inanyorder, equal_to, has_key, is_not
+
+from configuration.openapi_spec_diff import (
+    GENERATOR,
+    ExistingOperation,
+    SpecDiff,
+    operation_source_hashes,
+)
+
+
+def pet_store() -> dict:
+    """The pet store spec as plain JSON, `$ref`s unresolved"""
+    input_file = (
+        Path(__file__).parent.parent / "fixtures" / "openapi" / "pet-store-31.json"
+    )
+    return json.loads(input_file.read_text())
+
+
+def configured(hashes: dict) -> dict:
+    """Existing operations as the previous configuration would have left them"""
+    return {
+        key: ExistingOperation(
+            openapi_operation_id=uuid4(), openapi_path_id=uuid4(), source_hash=h
+        )
+        for key, h in hashes.items()
+    }
+
+
+def test_hashes_only_mapped_operations():
+    """GET operations are not configured, so they are not hashed"""
+    hashes = operation_source_hashes(pet_store())
+    assert_that(hashes, has_key(("/pet", "PUT")))
+    assert_that(hashes, has_key(("/pet", "POST")))
+    assert_that(("/pet/findByStatus", "GET") in hashes, equal_to(False))
+
+
+def test_component_change_changes_referencing_operations():
+    """Editing a component changes the hash of operations that reach it
+    through `$ref`s, including indirectly, and of no others"""
+    spec = pet_store()
+    before = operation_source_hashes(spec)
+    updated = copy.deepcopy(spec)
+    # Pet references Category
+    updated["components"]["schemas"]["Category"]["properties"]["name"][
+        "description"
+    ] = "The category's name"
+    after = operation_source_hashes(updated)
+
+    assert_that(after[("/pet", "PUT")], is_not(before[("/pet", "PUT")]))
+    assert_that(after[("/pet", "POST")], is_not(before[("/pet", "POST")]))
+    assert_that(after[("/user", "POST")], equal_to(before[("/user", "POST")]))
+
+
+def diff_in_order(existing: dict, source_hashes: dict) -> SpecDiff:
+    """Diff the updated spec's operations, read in order, as the mapper does"""
+    diff = SpecDiff()
+    for key, source_hash in source_hashes.items():
+        diff.compare(key, source_hash, existing.get(key))
+    diff.find_removed(existing, source_hashes)
+    return diff
+
+
+def test_diff_operations():
+    """Operations are sorted into added, changed, removed and unchanged"""
+    spec = pet_store()
+    previous = configured(operation_source_hashes(spec))
+    updated = copy.deepcopy(spec)
+    updated["paths"]["/pet"]["put"]["description"] = "Replace an existing pet."
+    del updated["paths"]["/user"]["post"]
+    updated["paths"]["/pet/adopt"] = {"post": {"description": "Adopt a pet."}}
+
+    diff = diff_in_order(previous, operation_source_hashes(updated))
+
+    assert_that(diff.added, contains_inanyorder(("/pet/adopt", "POST")))
+    assert_that(
+        diff.changed,
+        equal_to({("/pet", "PUT"): previous[("/pet", "PUT")].openapi_operation_id}),
+    )
+    assert_that(
+        diff.removed,
+        contains_inanyorder(previous[("/user", "POST")].openapi_operation_id),
+    )
+    assert_that(diff.unchanged, equal_to(len(previous) - 2))
+
+
+def test_operations_without_hashes_are_changed():
+    """Operations configured before source hashes existed are regenerated"""
+    hashes = operation_source_hashes(pet_store())
+    diff = diff_in_order(configured({key: None for key in hashes}), hashes)
+    assert_that(diff.changed.keys(), contains_inanyorder(*hashes))
+    assert_that(diff.unchanged, equal_to(0))
+
+
+def test_generator_change_changes_every_hash():
+    """Changing a generator setting, or its version, regenerates every
+    operation"""
+    spec = pet_store()
+    before = operation_source_hashes(spec)
+    assert_that(operation_source_hashes(spec, GENERATOR), equal_to(before))
+    for change in (
+        {"version": GENERATOR["version"] + 1},
+        {"tool_call_spec_compact": not GENERATOR["tool_call_spec_compact"]},
+    ):
+        after = operation_source_hashes(spec, {**GENERATOR, **change})
+        assert_that(after.keys(), equal_to(before.keys()))
+        for key, source_hash in after.items():
+            assert_that(source_hash, is_not(before[key]))
@@ -0,0 +1,52 @@
+"""Unit tests for the config algorithm's single-parse spec-loading stage"""
+
+import json
+from pathlib import Path
+from uuid import uuid4
+
+from hamcrest import assert_that, contains_exactly, equal_to
+
+from common.models.openapi_spec import OpenAPISpec
+from configuration.openapi import OpenAPIObject
+from configuration.openapi_schema_adapter import OpenAPISchemaAdapter
+from configuration.openapi_spec_document import load_spec_document
+
+PET_STORE = Path(__file__).parent.parent / "fixtures" / "openapi" / "pet-store-31.json"
+
+
+def test_model_matches_lazy_loading():
+    """The model built from the shared document is the one built by loading
+    the spec text through the adapter"""
+    spec_text = PET_STORE.read_text()
+    spec_id = uuid4()
+    document = load_spec_document(spec_text)
+    adapter = OpenAPISchemaAdapter(OpenAPISpec(spec_text=spec_text))
+
+    shared = OpenAPIObject.from_formatted_json(
+        spec_id, "https://petstore3.swagger.io/", document.resolved
+    )
+    lazy = OpenAPIObject.from_formatted_json(
+        spec_id, "https://petstore3.swagger.io/", adapter.get_cleaned_json_dict()
+    )
+    # Tags get random entity ids
+    assert_that(
+        shared.model_dump(exclude={"tags"}), equal_to(lazy.model_dump(exclude={"tags"}))
+    )
+
+
+def test_raw_view_is_the_spec_as_written():
+    """The raw view keeps the `$ref`s and the preprocessing leaves it alone"""
+    spec_text = PET_STORE.read_text()
+    document = load_spec_document(spec_text)
+    assert_that(document.raw, equal_to(json.loads(spec_text)))
+
+
+def test_stage_timings():
+    """Each loading stage is timed, in order"""
+    document = load_spec_document(PET_STORE.read_text())
+    with document.timed("build_model"):
+        pass
+    assert_that(
+        list(document.timings),
+        contains_exactly("parse", "validate", "resolve_refs", "clean", "build_model"),
+    )
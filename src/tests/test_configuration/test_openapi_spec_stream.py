@@ -0,0 +1,108 @@
+"""Unit tests for streaming ingestion of a spec's path items"""
+
+import json
+from pathlib import Path
+from uuid import uuid4
+
+import orjson
+import pytest
+from hamcrest import assert_that, contains_string, equal_to, has_length, is_in
+
+from configuration.openapi_mutation_model import (
+    build_openapi_model,
+    build_path_item_model,
+)
+from configuration.openapi_schema_validate import OpenAPISpecValidationError
+from configuration.openapi_spec_diff import operation_source_hashes
+from configuration.openapi_spec_document import load_spec_document
+from configuration.openapi_spec_stream import SpecStream
+from configuration.openapi_validator_to_cuecode import (
+    build_tool_call_specs,
+    mutating_operations,
+)
+
+FIXTURES = Path(__file__).parent.parent / "fixtures" / "openapi"
+PET_STORE = FIXTURES / "pet-store-31.json"
+
+
+@pytest.mark.parametrize(
+    "fixture", ["pet-store-31.json", "pet-store.json", "nextcloud-v27-31.json"]
+)
+def test_stream_matches_full_parse(fixture):
+    """The streamed paths and document are those of the parsed spec"""
+    spec_text = (FIXTURES / fixture).read_text()
+    full = orjson.loads(spec_text)
+    stream = SpecStream(spec_text)
+
+    assert_that(dict(stream.iter_raw_paths()), equal_to(full.pop("paths")))
+    assert_that(stream.document, equal_to(full))
+    assert_that(stream, has_length(len(list(stream.iter_raw_paths()))))
+
+
+def test_streamed_operations_match_loaded_spec():
+    """Path items resolved from the stream make the same operations and tool
+    call specs as the whole loaded spec"""
+    spec_text = PET_STORE.read_text()
+    document = load_spec_document(spec_text)
+    model = build_openapi_model(
+        uuid4(), "https://petstore3.swagger.io/", document.resolved
+    )
+    stream = SpecStream(spec_text)
+    stream.validate()
+
+    loaded_jobs = [
+        (path_key, verb, op_obj)
+        for path_key, path in model.paths.items()
+        for verb, op_obj in mutating_operations(path)
+    ]
+    streamed_jobs = [
+        (path_key, verb, op_obj)
+        for path_key, path_item in stream.iter_resolved_paths()
+        for verb, op_obj in mutating_operations(build_path_item_model(path_item))
+    ]
+    assert_that(streamed_jobs, has_length(11))
+    assert_that(
+        [(path_key, verb, op.model_dump()) for path_key, verb, op in streamed_jobs],
+        equal_to(
+            [(path_key, verb, op.model_dump()) for path_key, verb, op in loaded_jobs]
+        ),
+    )
+    assert_that(
+        build_tool_call_specs(streamed_jobs),
+        equal_to(build_tool_call_specs(loaded_jobs)),
+    )
+
+
+def test_source_hashes_match_full_spec():
+    """Operations hash the same whether the spec is streamed or loaded, and
+    each path comes with its own operations' hashes"""
+    spec_text = PET_STORE.read_text()
+    streamed = {}
+    for path_key, _, hashes in SpecStream(spec_text).iter_hashed_paths():
+        assert_that({key[0] for key in hashes}, is_in([set(), {path_key}]))
+        streamed.update(hashes)
+    assert_that(streamed, equal_to(operation_source_hashes(json.loads(spec_text))))
+
+
+@pytest.mark.parametrize(
+    "spec_text, message",
+    [
+        ("[]", "line 1, column 1"),
+        ('{"paths": []}', "paths must be an object"),
+        ('{"openapi": "3.1.0",\n "paths": {"/a": {}}', "line 2, column 21"),
+        ('{"openapi": "3.1.0"} {}', "unexpected data after the spec"),
+        ('{"info": {"title": }}', "line 1, column 20"),
+    ],
+)
+def test_syntax_errors_are_reported(spec_text, message):
+    """Malformed spec text raises a validation error with its position"""
+    with pytest.raises(OpenAPISpecValidationError) as error:
+        SpecStream(spec_text)
+    assert_that(str(error.value), contains_string(message))
+
+
+def test_spec_without_paths_is_validated():
+    """The spec's members other than its paths are still schema-validated"""
+    stream = SpecStream('{"openapi": "3.1.0", "paths": {"/a": {}}}')
+    with pytest.raises(OpenAPISpecValidationError):
+        stream.validate()
@@ -0,0 +1,109 @@
+"""Database tests for re-configuring an updated spec. They need the
+migrated Postgres database that CI provides, and are skipped without one."""
+
+import copy
+import json
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+from hamcrest import assert_that, equal_to, has_key, is_not, not_
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from common.app_config import DB_URI
+from common.models import CuecodeConfig, OpenAPISpec
+from configuration.config_algo import map_spec_document
+from configuration.openapi_spec_stream import SpecStream
+from configuration.openapi_validator_to_cuecode import (
+    load_existing_operations,
+    openapi_spec_stream_to_cuecode_config,
+)
+
+# pylint: disable=redefined-outer-name
+
+PET_STORE = Path(__file__).parent.parent / "fixtures" / "openapi" / "pet-store-31.json"
+
+
+@pytest.fixture()
+def session():
+    """A session whose changes are rolled back after the test"""
+    pytest.importorskip("en_core_web_sm")
+    engine = create_engine(DB_URI)
+    try:
+        conn = engine.connect()
+    except OperationalError:
+        pytest.skip("No database to test against")
+    transaction = conn.begin()
+    db_session = Session(bind=conn, join_transaction_mode="create_savepoint")
+    yield db_session
+    db_session.close()
+    transaction.rollback()
+    conn.close()
+    engine.dispose()
+
+
+def map_streamed(db_session, db_spec):
+    """Map the spec from a stream, two operations per batch"""
+    openapi_spec_stream_to_cuecode_config(
+        db_session, SpecStream(db_spec.spec_text), db_spec, batch_operations=2
+    )
+
+
+def updated_pet_store(spec: dict) -> dict:
+    """The pet store with one operation changed, one added, one removed from a
+    path that stays and one removed with its whole path"""
+    updated = copy.deepcopy(spec)
+    updated["paths"]["/pet"]["put"]["description"] = "Replace an existing pet."
+    updated["paths"]["/pet/adopt"] = {
+        "post": copy.deepcopy(spec["paths"]["/pet"]["post"])
+    }
+    updated["paths"]["/pet/adopt"]["post"]["operationId"] = "adoptPet"
+    del updated["paths"]["/store/order/{orderId}"]["delete"]
+    del updated["paths"]["/user/createWithList"]
+    return updated
+
+
+@pytest.mark.parametrize("map_spec", [map_spec_document, map_streamed])
+def test_update_regenerates_only_what_changed(session, map_spec):
+    """Unchanged operations keep their rows, changed ones keep their ids with a
+    new source hash, added ones are inserted, and removed ones are deleted
+    along with the paths the spec no longer has"""
+    spec = json.loads(PET_STORE.read_text())
+    config = CuecodeConfig(cuecode_config_id=uuid4())
+    db_spec = OpenAPISpec(
+        openapi_spec_id=uuid4(),
+        cuecode_config_id=config.cuecode_config_id,
+        spec_text=json.dumps(spec),
+    )
+    session.add_all([config, db_spec])
+    session.flush()
+
+    map_spec(session, db_spec)
+    before, _ = load_existing_operations(session, db_spec.openapi_spec_id)
+    db_spec.spec_text = json.dumps(updated_pet_store(spec))
+    map_spec(session, db_spec)
+    after, path_ids = load_existing_operations(session, db_spec.openapi_spec_id)
+
+    assert_that(
+        set(after),
+        equal_to(
+            set(before)
+            - {("/store/order/{orderId}", "DELETE"), ("/user/createWithList", "POST")}
+            | {("/pet/adopt", "POST")}
+        ),
+    )
+    changed = ("/pet", "PUT")
+    assert_that(
+        after[changed].openapi_operation_id,
+        equal_to(before[changed].openapi_operation_id),
+    )
+    assert_that(after[changed].source_hash, is_not(before[changed].source_hash))
+    for key in set(before) & set(after) - {changed}:
+        assert_that(after[key], equal_to(before[key]))
+
+    assert_that(path_ids, not_(has_key("/user/createWithList")))
+    assert_that(path_ids, has_key("/store/order/{orderId}"))
+    # Paths without mapped operations are kept while the spec has them
+    assert_that(path_ids, has_key("/user/login"))
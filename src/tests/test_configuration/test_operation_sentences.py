@@ -0,0 +1,46 @@
+"""Unit tests for splitting operation descriptions into selection prompts"""
+
+import pytest
+from hamcrest import assert_that, equal_to, has_item, same_instance
+
+from configuration.openapi_operation_embedding import (
+    get_all_sentences,
+    get_sentence_pipeline,
+    split_sentences,
+)
+
+
+def test_split_sentences_keeps_input_order():
+    """Each description gets its own sentence list, empty ones included"""
+    pytest.importorskip("en_core_web_sm")
+    assert_that(
+        split_sentences(
+            ["Add a new pet to the store. Returns the pet.", "", None, "Delete a pet"]
+        ),
+        equal_to(
+            [
+                ["Add a new pet to the store.", "Returns the pet."],
+                [],
+                [],
+                ["Delete a pet"],
+            ]
+        ),
+    )
+    assert_that(get_all_sentences("Update a pet."), equal_to(["Update a pet."]))
+
+
+def test_sentence_pipeline_loaded_once():
+    """Every call shares one pipeline"""
+    pytest.importorskip("en_core_web_sm")
+    assert_that(get_sentence_pipeline(), same_instance(get_sentence_pipeline()))
+
+
+def test_missing_model_fails_unless_fallback_is_enabled():
+    """A model that is not installed is an error, unless the fallback to the
+    rule-based sentencizer is enabled"""
+    with pytest.raises(OSError):
+        get_sentence_pipeline("not_an_installed_pipeline", False)
+    assert_that(
+        get_sentence_pipeline("not_an_installed_pipeline", True).pipe_names,
+        has_item("sentencizer"),
+    )
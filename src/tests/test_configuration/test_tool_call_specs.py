@@ -0,0 +1,165 @@
+"""Unit tests for building tool call specs serially and in worker processes,
+and for the memoized `$ref` resolution they use"""
+
+import json
+from pathlib import Path
+from uuid import uuid4
+
+import jsonref
+from hamcrest import (
+    assert_that,
+    contains_string,
+    equal_to,
+    greater_than,
+    has_entries,
+    has_length,
+    is_not,
+    less_than,
+)
+
+from configuration.openapi import OpenAPIObject
+from configuration.openapi_ref_resolver import RefResolver
+from configuration.openapi_schema_adapter import OpenAPISchemaAdapter
+from configuration.openapi_tool_call import make_tool_call_spec
+from configuration.openapi_tool_call_compaction import ToolCallSpecCompactor
+from configuration.openapi_validator_to_cuecode import (
+    build_tool_call_spec,
+    build_tool_call_spec_chunk,
+    build_tool_call_specs,
+    mutating_operations,
+)
+
+
+def pet_store_jobs():
+    """(path, verb, operation) for each mutating operation in the pet store"""
+    input_file = (
+        Path(__file__).parent.parent / "fixtures" / "openapi" / "pet-store-31.json"
+    )
+    spec = jsonref.loads(input_file.read_text())
+    spec = OpenAPISchemaAdapter.clean_json_dict(spec)
+    validator = OpenAPIObject.from_formatted_json(
+        uuid4(), "https://petstore3.swagger.io/", spec, True
+    )
+    return [
+        (path_key, verb, op_obj)
+        for path_key, path in validator.paths.items()
+        for verb, op_obj in mutating_operations(path)
+    ]
+
+
+def test_parallel_specs_match_serial():
+    """Worker processes build the same specs, in the same order"""
+    jobs = pet_store_jobs()
+    serial = build_tool_call_specs(jobs, workers=1)
+    parallel = build_tool_call_specs(jobs, workers=2, min_parallel_jobs=1)
+    assert_that(serial, has_length(len(jobs)))
+    assert_that(json.dumps(parallel), equal_to(json.dumps(serial)))
+
+
+def tree_document() -> dict:
+    """A document with a recursive schema"""
+    return jsonref.replace_refs(
+        {
+            "components": {
+                "schemas": {
+                    "Node": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "children": {
+                                "type": "array",
+                                "items": {"$ref": "#/components/schemas/Node"},
+                            },
+                        },
+                    }
+                }
+            },
+            "root": {"$ref": "#/components/schemas/Node"},
+        }
+    )
+
+
+def test_matches_full_inlining():
+    """Without recursion or deep nesting, specs are the fully inlined ones"""
+    for job in pet_store_jobs():
+        path_key, verb, op_obj = job
+        expected = jsonref.replace_refs(
+            make_tool_call_spec(
+                path_name=path_key, operation_object=op_obj, http_verb=verb
+            )
+        )
+        assert_that(
+            json.dumps(build_tool_call_spec(job)), equal_to(json.dumps(expected))
+        )
+
+
+def test_shared_schemas_are_expanded_once():
+    """Operations of one spec reuse the expansion of shared schemas"""
+    resolver = RefResolver()
+    for job in pet_store_jobs():
+        build_tool_call_spec(job, resolver)
+    assert_that(resolver.hits, greater_than(0))
+    assert_that(
+        build_tool_call_spec_chunk(pet_store_jobs(), compact=False)[0],
+        equal_to([build_tool_call_spec(job) for job in pet_store_jobs()]),
+    )
+
+
+def test_cycles_become_stable_references():
+    """A recursive schema is expanded once and then refers to itself"""
+    value, defs = RefResolver().resolve(tree_document()["root"])
+    node_ref = {"$ref": "#/$defs/Node"}
+    assert_that(value["properties"]["children"]["items"], equal_to(node_ref))
+    assert_that(
+        defs["Node"]["properties"]["children"], has_entries({"items": node_ref})
+    )
+    json.dumps([value, defs])
+
+
+def test_depth_limit():
+    """References deeper than the limit are moved to $defs"""
+    document = tree_document()
+    value, defs = RefResolver(max_depth=0).resolve({"root": document["root"]})
+    assert_that(value, equal_to({"root": {"$ref": "#/$defs/Node"}}))
+    assert_that(defs, has_entries({"Node": is_not(None)}))
+
+
+def test_compaction_strips_non_essential_keywords():
+    """Stripped keywords, other vendors' extensions and long examples are
+    dropped; properties that happen to share their names are not"""
+    compactor = ToolCallSpecCompactor(strip_keys=["xml"], max_example_bytes=20)
+    schema = {
+        "type": "object",
+        "xml": {"name": "pet"},
+        "x-vendor": True,
+        "x-cuecode-prompt": "A pet",
+        "properties": {
+            "xml": {"type": "string", "example": "short"},
+            "photo": {"type": "string", "examples": ["x" * 100]},
+        },
+        "oneOf": {"application/xml": {"type": "object", "xml": {"name": "x"}}},
+    }
+    assert_that(
+        compactor.compact_schema(schema),
+        equal_to(
+            {
+                "type": "object",
+                "x-cuecode-prompt": "A pet",
+                "properties": {
+                    "xml": {"type": "string", "example": "short"},
+                    "photo": {"type": "string"},
+                },
+                "oneOf": {"application/xml": {"type": "object"}},
+            }
+        ),
+    )
+
+
+def test_compacted_pet_store_specs_are_smaller():
+    """Compaction shrinks the pet store's specs and reports their sizes"""
+    jobs = pet_store_jobs()
+    specs, sizes = build_tool_call_spec_chunk(jobs, compact=True)
+    assert_that(sizes.specs, equal_to(len(jobs)))
+    assert_that(sizes.bytes_after, less_than(sizes.bytes_before))
+    assert_that(sizes.tokens_after, less_than(sizes.tokens_before))
+    assert_that(json.dumps(specs), is_not(contains_string('"xml": {')))
@@ -0,0 +1,77 @@
+"""Unit tests for the runtime query embedding micro-batcher"""
+
+import asyncio
+import threading
+
+import numpy as np
+from hamcrest import assert_that, calling, equal_to, has_entries, raises
+
+from runtime.embedding_batcher import EmbeddingBatcher
+
+
+class FakeModel:  # pylint: disable=too-few-public-methods
+    """Embeds text as [len(text)] and records each batch it was given"""
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, texts, _model_name):
+        self.started.set()
+        self.release.wait()
+        self.batches.append(list(texts))
+        return np.array([[float(len(t))] for t in texts], dtype=np.float32)
+
+
+def test_concurrent_queries_share_a_batch():
+    """Queries queued while the model is busy are encoded in one batch"""
+    model = FakeModel()
+    batcher = EmbeddingBatcher(max_batch_size=8, max_wait_ms=0, embed=model)
+    model.release.clear()
+    first = batcher.submit("a")
+    # The worker is now busy encoding "a"
+    model.started.wait(timeout=5)
+    rest = [batcher.submit(text) for text in ["bb", "ccc", "dddd"]]
+    model.release.set()
+
+    assert_that(first.result(timeout=5)[0], equal_to(1.0))
+    assert_that([f.result(timeout=5)[0] for f in rest], equal_to([2.0, 3.0, 4.0]))
+    assert_that(model.batches[-1], equal_to(["bb", "ccc", "dddd"]))
+    assert_that(batcher.stats(), has_entries({"texts": 4, "batch_sizes": {1: 1, 3: 1}}))
+
+
+def test_batches_are_capped():
+    """No batch holds more than max_batch_size texts"""
+    model = FakeModel()
+    batcher = EmbeddingBatcher(max_batch_size=2, max_wait_ms=50, embed=model)
+    futures = [batcher.submit(str(i)) for i in range(5)]
+    for future in futures:
+        future.result(timeout=5)
+    assert_that(max(len(b) for b in model.batches), equal_to(2))
+    assert_that(batcher.stats()["texts"], equal_to(5))
+
+
+def test_encode_errors_reach_every_waiter():
+    """A failed batch fails each query in it, and the worker keeps going"""
+
+    def broken(_texts, _model_name):
+        raise RuntimeError("model unavailable")
+
+    batcher = EmbeddingBatcher(max_batch_size=4, max_wait_ms=0, embed=broken)
+    assert_that(calling(batcher.embed).with_args("x"), raises(RuntimeError))
+    assert_that(calling(batcher.embed).with_args("y"), raises(RuntimeError))
+
+
+def test_embed_async():
+    """Coroutines awaiting the batcher are batched together"""
+    model = FakeModel()
+    batcher = EmbeddingBatcher(max_batch_size=8, max_wait_ms=200, embed=model)
+
+    async def embed_all():
+        return await asyncio.gather(*(batcher.embed_async(t) for t in ["a", "bb"]))
+
+    results = asyncio.run(embed_all())
+    assert_that([r[0] for r in results], equal_to([1.0, 2.0]))
+    assert_that(model.batches, equal_to([["a", "bb"]]))
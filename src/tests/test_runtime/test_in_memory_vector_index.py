@@ -0,0 +1,128 @@
+"""Unit tests for the in-memory spec vector index"""
+
+from contextlib import contextmanager
+
+import numpy as np
+from hamcrest import (
+    assert_that,
+    contains_exactly,
+    equal_to,
+    has_entries,
+    has_length,
+    is_,
+)
+
+from runtime.in_memory_vector_index import (
+    SpecVectorIndex,
+    SpecVectorIndexCache,
+    aggregate_by_operation,
+    parse_vector,
+)
+
+
+def make_index(n_ops: int = 3) -> SpecVectorIndex:
+    """One prompt per operation, each along its own axis"""
+    return SpecVectorIndex(
+        matrix=np.eye(n_ops, 4, dtype=np.float32) * 2,
+        operation_ids=[f"op{i}" for i in range(n_ops)],
+        selection_prompts=[f"prompt {i}" for i in range(n_ops)],
+        operations={
+            f"op{i}": ("server", f"path{i}", "POST", {"type": "function"})
+            for i in range(n_ops)
+        },
+    )
+
+
+class FakeDBEngine:  # pylint: disable=too-few-public-methods
+    """Hands out a placeholder connection; loaders in these tests ignore it"""
+
+    @contextmanager
+    def connection(self):
+        """Placeholder connection"""
+        yield None
+
+
+def test_search_orders_by_similarity():
+    """Closest prompts come first, with cosine distance in the first column"""
+    index = make_index()
+    rows = index.search(np.array([0.6, 0.8, 0, 0], dtype=np.float32), limit=2)
+    assert_that([row[1] for row in rows], contains_exactly("op1", "op0"))
+    assert_that(round(rows[0][0], 5), equal_to(0.2))
+
+
+def test_search_many_matches_search():
+    """The batched search gives the same answer as one query at a time"""
+    index = make_index()
+    queries = np.eye(2, 4, dtype=np.float32)
+    batched = index.search_many(queries, limit=3)
+    assert_that(batched, equal_to([index.search(q, limit=3) for q in queries]))
+
+
+def test_parse_vector_text():
+    """pgvector text output parses to float32"""
+    vec = parse_vector("[1,2.5,-3]")
+    assert_that(vec.dtype, equal_to(np.float32))
+    assert_that(vec.tolist(), equal_to([1.0, 2.5, -3.0]))
+
+
+def test_cache_loads_once_and_evicts_by_bytes():
+    """Indexes load lazily once, and the least recently used spec is dropped
+    when the byte budget is exceeded"""
+    loaded = []
+
+    def loader(_conn, spec_id):
+        loaded.append(spec_id)
+        return make_index()
+
+    one_index_bytes = make_index().nbytes
+    cache = SpecVectorIndexCache(
+        max_bytes=one_index_bytes * 2, revalidate_seconds=3600, loader=loader
+    )
+    engine = FakeDBEngine()
+    cache.get(engine, "a")
+    cache.get(engine, "a")
+    cache.get(engine, "b")
+    cache.get(engine, "c")
+    assert_that(loaded, equal_to(["a", "b", "c"]))
+    assert_that(cache.stats(), has_entries({"specs": 2, "evictions": 1}))
+    cache.get(engine, "a")
+    assert_that(loaded[-1], is_("a"))
+
+
+def test_only_loads_are_counted_and_dropped_specs_free_their_locks():
+    """Indexes added with put() are not loads, and evicted or invalidated
+    specs no longer keep a load lock"""
+    one_index_bytes = make_index().nbytes
+    cache = SpecVectorIndexCache(
+        max_bytes=one_index_bytes,
+        revalidate_seconds=3600,
+        loader=lambda *_: make_index(),
+    )
+    engine = FakeDBEngine()
+    cache.put("a", make_index())
+    assert_that(cache.stats(), has_entries({"loads": 0}))
+    cache.get(engine, "b")
+    cache.get(engine, "c")
+    assert_that(cache.stats(), has_entries({"loads": 2, "evictions": 2}))
+    # pylint: disable-next=protected-access
+    assert_that(list(cache._load_locks), equal_to(["c"]))
+    cache.invalidate("c")
+    # pylint: disable-next=protected-access
+    assert_that(cache._load_locks, has_length(0))
+
+
+def test_aggregate_by_operation():
+    """Prompt rows collapse to one row per operation, best operation first"""
+    rows = [
+        (0.1, "op1", "s", "p", "POST", "best op1 prompt", {}),
+        (0.2, "op0", "s", "p", "PUT", "op0 prompt", {}),
+        (0.5, "op1", "s", "p", "POST", "worse op1 prompt", {}),
+    ]
+    by_max = aggregate_by_operation(rows, limit=5, aggregation="max")
+    assert_that([row[1] for row in by_max], contains_exactly("op1", "op0"))
+    assert_that(by_max[0][5], equal_to("best op1 prompt"))
+
+    by_mean = aggregate_by_operation(rows, limit=5, aggregation="mean")
+    assert_that([row[1] for row in by_mean], contains_exactly("op0", "op1"))
+    assert_that(round(by_mean[1][0], 5), equal_to(0.3))
+    assert_that(aggregate_by_operation(rows, limit=1), has_length(1))
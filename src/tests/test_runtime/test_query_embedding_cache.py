@@ -0,0 +1,68 @@
+"""Unit tests for the runtime query embedding cache"""
+
+import numpy as np
+from hamcrest import assert_that, equal_to, has_entries, is_, none, not_none
+
+from runtime.query_embedding_cache import QueryEmbeddingCache, normalize_query_text
+
+MODEL = "test-model"
+
+
+class FakeClock:  # pylint: disable=too-few-public-methods
+    """Manually advanced clock for TTL tests"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalized_text_shares_entry():
+    """Whitespace and Unicode normalization differences hit the same entry"""
+    cache = QueryEmbeddingCache(max_entries=4, ttl_seconds=60)
+    cache.put(MODEL, "Create a new caf\u00e9", np.ones(3))
+    assert_that(cache.get(MODEL, "  Create a new\tcafe\u0301 "), is_(not_none()))
+    assert_that(
+        normalize_query_text(" Delete  the Order "), equal_to("Delete the Order")
+    )
+
+
+def test_case_is_part_of_key():
+    """Texts differing in case, or only under case folding, are kept apart"""
+    cache = QueryEmbeddingCache(max_entries=4, ttl_seconds=60)
+    cache.put(MODEL, "Create a new pet", np.ones(3))
+    assert_that(cache.get(MODEL, "create a NEW pet"), is_(none()))
+    assert_that(normalize_query_text("Stra\u00dfe"), equal_to("Stra\u00dfe"))
+
+
+def test_model_name_is_part_of_key():
+    """Embeddings from different models never mix"""
+    cache = QueryEmbeddingCache(max_entries=4, ttl_seconds=60)
+    cache.put(MODEL, "create a new pet", np.ones(3))
+    assert_that(cache.get("other-model", "create a new pet"), is_(none()))
+
+
+def test_least_recently_used_is_evicted():
+    """A full cache drops the entry that was used longest ago"""
+    cache = QueryEmbeddingCache(max_entries=2, ttl_seconds=60)
+    cache.put(MODEL, "a", np.ones(3))
+    cache.put(MODEL, "b", np.ones(3))
+    cache.get(MODEL, "a")
+    cache.put(MODEL, "c", np.ones(3))
+    assert_that(cache.get(MODEL, "b"), is_(none()))
+    assert_that(cache.get(MODEL, "a"), is_(not_none()))
+    assert_that(cache.stats(), has_entries({"size": 2, "evictions": 1}))
+
+
+def test_entries_expire():
+    """Entries older than the TTL are misses"""
+    clock = FakeClock()
+    cache = QueryEmbeddingCache(max_entries=2, ttl_seconds=10, clock=clock)
+    cache.put(MODEL, "a", np.ones(3))
+    clock.now = 11
+    assert_that(cache.get(MODEL, "a"), is_(none()))
+    assert_that(
+        cache.stats(),
+        has_entries({"size": 0, "expirations": 1, "hits": 0, "misses": 1}),
+    )
@@ -0,0 +1,34 @@
+"""Unit tests for building the endpoint search SQL"""
+
+from hamcrest import assert_that, contains_string, is_not
+
+from runtime.generate_api_payloads import build_batch_search_sql, build_search_sql
+
+
+def test_full_precision_search_has_one_pass():
+    """The full precision search orders by the float32 distance directly"""
+    sql = build_search_sql("%(embedding)s", "full", "max")
+    assert_that(sql, contains_string("<=> %(embedding)s AS cosine_distance"))
+    assert_that(sql, is_not(contains_string("first_pass")))
+    assert_that(sql, contains_string("min(c.cosine_distance)"))
+
+
+def test_quantized_search_reranks_first_pass():
+    """Quantized searches scan their index, then re-score at full precision"""
+    halfvec = build_search_sql("%(embedding)s", "halfvec", "mean")
+    assert_that(
+        halfvec,
+        contains_string(
+            "ORDER BY sp.selection_prompt_embedding::halfvec(384)"
+            + " <=> %(embedding)s::halfvec(384)"
+        ),
+    )
+    assert_that(halfvec, contains_string("LIMIT %(first_pass_limit)s"))
+    assert_that(
+        halfvec,
+        contains_string("first_pass.selection_prompt_embedding <=> %(embedding)s"),
+    )
+    assert_that(halfvec, contains_string("avg(c.cosine_distance)"))
+
+    binary = build_batch_search_sql("binary", "max")
+    assert_that(binary, contains_string("binary_quantize(q.embedding::vector)"))